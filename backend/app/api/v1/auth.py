@@ -4,16 +4,13 @@ Authentication endpoints for the Breslev Torah Online API.
 from datetime import timedelta
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.deps import get_database, get_current_user, get_current_active_user
+from app.core.deps import get_database, get_current_user, get_current_active_user, security
 from app.core.security import (
     create_access_token,
     create_refresh_token,
-    verify_password,
-    get_password_hash,
-    verify_token,
     generate_password_reset_token,
     verify_password_reset_token,
     generate_email_verification_token,
@@ -38,13 +35,46 @@ from app.models.auth import (
 from app.models.user import User, UserRole
 from app.services.user import UserService
 from app.services.email import EmailService
-from app.services.cache_service import cache_service
+from app.services.token_verifier import get_token_verifier
+from app.services.password_hasher import get_password_hasher, PasswordHasherBusy
+from app.services.refresh_token_store import get_refresh_token_store, ROTATED
 from app.utils.logger import logger
 from app.utils.monitoring import monitor_endpoint
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 
+def _hasher_busy(e: PasswordHasherBusy) -> HTTPException:
+    logger.warning(f"Password hashing pool saturated: {e}")
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service busy, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password in the hashing pool."""
+    try:
+        return await get_password_hasher().hash(password)
+    except PasswordHasherBusy as e:
+        raise _hasher_busy(e)
+
+
+async def check_password(password: str, hashed_password: str):
+    """Verify a password in the hashing pool; returns (valid, replacement hash or None)."""
+    try:
+        return await get_password_hasher().verify(password, hashed_password)
+    except PasswordHasherBusy as e:
+        raise _hasher_busy(e)
+
+
+async def store_refresh_token(user_id: int, refresh_token: str) -> None:
+    """Register a refresh token issued at sign-in, starting a new family."""
+    payload = get_token_verifier().decode(refresh_token)
+    await get_refresh_token_store().issue(user_id, payload["jti"], payload["exp"])
+
+
 @router.post("/register", response_model=AuthResponse, status_code=status.HTTP_201_CREATED)
 @monitor_endpoint("/auth/register")
 async def register(
@@ -78,7 +108,7 @@ async def register(
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await hash_password(user_data.password)
     
     user = User(
         email=user_data.email,
@@ -112,13 +142,8 @@ async def register(
         verification_token
     )
     
-    # Cache refresh token
-    await cache_service.set(
-        "user_data",
-        f"refresh_token:{created_user.id}",
-        refresh_token,
-        ttl=settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
-    )
+    # Store refresh token
+    await store_refresh_token(created_user.id, refresh_token)
     
     logger.info(f"User registered successfully: {created_user.email}")
     
@@ -153,7 +178,10 @@ async def login(
     
     # Get user by email
     user = await user_service.get_user_by_email(form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    valid, new_hash = (
+        await check_password(form_data.password, user.hashed_password) if user else (False, None)
+    )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -166,6 +194,11 @@ async def login(
             detail="Inactive user"
         )
     
+    # Upgrade hashes made with a deprecated scheme or weaker parameters
+    if new_hash:
+        await user_service.update_password(user.id, new_hash)
+        logger.info(f"Password hash upgraded for user: {user.email}")
+
     # Update last login
     await user_service.update_last_login(user.id)
     
@@ -192,13 +225,8 @@ async def login(
         expires_delta=refresh_token_expires
     )
     
-    # Cache refresh token
-    await cache_service.set(
-        "user_data",
-        f"refresh_token:{user.id}",
-        refresh_token,
-        ttl=int(refresh_token_expires.total_seconds())
-    )
+    # Store refresh token
+    await store_refresh_token(user.id, refresh_token)
     
     logger.info(f"User logged in successfully: {user.email}")
     
@@ -232,8 +260,8 @@ async def refresh_token(
     user_service = UserService(db)
     
     # Verify refresh token
-    payload = verify_token(token_data.refresh_token)
-    if not payload or payload.get("type") != "refresh":
+    payload = await get_token_verifier().verify(token_data.refresh_token, expected_type="refresh")
+    if not payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid refresh token",
@@ -241,16 +269,7 @@ async def refresh_token(
         )
     
     user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid refresh token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    # Check if refresh token is cached
-    cached_token = await cache_service.get("user_data", f"refresh_token:{user_id}")
-    if cached_token != token_data.refresh_token:
+    if not user_id or not payload.get("jti"):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid refresh token",
@@ -269,16 +288,22 @@ async def refresh_token(
     # Generate new tokens
     new_token_data = {"sub": str(user.id), "email": user.email}
     
-    new_access_token = create_access_token(data=new_token_data)
     new_refresh_token = create_refresh_token(data=new_token_data)
+    new_payload = get_token_verifier().decode(new_refresh_token)
     
-    # Update cached refresh token
-    await cache_service.set(
-        "user_data",
-        f"refresh_token:{user.id}",
-        new_refresh_token,
-        ttl=settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+    # Swap the presented refresh token for the new one; a token presented
+    # after it was already rotated revokes its whole family
+    result = await get_refresh_token_store().rotate(
+        user.id, payload["jti"], new_payload["jti"], new_payload["exp"]
     )
+    if result != ROTATED:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    new_access_token = create_access_token(data=new_token_data)
     
     logger.info(f"Token refreshed for user: {user.email}")
     
@@ -293,20 +318,26 @@ async def refresh_token(
 @monitor_endpoint("/auth/logout")
 async def logout(
     current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
 ) -> LogoutResponse:
     """
     Logout current user.
     
     Args:
         current_user: Current authenticated user
+        credentials: Bearer token of the request, revoked until it expires
         
     Returns:
         Logout response
     """
-    # Remove refresh token from cache
-    await cache_service.delete("user_data", f"refresh_token:{current_user.id}")
+    # Revoke refresh tokens
+    await get_refresh_token_store().revoke_all(current_user.id)
     
-    # Could also add token to blacklist here
+    # Revoke the access token on every worker
+    verifier = get_token_verifier()
+    payload = verifier.decode(credentials.credentials)
+    if payload and payload.get("jti"):
+        await verifier.revoke(payload["jti"], payload.get("exp"))
     
     logger.info(f"User logged out: {current_user.email}")
     
@@ -410,11 +441,11 @@ async def reset_password(
         )
     
     # Update password
-    new_password_hash = get_password_hash(request.new_password)
+    new_password_hash = await hash_password(request.new_password)
     await user_service.update_password(user.id, new_password_hash)
     
     # Invalidate all refresh tokens for this user
-    await cache_service.delete("user_data", f"refresh_token:{user.id}")
+    await get_refresh_token_store().revoke_all(user.id)
     
     logger.info(f"Password reset completed for: {user.email}")
     
@@ -534,19 +565,21 @@ async def change_password(
     """
     user_service = UserService(db)
     
-    # Verify current password
-    if not verify_password(request.current_password, current_user.hashed_password):
+    # Verify current password (the cached principal carries no hash)
+    user = await user_service.get_user_by_id(current_user.id)
+    valid, _ = await check_password(request.current_password, user.hashed_password) if user else (False, None)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
     
     # Update password
-    new_password_hash = get_password_hash(request.new_password)
+    new_password_hash = await hash_password(request.new_password)
     await user_service.update_password(current_user.id, new_password_hash)
     
     # Invalidate all refresh tokens for this user
-    await cache_service.delete("user_data", f"refresh_token:{current_user.id}")
+    await get_refresh_token_store().revoke_all(current_user.id)
     
     logger.info(f"Password changed for: {current_user.email}")
     
@@ -1,6 +1,5 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict
-import json
+from fastapi import APIRouter, HTTPException, Header, Query, Response
+from typing import List, Dict, Optional
 from pathlib import Path
 import sys
 
@@ -9,83 +8,81 @@ backend_path = Path(__file__).parent.parent.parent
 sys.path.append(str(backend_path))
 
 from app.services.sefaria_client import SefariaClient
+from app.services.book_catalog import get_book_catalog, etag_matches, SECTION_FIELDS
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.serialization import APIResponse
 
 router = APIRouter()
 client = SefariaClient()
+catalog = get_book_catalog()
 
 @router.get("/all")
-async def get_all_books():
-    """Récupère la liste de tous les livres disponibles"""
+async def get_all_books(if_none_match: Optional[str] = Header(default=None)):
+    """Récupère la liste de tous les livres disponibles (servie depuis le catalogue)"""
     try:
-        books_info = []
+        etag = catalog.etag
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
         
-        for book_key, book_meta in client.BRESLOV_BOOKS.items():
-            # Vérifier si le livre existe localement
-            book_file = client.data_dir / f"{book_key}.json"
-            
-            book_info = {
-                "id": book_key,
-                "title_en": book_key.replace('_', ' '),
-                "title_he": book_meta.get('he', ''),
-                "available": book_file.exists(),
-                "sections": 0
-            }
-            
-            # Si disponible, ajouter info sur les sections
-            if book_file.exists():
-                try:
-                    with open(book_file, 'r', encoding='utf-8') as f:
-                        book_data = json.load(f)
-                        book_info["sections"] = len(book_data.get('sections', {}))
-                        book_info["title_en"] = book_data.get('title_en', book_info["title_en"])
-                except:
-                    pass
-            
-            books_info.append(book_info)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
         
-        return {
-            "books": books_info,
-            "total": len(books_info),
-            "available": len([b for b in books_info if b["available"]])
-        }
+        return Response(content=catalog.listing(), media_type="application/json", headers=headers)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{book_id}")
-async def get_book_details(book_id: str):
-    """Récupère les détails d'un livre spécifique"""
+async def get_book_details(
+    book_id: str,
+    cursor: Optional[str] = Query(default=None, description="Curseur renvoyé par la page précédente"),
+    limit: int = Query(default=100, ge=1, le=500),
+    fields: Optional[str] = Query(default=None, description="Champs des sections, ex: ref,has_hebrew")
+):
+    """Récupère les détails d'un livre et une page de ses sections"""
+    selected_fields = SECTION_FIELDS
+    if fields:
+        selected_fields = tuple(field.strip() for field in fields.split(",") if field.strip())
+        unknown = set(selected_fields) - set(SECTION_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    
+    after_ref = None
+    if cursor:
+        try:
+            after_ref = decode_cursor(cursor, 1)[0]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
     try:
-        book_file = client.data_dir / f"{book_id}.json"
-        
-        if not book_file.exists():
+        entry = catalog.get_entry(book_id)
+        if entry is None:
             raise HTTPException(status_code=404, detail=f"Book not found: {book_id}")
         
-        with open(book_file, 'r', encoding='utf-8') as f:
-            book_data = json.load(f)
+        try:
+            result = catalog.sections_page(book_id, after_ref=after_ref, limit=limit)
+        except KeyError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if result is None:
+            raise HTTPException(status_code=404, detail=f"Book content not available: {book_id}")
+        page, has_more = result
         
-        # Préparer la structure de retour
-        sections_list = []
-        for ref, section in book_data.get('sections', {}).items():
-            sections_list.append({
-                "ref": ref,
-                "hebrew_preview": section.get('hebrew', '')[:100] + "...",
-                "english_preview": section.get('english', '')[:100] + "...",
-                "has_hebrew": bool(section.get('hebrew')),
-                "has_english": bool(section.get('english'))
-            })
+        next_cursor = encode_cursor(page[-1]["ref"]) if has_more else None
         
-        return {
+        if selected_fields != SECTION_FIELDS:
+            page = [{field: section[field] for field in selected_fields} for section in page]
+        
+        return APIResponse({
             "id": book_id,
-            "title": book_data.get('title', book_id),
-            "title_en": book_data.get('title_en', book_id),
-            "sections": sections_list,
-            "total_sections": len(sections_list)
-        }
+            "title": entry["title"],
+            "title_en": entry["title_en"],
+            "sections": page,
+            "total_sections": entry["sections"],
+            "next_cursor": next_cursor
+        })
         
+    except HTTPException:
+        raise
     except Exception as e:
-        if "not found" in str(e):
-            raise e
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/fetch")
@@ -11,6 +11,7 @@ from app.models.user import User
 from app.core.deps import get_current_user
 from app.utils.logger import logger
 from app.utils.monitoring import monitor_endpoint
+from app.utils.quotas import Quota, text_length
 
 router = APIRouter(prefix="/tts", tags=["tts"])
 
@@ -63,7 +64,10 @@ class VoicePreferences(BaseModel):
     en_rate: float = Field(1.0, description="Vitesse pour l'anglais")
 
 
-@router.post("/synthesize", response_model=TTSResponse)
+@router.post(
+    "/synthesize", response_model=TTSResponse,
+    dependencies=[Depends(Quota("tts_characters", text_length("text")))]
+)
 @monitor_endpoint("/tts/synthesize")
 async def synthesize_text(
     request: TTSRequest,
@@ -127,7 +131,10 @@ async def synthesize_text(
         )
 
 
-@router.post("/synthesize-mixed", response_model=MultiLanguageTTSResponse)
+@router.post(
+    "/synthesize-mixed", response_model=MultiLanguageTTSResponse,
+    dependencies=[Depends(Quota("tts_characters", text_length("request.text")))]
+)
 @monitor_endpoint("/tts/synthesize-mixed")
 async def synthesize_mixed_language(
     request: TTSRequest,
@@ -180,7 +187,10 @@ async def synthesize_mixed_language(
         )
 
 
-@router.post("/synthesize-with-highlighting", response_model=HighlightingTTSResponse)
+@router.post(
+    "/synthesize-with-highlighting", response_model=HighlightingTTSResponse,
+    dependencies=[Depends(Quota("tts_characters", text_length("text")))]
+)
 @monitor_endpoint("/tts/synthesize-with-highlighting")
 async def synthesize_with_highlighting(
     request: TTSRequest,
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
 from pydantic import BaseModel
 from typing import Optional
 import sys
@@ -15,6 +15,8 @@ try:
 except ImportError:
     REAL_GEMINI_AVAILABLE = False
 from app.services.sefaria_client import SefariaClient
+from app.utils.monitoring import monitoring
+from app.utils.quotas import Quota, gemini_tokens
 
 router = APIRouter()
 
@@ -26,7 +28,9 @@ class ChatRequest(BaseModel):
 class InitializeRequest(BaseModel):
     books: Optional[list] = None  # Si None, initialise tous les livres
 
-@router.post("/chat")
+@router.post("/chat", dependencies=[
+    Depends(Quota("gemini_tokens", gemini_tokens("question", "book_context")))
+])
 async def chat_with_gemini(request: ChatRequest):
     """Chat RÉEL avec Gemini AI - AUCUN MOCK"""
     
@@ -114,7 +118,7 @@ async def get_gemini_status():
             "service": "real_gemini_api"
         }
 
-@router.post("/translate")
+@router.post("/translate", dependencies=[Depends(Quota("gemini_tokens", gemini_tokens("text")))])
 async def translate_text(text: str, target_lang: str = "fr"):
     """Traduction de texte avec Gemini"""
     try:
@@ -132,7 +136,8 @@ INSTRUCTIONS:
 
 TRADUCTION {target_lang.upper()}:"""
         
-        response = manager.flash_model.generate_content(prompt)
+        with monitoring.trace_span("gemini translate", {"external_api.name": "gemini"}, "client"):
+            response = manager.flash_model.generate_content(prompt)
         
         return {
             "original": text,
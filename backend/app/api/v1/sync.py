@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+
+from app.database import get_db_session
+from app.services.change_feed import ChangeFeed
+from app.utils.serialization import APIResponse
+
+router = APIRouter()
+
+@router.get("/changes")
+async def get_changes(
+    since: Optional[str] = Query(None, description="Jeton 'next_token' de la synchronisation précédente (absent: tout)"),
+    limit: int = Query(500, ge=1, le=2000, description="Nombre maximal de changements"),
+    book: Optional[str] = Query(None, description="Ne synchroniser que ce livre (slug)")
+):
+    """Livres, textes et suppressions modifiés depuis un jeton de synchronisation"""
+    try:
+        async with get_db_session() as db:
+            changes = await ChangeFeed(db).changes(since, limit=limit, book_slug=book)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    
+    return APIResponse(changes, headers={"Cache-Control": "no-store"})
+
+@router.get("/token")
+async def get_current_token():
+    """Jeton de l'état actuel, après un téléchargement complet (export statique)"""
+    async with get_db_session() as db:
+        token = await ChangeFeed(db).current_token()
+    
+    return APIResponse({"token": token}, headers={"Cache-Control": "no-store"})
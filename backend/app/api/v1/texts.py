@@ -1,5 +1,7 @@
-from fastapi import APIRouter, HTTPException, Query, BackgroundTasks, Depends
+from fastapi import APIRouter, HTTPException, Query, BackgroundTasks, Depends, Header, Request, Response
+from fastapi.responses import StreamingResponse, RedirectResponse
 from typing import Optional, List
+import hashlib
 import sys
 from pathlib import Path
 from sqlmodel import Session, select, func
@@ -10,23 +12,113 @@ sys.path.append(str(backend_path))
 
 from app.services.sefaria_client import SefariaClient
 from app.services.sefaria_smart_import import import_missing_books
+from app.services.text_batch import TextBatchService
+from app.services.text_resolver import get_text_resolver, parse_ref, find_books
+from app.services.prefetcher import get_section_prefetcher
+from app.services.static_snapshot import get_static_snapshot
 from app.models.book import Book
-from app.models.text import Text
+from app.models.text import Text, TextBatchRequest
 from app.models.user import User, UserRole
 from app.core.deps import get_current_user
 from app.database import get_db_session
+from app.utils.serialization import APIResponse, dumps
+from app.utils.quotas import Quota, batch_sections
 
 router = APIRouter()
 client = SefariaClient()
+resolver = get_text_resolver()
+prefetcher = get_section_prefetcher()
+snapshot = get_static_snapshot()
+
+def _reader_key(request: Request) -> str:
+    """Clé de budget de préchargement: jeton (sans le vérifier) ou adresse du client"""
+    authorization = request.headers.get("authorization")
+    if authorization:
+        return "token:" + hashlib.sha256(authorization.encode()).hexdigest()[:16]
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+@router.get("/resolver/stats")
+async def get_text_resolver_stats():
+    """Taux de succès de chaque niveau de résolution des textes et du préchargement"""
+    return {**resolver.stats(), "prefetch": prefetcher.stats()}
+
+@router.get("/snapshot/manifest")
+async def get_snapshot_manifest():
+    """Redirige vers le manifeste de l'export statique des textes"""
+    if snapshot.manifest() is None:
+        raise HTTPException(status_code=404, detail="No static snapshot has been exported")
+    return RedirectResponse(snapshot.url("manifest.json"), status_code=307)
+
+@router.get("/snapshot/{book_slug}")
+async def get_book_snapshot(book_slug: str):
+    """Redirige vers le fichier statique contenant tout le livre"""
+    url = snapshot.bundle_url(book_slug)
+    if url is None:
+        raise HTTPException(status_code=404, detail=f"Book not in static snapshot: {book_slug}")
+    return RedirectResponse(url, status_code=307)
+
+@router.get("/snapshot/{book_slug}/{chapter}")
+async def get_chapter_snapshot(book_slug: str, chapter: int):
+    """Redirige vers le fichier statique d'un chapitre"""
+    url = snapshot.bundle_url(book_slug, chapter)
+    if url is None:
+        raise HTTPException(status_code=404, detail=f"Chapter not in static snapshot: {book_slug} {chapter}")
+    return RedirectResponse(url, status_code=307)
 
 @router.get("/{ref}")
-async def get_text(ref: str):
-    """Récupère un texte par référence"""
+async def get_text(ref: str, request: Request, response: Response):
+    """Récupère un texte par référence (local, Redis, base, puis Sefaria)"""
     try:
-        result = await client.get_text(ref)
-        if not result:
-            raise HTTPException(status_code=404, detail=f"Text not found: {ref}")
+        book_name, chapter, _ = parse_ref(ref)
+        async with get_db_session() as db:
+            result = await resolver.resolve(db, ref)
+            if not result:
+                raise HTTPException(status_code=404, detail=f"Text not found: {ref}")
+            
+            # Signaler le chapitre pré-rendu servi par nginx/CDN (export indexé par slug du livre)
+            if chapter is not None and snapshot.manifest() is not None:
+                try:
+                    book = (await find_books(db, [book_name])).get(book_name)
+                except Exception:
+                    book = None  # le texte reste servi sans l'en-tête
+                bundle_url = snapshot.bundle_url(book.slug, chapter) if book else None
+                if bundle_url:
+                    response.headers["Link"] = f'<{bundle_url}>; rel="alternate"; type="application/json"'
+        
+        # Précharger les sections suivantes en arrière-plan
+        prefetcher.schedule(ref, _reader_key(request))
         return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/batch")
+async def get_texts_batch(
+    batch: TextBatchRequest,
+    stream: bool = Query(False, description="Réponse NDJSON, une ligne par texte dès qu'il est résolu"),
+    accept: Optional[str] = Header(None),
+    quota: dict = Depends(Quota("text_sections", batch_sections))
+):
+    """Récupère une plage de chapitres ou une liste de références en une seule requête"""
+    # Forme et taille de la requête validées par TextBatchRequest, avant le décompte du quota
+    if stream or (accept and "application/x-ndjson" in accept):
+        async def ndjson():
+            async with get_db_session() as db:
+                async for _, item in TextBatchService(db, resolver).iter_texts(batch):
+                    yield dumps(item) + b"\n"
+        
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson", headers=quota)
+    
+    try:
+        async with get_db_session() as db:
+            texts = await TextBatchService(db, resolver).get_texts(batch)
+        
+        return APIResponse({
+            "texts": texts,
+            "total": len(texts),
+            "missing": [t["ref"] for t in texts if t.get("error")]
+        }, headers=quota)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -39,11 +131,11 @@ async def search_texts(
     """Recherche dans les textes"""
     try:
         results = await client.search_texts(q, books)
-        return {
+        return APIResponse({
             "query": q,
             "results": results[:limit],
             "total": len(results)
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import Response
 from pydantic import BaseModel
 from typing import Optional
@@ -38,6 +38,8 @@ except ImportError:
                 "message": "TTS service not configured"
             }
 
+from app.utils.quotas import Quota, text_length
+
 router = APIRouter()
 
 # Models
@@ -53,7 +55,7 @@ try:
 except:
     tts_manager = TTSManager()  # Mock manager
 
-@router.post("/synthesize")
+@router.post("/synthesize", dependencies=[Depends(Quota("tts_characters", text_length("text")))])
 async def synthesize_text(request: TTSRequest):
     """Convert text to speech"""
     try:
@@ -2,7 +2,7 @@
 Application configuration using Pydantic settings.
 """
 from functools import lru_cache
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pathlib import Path
 
 from pydantic import Field, field_validator
@@ -68,6 +68,15 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = Field(default="HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(default=30)
     REFRESH_TOKEN_EXPIRE_DAYS: int = Field(default=7)
+    REFRESH_TOKEN_REUSE_GRACE: int = Field(default=10, ge=0)
+    AUTH_REVOCATION_CHANNEL: str = Field(default="auth:revoked")
+    AUTH_REVOCATION_RESYNC_SECONDS: int = Field(default=300, ge=10)
+    PRINCIPAL_CACHE_SIZE: int = Field(default=10000, ge=0)
+    PRINCIPAL_CACHE_TTL: int = Field(default=30, ge=1)
+    PRINCIPAL_CACHE_REDIS_TTL: int = Field(default=300, ge=1)
+    PASSWORD_HASH_SCHEME: str = Field(default="bcrypt", pattern="^(bcrypt|argon2)$")
+    PASSWORD_HASH_WORKERS: int = Field(default=2, ge=1)
+    PASSWORD_HASH_MAX_PENDING: int = Field(default=64, ge=1)
     PASSWORD_RESET_EXPIRE_HOURS: int = Field(default=24)
     EMAIL_VERIFICATION_EXPIRE_HOURS: int = Field(default=24)
     
@@ -76,6 +85,8 @@ class Settings(BaseSettings):
     SEFARIA_API_VERSION: str = Field(default="v3")
     SEFARIA_RATE_LIMIT: int = Field(default=100)
     SEFARIA_RATE_WINDOW: int = Field(default=3600)
+    SEFARIA_MAX_CONCURRENCY: int = Field(default=8, ge=1)
+    TEXT_BATCH_MAX_REFS: int = Field(default=200, ge=1)
     
     # Google APIs
     GOOGLE_APPLICATION_CREDENTIALS: Optional[Path] = Field(default=None)
@@ -104,10 +115,40 @@ class Settings(BaseSettings):
     CHROMADB_EMBEDDING_MODEL: str = Field(
         default="sentence-transformers/all-MiniLM-L6-v2"
     )
-    
+
+    # Embedding pipeline ("google" remote API or "local" CHROMADB_EMBEDDING_MODEL)
+    EMBEDDING_BACKEND: str = Field(default="google", pattern="^(google|local)$")
+    EMBEDDING_BATCH_SIZE: int = Field(default=100, ge=1)
+    EMBEDDING_WORKERS: int = Field(default=2, ge=1)
+
+    # Hybrid retrieval (BM25 + vector, reciprocal rank fusion)
+    RETRIEVAL_CANDIDATES: int = Field(default=30, ge=1)
+    RETRIEVAL_RRF_K: int = Field(default=60, ge=1)
+    RETRIEVAL_MAX_RESULTS: int = Field(default=5, ge=1)
+    RETRIEVAL_MAX_CONTEXT_TOKENS: int = Field(default=1500, ge=64)
+    
+    # Chat memory
+    CHAT_MEMORY_RECENT_TURNS: int = Field(default=6, ge=1)
+    CHAT_PROMPT_MAX_TOKENS: int = Field(default=6000, ge=512)
+    CHAT_SUMMARY_MAX_TOKENS: int = Field(default=600, ge=64)
+
     # Cache Settings
     CACHE_TTL_DEFAULT: int = Field(default=3600)
     CACHE_TTL_TEXTS: int = Field(default=86400)
+    TEXT_LOCAL_CACHE_SIZE: int = Field(default=2048, ge=0)
+    TEXT_LOCAL_CACHE_TTL: int = Field(default=300, ge=1)
+
+    # Next-section prefetching
+    PREFETCH_ENABLED: bool = Field(default=True)
+    PREFETCH_AHEAD: int = Field(default=3, ge=1, le=20)
+    PREFETCH_USER_PER_MINUTE: int = Field(default=30, ge=1)
+    PREFETCH_GLOBAL_PER_MINUTE: int = Field(default=300, ge=1)
+    PREFETCH_MAX_INFLIGHT: int = Field(default=4, ge=1)
+    PREFETCH_TTS: bool = Field(default=False)
+
+    # Static corpus snapshot (served by nginx/CDN; a path is also mounted by the API)
+    STATIC_SNAPSHOT_DIR: Path = Field(default=Path("./data/static_texts"))
+    STATIC_SNAPSHOT_URL: str = Field(default="/static/texts")
     CACHE_TTL_AUDIO: int = Field(default=604800)
     CACHE_TTL_TRANSLATIONS: int = Field(default=2592000)
     
@@ -129,7 +170,20 @@ class Settings(BaseSettings):
     ENABLE_WEBSOCKET: bool = Field(default=True)
     ENABLE_BACKGROUND_WORKERS: bool = Field(default=True)
     ENABLE_RATE_LIMITING: bool = Field(default=False)
+    RATE_LIMIT_REQUESTS: int = Field(default=100, ge=1)
+    RATE_LIMIT_WINDOW: int = Field(default=60, ge=1)
+    # Cost-weighted quotas: units per QUOTA_WINDOW by quota and plan (role or
+    # "guest"); a plan left out of a quota is unlimited
+    QUOTA_WINDOW: int = Field(default=86400, ge=1)
+    QUOTA_BUDGETS: Dict[str, Dict[str, int]] = Field(default={
+        "gemini_tokens": {"guest": 20000, "student": 200000, "scholar": 1000000},
+        "tts_characters": {"guest": 5000, "student": 100000, "scholar": 500000},
+        "text_sections": {"guest": 2000, "student": 20000, "scholar": 100000},
+    })
+    QUOTA_CHARS_PER_TOKEN: int = Field(default=4, ge=1)
+    QUOTA_GEMINI_RESPONSE_TOKENS: int = Field(default=800, ge=0)
     ENABLE_METRICS: bool = Field(default=True)
+    LATENCY_WINDOW_MINUTES: int = Field(default=5, ge=1)
     
     # Paths
     DATA_DIR: Path = Field(default=Path("./data"))
@@ -138,6 +192,14 @@ class Settings(BaseSettings):
     # Monitoring (Optional)
     SENTRY_DSN: Optional[str] = Field(default=None)
     DATADOG_API_KEY: Optional[str] = Field(default=None)
+    # Distributed tracing (OpenTelemetry). Exporter "otlp" sends to a local
+    # collector over HTTP, "file" writes one JSON span per line
+    TRACING_ENABLED: bool = Field(default=False)
+    TRACING_EXPORTER: str = Field(default="otlp", pattern="^(otlp|file|console|none)$")
+    TRACING_SAMPLE_RATE: float = Field(default=1.0, ge=0.0, le=1.0)
+    TRACING_OTLP_ENDPOINT: str = Field(default="http://localhost:4318/v1/traces")
+    TRACING_FILE: Path = Field(default=Path("./logs/traces.jsonl"))
+    TRACING_SERVICE_NAME: str = Field(default="breslev-torah-api")
     
     @field_validator("CORS_ORIGINS", mode="before")
     @classmethod
@@ -6,8 +6,9 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
-from app.core.security import verify_token
 from app.models.user import User
+from app.services.principal_cache import get_principal_cache
+from app.services.token_verifier import get_token_verifier
 from app.services.user import UserService
 
 # Security scheme
@@ -52,7 +53,7 @@ async def get_current_user(
         raise credentials_exception
     
     token = credentials.credentials
-    payload = verify_token(token)
+    payload = await get_token_verifier().verify(token)
     
     if payload is None:
         raise credentials_exception
@@ -62,7 +63,9 @@ async def get_current_user(
         raise credentials_exception
     
     user_service = UserService(db)
-    user = await user_service.get_user_by_id(int(user_id))
+    user = await get_principal_cache().get(
+        int(user_id), lambda: user_service.get_user_by_id(int(user_id))
+    )
     
     if user is None:
         raise credentials_exception
@@ -185,7 +188,7 @@ async def get_optional_current_user(
     
     try:
         token = credentials.credentials
-        payload = verify_token(token)
+        payload = await get_token_verifier().verify(token)
         
         if payload is None:
             return None
@@ -195,7 +198,9 @@ async def get_optional_current_user(
             return None
         
         user_service = UserService(db)
-        user = await user_service.get_user_by_id(int(user_id))
+        user = await get_principal_cache().get(
+            int(user_id), lambda: user_service.get_user_by_id(int(user_id))
+        )
         
         return user
     except Exception:
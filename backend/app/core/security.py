@@ -1,6 +1,7 @@
 """
 Security utilities for authentication and authorization.
 """
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from jose import JWTError, jwt
@@ -30,7 +31,7 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow(), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     
     return encoded_jwt
@@ -54,7 +55,7 @@ def create_refresh_token(data: Dict[str, Any], expires_delta: Optional[timedelta
     else:
         expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
     
-    to_encode.update({"exp": expire, "type": "refresh"})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow(), "jti": uuid.uuid4().hex, "type": "refresh"})
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     
     return encoded_jwt
@@ -62,7 +63,10 @@ def create_refresh_token(data: Dict[str, Any], expires_delta: Optional[timedelta
 
 def verify_token(token: str) -> Optional[Dict[str, Any]]:
     """
-    Verify and decode a JWT token.
+    Verify and decode a JWT token (signature and expiry only).
+    
+    Request authentication goes through TokenVerifier, which also checks
+    the token type and revocation.
     
     Args:
         token: The JWT token to verify
@@ -46,7 +46,7 @@ async def init_db():
     """
     async with engine.begin() as conn:
         # Import all models to register them
-        from app.models import user, book, text, chat  # noqa
+        from app.models import user, book, text, chat, sync  # noqa
         
         # Create all tables
         await conn.run_sync(SQLModel.metadata.create_all)
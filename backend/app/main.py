@@ -1,14 +1,36 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.v1 import texts, books, gemini, tts, auth, enhanced_tts
+from fastapi.staticfiles import StaticFiles
+from app.api.v1 import texts, books, gemini, tts, auth, enhanced_tts, sync
 from app.core.config import settings
+from app.middleware.http_cache import HTTPCacheMiddleware
+from app.middleware.security import RateLimitMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.database import engine
+from app.services.password_hasher import get_password_hasher
+from app.services.token_verifier import get_token_verifier
+from app.utils.monitoring import render_metrics, mark_process_dead, get_health_metrics
+from app.utils.serialization import APIResponse, ContentNegotiationMiddleware
+from app.utils.tracing import setup_tracing, shutdown_tracing, instrument_sqlalchemy
+
+# Traces OpenTelemetry: FastAPI crée une span par requête, parente des spans
+# SQL, Redis, HTTP et API externes (Prometheus reste la source des métriques)
+if setup_tracing():
+    instrument_sqlalchemy(engine)
 
 app = FastAPI(
     title="Breslev Torah API",
     description="API pour l'étude des textes de Rabbi Nachman avec IA",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=APIResponse,
+    telemetry={"metrics": False, "exclude": lambda scope: scope.get("path") == "/metrics"}
 )
 
+# Limitation de débit par utilisateur ou IP (GCRA dans Redis), sous CORS
+# pour que les réponses 429 restent lisibles par le navigateur
+if settings.ENABLE_RATE_LIMITING:
+    app.add_middleware(RateLimitMiddleware)
+
 # CORS pour Next.js
 app.add_middleware(
     CORSMiddleware,
@@ -18,6 +40,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ETag, 304, compression et Cache-Control des réponses GET
+app.add_middleware(HTTPCacheMiddleware)
+
+# JSON (orjson) ou MessagePack selon l'en-tête Accept
+app.add_middleware(ContentNegotiationMiddleware)
+
+# Métriques Prometheus de toutes les requêtes (le plus à l'extérieur, pour tout mesurer)
+if settings.ENABLE_METRICS:
+    app.add_middleware(MetricsMiddleware, routes=app.routes)
+
 # Routes API v1
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(texts.router, prefix="/api/v1/texts", tags=["texts"])
@@ -25,6 +57,16 @@ app.include_router(books.router, prefix="/api/v1/books", tags=["books"])
 app.include_router(gemini.router, prefix="/api/v1/gemini", tags=["gemini"])
 app.include_router(tts.router, prefix="/api/v1/tts", tags=["tts"])
 app.include_router(enhanced_tts.router, prefix="/api/v1", tags=["enhanced-tts"])
+app.include_router(sync.router, prefix="/api/v1/sync", tags=["sync"])
+
+# Export statique des textes (en production servi directement par nginx ou un CDN)
+if settings.STATIC_SNAPSHOT_URL.startswith("/"):
+    settings.STATIC_SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    app.mount(
+        settings.STATIC_SNAPSHOT_URL,
+        StaticFiles(directory=settings.STATIC_SNAPSHOT_DIR),
+        name="static-texts"
+    )
 
 @app.get("/")
 async def root():
@@ -34,6 +76,35 @@ async def root():
 async def health():
     return {"status": "healthy", "api": "v1"}
 
+@app.get("/health/metrics")
+async def health_metrics():
+    """Percentiles de latence, taux d'erreur, taux de succès des caches et sondes DB/Redis"""
+    return await get_health_metrics()
+
+if settings.ENABLE_METRICS:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        body, media_type = render_metrics()
+        return Response(body, media_type=media_type)
+
+    @app.on_event("shutdown")
+    async def release_metrics():
+        mark_process_dead()
+
+@app.on_event("shutdown")
+async def flush_traces():
+    shutdown_tracing()
+
+# Arrêt des processus de hachage des mots de passe
+@app.on_event("shutdown")
+async def stop_password_hasher():
+    get_password_hasher().close()
+
+# Arrêt de l'écoute des révocations de jetons
+@app.on_event("shutdown")
+async def stop_token_verifier():
+    await get_token_verifier().stop()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
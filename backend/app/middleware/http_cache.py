@@ -0,0 +1,211 @@
+"""
+HTTP caching and compression middleware.
+
+For successful GET responses with a known length this middleware:
+- adds a content-based strong ETag (unless the route set one) and answers
+  matching ``If-None-Match`` requests with 304;
+- compresses bodies above a size threshold with brotli (when the ``brotli``
+  package is installed) or gzip, keeping recent compressed bodies in a
+  small LRU so immutable texts are not recompressed on every request;
+- sets route-specific ``Cache-Control`` and ``Vary`` so a CDN or reverse
+  proxy can cache the responses.
+
+Streaming responses (NDJSON, SSE, audio) have no Content-Length and pass
+through untouched.
+"""
+import gzip
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.config import settings
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+
+# (path pattern, Cache-Control) pairs, first match wins; routes may set their own header
+DEFAULT_CACHE_RULES: List[Tuple[str, str]] = [
+    (r"^/api/v1/texts/resolver/", "no-store"),
+    (r"^/api/v1/texts/search/", "public, max-age=300"),
+    (r"^/api/v1/texts/books/", "no-cache"),
+    (r"^/api/v1/texts/[^/]+$", "public, max-age=86400, stale-while-revalidate=604800"),
+    (r"^/api/v1/books/all$", "no-cache"),
+    (r"^/api/v1/books/[^/]+$", "public, max-age=3600, stale-while-revalidate=86400"),
+]
+
+
+def static_snapshot_rules(url: str) -> List[Tuple[str, str]]:
+    """Cache rules for the static text snapshot when the app serves it (``url`` is a path)."""
+    if not url.startswith("/"):
+        return []
+    prefix = re.escape(url.rstrip("/"))
+    return [
+        (rf"^{prefix}/manifest\.json$", "no-cache"),
+        (rf"^{prefix}/", "public, max-age=31536000, immutable"),
+    ]
+
+
+DEFAULT_CACHE_RULES += static_snapshot_rules(settings.STATIC_SNAPSHOT_URL)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "text/", "application/javascript", "application/xml")
+
+# Responses larger than this are passed through unmodified rather than buffered
+MAX_BUFFERED_BYTES = 16 * 1024 * 1024
+
+_ENCODING_SUFFIXES = ("-br", "-gzip")
+
+
+def _strip_encoding(etag: str) -> str:
+    """Map the ETag of a compressed variant back to the identity ETag."""
+    weak = etag.startswith("W/")
+    tag = etag[2:] if weak else etag
+    for suffix in _ENCODING_SUFFIXES:
+        if tag.endswith(f'{suffix}"'):
+            tag = tag[:-len(suffix) - 1] + '"'
+            break
+    return tag
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(_strip_encoding(tag) == etag for tag in candidates)
+
+
+def _accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header (q=0 excludes)."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+
+    if BROTLI_AVAILABLE and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class HTTPCacheMiddleware(BaseHTTPMiddleware):
+    """ETag, conditional GET, compression and Cache-Control for API responses."""
+
+    def __init__(
+        self,
+        app,
+        rules: Optional[List[Tuple[str, str]]] = None,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 5,
+        compressed_cache_size: int = 512
+    ):
+        super().__init__(app)
+        self.rules = [(re.compile(pattern), value) for pattern, value in (rules or DEFAULT_CACHE_RULES)]
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.compressed_cache_size = compressed_cache_size
+        self._compressed: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+
+    def _cache_control(self, path: str) -> Optional[str]:
+        for pattern, value in self.rules:
+            if pattern.search(path):
+                return value
+        return None
+
+    def _compress(self, body: bytes, encoding: str, etag: str) -> bytes:
+        key = (etag, encoding)
+        cached = self._compressed.get(key)
+        if cached is not None:
+            self._compressed.move_to_end(key)
+            return cached
+
+        if encoding == "br":
+            compressed = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=self.gzip_level)
+
+        self._compressed[key] = compressed
+        if len(self._compressed) > self.compressed_cache_size:
+            self._compressed.popitem(last=False)
+        return compressed
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        response = await call_next(request)
+
+        if request.method != "GET" or response.status_code != 200:
+            return response
+
+        content_length = response.headers.get("content-length")
+        if content_length is None or int(content_length) > MAX_BUFFERED_BYTES:
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+
+        etag = response.headers.get("etag")
+        if etag is None:
+            etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+        cache_control = response.headers.get("cache-control") or self._cache_control(request.url.path)
+        content_type = response.headers.get("content-type", "")
+        compressible = (
+            "content-encoding" not in response.headers
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+        )
+
+        vary = [v.strip() for v in response.headers.get("vary", "").split(",") if v.strip()]
+        if compressible and "Accept-Encoding" not in vary:
+            vary.append("Accept-Encoding")
+
+        headers = [
+            (name, value) for name, value in response.headers.raw
+            if name not in (b"content-length", b"etag", b"cache-control", b"vary")
+        ]
+
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            not_modified = Response(status_code=304)
+            not_modified.raw_headers = [
+                (name, value) for name, value in headers if name != b"content-type"
+            ]
+            self._set_caching_headers(not_modified, etag, cache_control, vary)
+            return not_modified
+
+        encoding = None
+        if compressible and len(body) >= self.minimum_size:
+            encoding = _accepted_encoding(request.headers.get("accept-encoding", ""))
+
+        if encoding:
+            body = self._compress(body, encoding, etag)
+            etag = etag[:-1] + ("-br" if encoding == "br" else "-gzip") + '"'
+
+        new_response = Response(content=body, status_code=response.status_code)
+        new_response.raw_headers = headers + [(b"content-length", str(len(body)).encode("latin-1"))]
+        if encoding:
+            new_response.headers["Content-Encoding"] = encoding
+        self._set_caching_headers(new_response, etag, cache_control, vary)
+        return new_response
+
+    @staticmethod
+    def _set_caching_headers(response: Response, etag: str, cache_control: Optional[str], vary: List[str]) -> None:
+        response.headers["ETag"] = etag
+        if cache_control:
+            response.headers["Cache-Control"] = cache_control
+        if vary:
+            response.headers["Vary"] = ", ".join(vary)
@@ -0,0 +1,132 @@
+"""
+Request metrics middleware.
+
+Records, for every HTTP request, the latency, the response size and the
+number of requests in flight in Prometheus metrics labelled by method,
+route template (``/api/v1/texts/{ref}``, not the concrete path) and status
+code, and feeds the rolling latency tracker behind the health metrics.
+Requests that match no route share the ``unmatched`` label so that scanners
+cannot blow up the number of series.
+
+It is a plain ASGI middleware: it only observes the ``http.response.*``
+messages and never buffers or wraps the body, so streaming responses are
+measured until their last chunk.
+"""
+import time
+from collections import OrderedDict
+from typing import List, Optional, Pattern, Set, Tuple
+
+from starlette.routing import BaseRoute, Mount, compile_path
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.monitoring import (
+    http_request_duration,
+    http_requests_in_progress,
+    http_requests_total,
+    http_response_size,
+)
+from app.utils.latency_tracker import get_latency_tracker
+
+try:
+    # Recent FastAPI keeps included routers unflattened in app.routes
+    from fastapi.routing import iter_route_contexts
+except ImportError:
+    iter_route_contexts = None
+
+UNMATCHED = "unmatched"
+
+
+def _route_table(routes: List[BaseRoute]) -> List[Tuple[Pattern, str, Optional[Set[str]]]]:
+    """(path regex, template, methods) of every route, included routers flattened."""
+    if iter_route_contexts is not None:
+        entries = [(c.path, c.methods, c.original_route) for c in iter_route_contexts(routes)]
+    else:
+        entries = [(getattr(r, "path", None), getattr(r, "methods", None), r) for r in routes]
+
+    table = []
+    for path, methods, route in entries:
+        if not path:
+            continue
+        if isinstance(route, Mount):
+            regex, _, _ = compile_path(path.rstrip("/") + "/{path:path}")
+        else:
+            regex, _, _ = compile_path(path)
+        table.append((regex, path, methods))
+    return table
+
+
+class MetricsMiddleware:
+    """Prometheus metrics per method, route template and status."""
+
+    # Resolved templates kept per (method, path)
+    CACHE_SIZE = 4096
+
+    def __init__(self, app: ASGIApp, routes: List[BaseRoute], excluded: Tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.tracker = get_latency_tracker()
+        self.routes = routes
+        self.excluded = excluded
+        self._table: List[Tuple[Pattern, str, Optional[Set[str]]]] = []
+        self._table_size = -1
+        self._templates: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+
+    def _template(self, scope: Scope) -> str:
+        if len(self.routes) != self._table_size:
+            # Routes are registered after the middleware; rebuild when they change
+            self._table = _route_table(self.routes)
+            self._table_size = len(self.routes)
+            self._templates.clear()
+
+        method, path = scope["method"], scope["path"]
+        key = (method, path)
+        template = self._templates.get(key)
+        if template is not None:
+            self._templates.move_to_end(key)
+            return template
+
+        template = UNMATCHED
+        for regex, route_template, methods in self._table:
+            if not regex.match(path):
+                continue
+            if methods is None or method in methods:
+                template = route_template
+                break
+            if template == UNMATCHED:
+                # Path matches but not the method (405): keep looking for a full match
+                template = route_template
+
+        self._templates[key] = template
+        if len(self._templates) > self.CACHE_SIZE:
+            self._templates.popitem(last=False)
+        return template
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.excluded:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        endpoint = self._template(scope)
+        status = "500"
+        size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        in_progress = http_requests_in_progress.labels(method=method, endpoint=endpoint)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            in_progress.dec()
+            http_requests_total.labels(method=method, endpoint=endpoint, status=status).inc()
+            http_request_duration.labels(method=method, endpoint=endpoint, status=status).observe(duration)
+            http_response_size.labels(method=method, endpoint=endpoint, status=status).observe(size)
+            self.tracker.record(f"{method} {endpoint}", duration, error=status.startswith("5"))
@@ -1,6 +1,7 @@
 """
 Security middleware for FastAPI application.
 """
+import math
 import time
 import uuid
 from typing import Callable, Optional
@@ -15,6 +16,7 @@ from starlette.responses import JSONResponse
 from app.config import settings
 from app.redis_client import redis_client
 from app.utils.logger import setup_logger
+from app.utils.rate_limiter import RateLimiter
 
 logger = setup_logger(__name__)
 
@@ -57,13 +59,19 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """
-    Rate limiting middleware using Redis.
+    Rate limiting middleware using Redis (GCRA, one round trip per request).
     """
     
-    def __init__(self, app, rate_limit: int = 100, window: int = 60):
+    def __init__(
+        self,
+        app,
+        rate_limit: int = settings.RATE_LIMIT_REQUESTS,
+        window: int = settings.RATE_LIMIT_WINDOW
+    ):
         super().__init__(app)
         self.rate_limit = rate_limit
         self.window = window  # seconds
+        self.limiter = RateLimiter(max_requests=rate_limit, window_seconds=window)
     
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         # Skip rate limiting for health checks
@@ -74,29 +82,28 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         client_id = self.get_client_id(request)
         
         # Check rate limit
-        if not await self.check_rate_limit(client_id):
+        result = await self.limiter.check(client_id)
+        headers = {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(result.remaining),
+            "X-RateLimit-Reset": str(int(time.time() + result.reset_after)),
+        }
+        if not result.allowed:
+            retry_after = max(1, math.ceil(result.retry_after))
             return JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={
                     "detail": "Rate limit exceeded. Please try again later.",
-                    "retry_after": self.window
+                    "retry_after": retry_after
                 },
-                headers={
-                    "Retry-After": str(self.window),
-                    "X-RateLimit-Limit": str(self.rate_limit),
-                    "X-RateLimit-Remaining": "0",
-                    "X-RateLimit-Reset": str(int(time.time()) + self.window),
-                }
+                headers={"Retry-After": str(retry_after), **headers}
             )
         
         # Process request
         response = await call_next(request)
         
         # Add rate limit headers
-        remaining = await self.get_remaining_requests(client_id)
-        response.headers["X-RateLimit-Limit"] = str(self.rate_limit)
-        response.headers["X-RateLimit-Remaining"] = str(remaining)
-        response.headers["X-RateLimit-Reset"] = str(int(time.time()) + self.window)
+        response.headers.update(headers)
         
         return response
     
@@ -115,39 +122,6 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             client_host = forwarded.split(",")[0].strip()
         
         return f"ip:{client_host}"
-    
-    async def check_rate_limit(self, client_id: str) -> bool:
-        """Check if client has exceeded rate limit."""
-        key = f"rate_limit:{client_id}"
-        
-        try:
-            # Increment counter
-            count = await redis_client.incr(key)
-            
-            # Set expiration on first request
-            if count == 1:
-                await redis_client.expire(key, self.window)
-            
-            return count <= self.rate_limit
-            
-        except Exception as e:
-            logger.error(f"Rate limit check error: {e}")
-            # Allow request on error
-            return True
-    
-    async def get_remaining_requests(self, client_id: str) -> int:
-        """Get remaining requests for client."""
-        key = f"rate_limit:{client_id}"
-        
-        try:
-            count = await redis_client.get(key)
-            if count:
-                remaining = self.rate_limit - int(count)
-                return max(0, remaining)
-            return self.rate_limit
-            
-        except Exception:
-            return self.rate_limit
 
 
 class RequestValidationMiddleware(BaseHTTPMiddleware):
@@ -4,9 +4,10 @@ Database models for the Breslev Torah Online application.
 from app.models.user import User
 from app.models.book import Book
 from app.models.text import Text
-from app.models.chat import ChatMessage, ChatSession
+from app.models.chat import ChatMessage, ChatSession, ChatDailyRollup
 from app.models.bookmark import Bookmark
 from app.models.study_progress import StudyProgress
+from app.models.sync import ContentTombstone
 
 __all__ = [
     "User",
@@ -14,6 +15,8 @@ __all__ = [
     "Text",
     "ChatMessage",
     "ChatSession",
+    "ChatDailyRollup",
     "Bookmark",
     "StudyProgress",
+    "ContentTombstone",
 ]
\ No newline at end of file
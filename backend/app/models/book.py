@@ -8,6 +8,8 @@ from enum import Enum
 from sqlmodel import Field, SQLModel, Relationship, Column
 from sqlalchemy import JSON
 
+from app.models.sync import revision_column, xact_id_column
+
 
 class BookCategory(str, Enum):
     """Book category enumeration."""
@@ -52,6 +54,10 @@ class Book(BookBase, table=True):
     
     id: int = Field(default=None, primary_key=True)
     
+    # Delta sync (maintained by database triggers, see app.models.sync)
+    revision: Optional[int] = Field(default=None, sa_column=revision_column())
+    xact_id: Optional[int] = Field(default=None, sa_column=xact_id_column())
+    
     # Relationships
     bookmarks: List["Bookmark"] = Relationship(back_populates="book")
     texts: List["Text"] = Relationship(back_populates="book")
@@ -1,12 +1,13 @@
 """
 Chat model and related schemas.
 """
-from datetime import datetime
+from datetime import datetime, date
 from typing import Optional, Dict, Any, List
 from uuid import UUID, uuid4
 from enum import Enum
 
-from sqlmodel import SQLModel, Field
+from sqlmodel import SQLModel, Field, Column
+from sqlalchemy import JSON, Date, Index
 
 
 class ChatRole(str, Enum):
@@ -27,6 +28,9 @@ class ChatMessageBase(SQLModel):
 class ChatMessage(ChatMessageBase, table=True):
     """Chat message table model."""
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index("ix_chat_messages_session_created_id", "session_id", "created_at", "id"),
+    )
     
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -89,6 +93,9 @@ class ChatResponse(SQLModel):
 class ChatSession(SQLModel, table=True):
     """Chat session table model."""
     __tablename__ = "chat_sessions"
+    __table_args__ = (
+        Index("ix_chat_sessions_user_activity_id", "user_id", "last_activity", "id"),
+    )
     
     id: str = Field(primary_key=True, max_length=100)
     user_id: UUID = Field(index=True)
@@ -101,6 +108,37 @@ class ChatSession(SQLModel, table=True):
     total_messages: int = Field(default=0)
     last_activity: datetime = Field(default_factory=datetime.utcnow)
 
+    # Rolling conversation memory
+    summary: Optional[str] = Field(default=None)
+    # (created_at, id) of the last message folded into the summary
+    summarized_until: Optional[datetime] = Field(default=None)
+    summarized_until_id: Optional[UUID] = Field(default=None)
+
+
+class ChatDailyRollup(SQLModel, table=True):
+    """Per user per day chat aggregates, maintained incrementally."""
+    __tablename__ = "chat_daily_rollups"
+    
+    user_id: UUID = Field(primary_key=True)
+    day: date = Field(sa_column=Column(Date, primary_key=True))
+    
+    # Volume
+    messages: int = Field(default=0)
+    assistant_messages: int = Field(default=0)
+    sessions: int = Field(default=0)
+    tokens_used: int = Field(default=0)
+    
+    # Latency (sum/count for the mean, bucket counts for percentiles)
+    response_time_sum_ms: int = Field(default=0)
+    response_time_count: int = Field(default=0)
+    response_time_histogram: List[int] = Field(default_factory=list, sa_column=Column(JSON))
+    
+    # Ratings
+    ratings_count: int = Field(default=0)
+    ratings_sum: int = Field(default=0)
+    
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
 
 class ChatSessionCreate(SQLModel):
     """Schema for creating chat sessions."""
@@ -119,6 +157,21 @@ class ChatSessionRead(SQLModel):
     is_active: bool
 
 
+class ChatSessionPage(SQLModel):
+    """Keyset page of chat sessions, most recently active first."""
+    items: List[ChatSessionRead]
+    next_cursor: Optional[str] = None
+
+
+class ChatMessagePage(SQLModel):
+    """Keyset page of chat messages in chronological order.
+
+    ``next_cursor`` points to the page of older messages.
+    """
+    items: List[ChatMessageRead]
+    next_cursor: Optional[str] = None
+
+
 class ChatCitation(SQLModel):
     """Schema for chat citations."""
     index: int
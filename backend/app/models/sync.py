@@ -0,0 +1,130 @@
+"""
+Change tracking for the delta sync feed.
+
+Every insert or update of ``books`` and ``texts`` takes a new value of the
+global ``content_revision_seq`` sequence and records the writing
+transaction id, and every delete leaves a ``content_tombstones`` row, all
+from database triggers so that imports, scripts and the API are tracked
+alike. The triggers are created by the migration and, for databases built
+with ``init_db``, after ``create_all``.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import BigInteger, Column, DDL, Index, Sequence, event, text
+from sqlmodel import SQLModel, Field
+
+CONTENT_REVISION_SEQ = Sequence("content_revision_seq", metadata=SQLModel.metadata)
+
+
+def revision_column() -> Column:
+    """Revision of a tracked row, set by the content_revision_bump trigger."""
+    return Column(
+        BigInteger,
+        server_default=CONTENT_REVISION_SEQ.next_value(),
+        nullable=False,
+        index=True
+    )
+
+
+def xact_id_column() -> Column:
+    """Id of the transaction that last wrote a tracked row."""
+    return Column(BigInteger, server_default=text("txid_current()"), nullable=False, index=True)
+
+
+class ContentTombstone(SQLModel, table=True):
+    """Deleted book or text, kept so offline clients can drop their copy."""
+    __tablename__ = "content_tombstones"
+    __table_args__ = (
+        Index("ix_content_tombstones_xact_id", "xact_id"),
+    )
+
+    revision: int = Field(sa_column=Column(BigInteger, primary_key=True, autoincrement=False))
+    entity: str = Field(max_length=10)  # "book" or "text"
+    entity_id: str = Field(max_length=64)
+    key: str = Field(max_length=200)  # slug of a book, ref of a text
+    book_slug: Optional[str] = Field(default=None, max_length=100, index=True)
+    xact_id: int = Field(sa_column=Column(BigInteger, nullable=False))
+    deleted_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+# Trigger functions shared by the migration and init_db.
+# content_revision_bump(ignored columns...): new revision on insert and on any
+# update that changes a column other than the ignored ones.
+REVISION_BUMP_FUNCTION = """
+CREATE OR REPLACE FUNCTION content_revision_bump() RETURNS trigger AS $$
+DECLARE
+    ignored text[] := COALESCE(TG_ARGV, ARRAY[]::text[]);
+BEGIN
+    IF TG_OP = 'UPDATE' AND
+       (to_jsonb(NEW) - ignored - 'revision' - 'xact_id' - 'updated_at')
+       = (to_jsonb(OLD) - ignored - 'revision' - 'xact_id' - 'updated_at') THEN
+        RETURN NEW;
+    END IF;
+    NEW.revision := nextval('content_revision_seq');
+    NEW.xact_id := txid_current();
+    IF TG_OP = 'UPDATE' THEN
+        NEW.updated_at := timezone('utc', now());
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# content_tombstone(entity, key column, book slug column)
+TOMBSTONE_FUNCTION = """
+CREATE OR REPLACE FUNCTION content_tombstone() RETURNS trigger AS $$
+DECLARE
+    old_row jsonb := to_jsonb(OLD);
+BEGIN
+    INSERT INTO content_tombstones (revision, entity, entity_id, key, book_slug, xact_id, deleted_at)
+    VALUES (
+        nextval('content_revision_seq'),
+        TG_ARGV[0],
+        old_row ->> 'id',
+        old_row ->> TG_ARGV[1],
+        old_row ->> TG_ARGV[2],
+        txid_current(),
+        timezone('utc', now())
+    );
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+TRIGGERS = {
+    "books": (
+        "BEFORE INSERT OR UPDATE ON books FOR EACH ROW "
+        "EXECUTE FUNCTION content_revision_bump('view_count', 'bookmark_count')",
+        "AFTER DELETE ON books FOR EACH ROW "
+        "EXECUTE FUNCTION content_tombstone('book', 'slug', 'slug')",
+    ),
+    "texts": (
+        "BEFORE INSERT OR UPDATE ON texts FOR EACH ROW "
+        "EXECUTE FUNCTION content_revision_bump()",
+        "AFTER DELETE ON texts FOR EACH ROW "
+        "EXECUTE FUNCTION content_tombstone('text', 'ref', 'book_slug')",
+    ),
+}
+
+
+def trigger_statements():
+    """SQL creating the trigger functions and the triggers of both tables."""
+    yield REVISION_BUMP_FUNCTION
+    yield TOMBSTONE_FUNCTION
+    for table, (bump, tombstone) in TRIGGERS.items():
+        yield f"CREATE TRIGGER {table}_revision {bump}"
+        yield f"CREATE TRIGGER {table}_tombstone {tombstone}"
+
+
+def _create_triggers(target, connection, **kw) -> None:
+    if connection.dialect.name != "postgresql":
+        return
+    tables = {table.name for table in kw.get("tables", [])}
+    if not {"books", "texts", "content_tombstones"} <= tables:
+        return
+    for statement in trigger_statements():
+        connection.execute(DDL(statement))
+
+
+event.listen(SQLModel.metadata, "after_create", _create_triggers)
@@ -5,12 +5,16 @@ from datetime import datetime
 from typing import Optional, List, Dict, Any
 from uuid import UUID, uuid4
 
+from pydantic import model_validator
 from sqlmodel import SQLModel, Field, Relationship
 
+from app.config import settings
+from app.models.sync import revision_column, xact_id_column
+
 
 class TextBase(SQLModel):
     """Base text fields."""
-    ref: str = Field(index=True, max_length=200)  # e.g., "Likutei_Moharan.1.5"
+    ref: str = Field(index=True, unique=True, max_length=200)  # e.g., "Likutei_Moharan.1.5"
     book_slug: str = Field(index=True, max_length=100)
     chapter: Optional[int] = Field(default=None, index=True)
     verse: Optional[int] = Field(default=None, index=True)
@@ -42,6 +46,10 @@ class Text(TextBase, table=True):
     # Sefaria metadata
     sefaria_data: Optional[str] = Field(default=None)  # JSON string
     
+    # Delta sync (maintained by database triggers, see app.models.sync)
+    revision: Optional[int] = Field(default=None, sa_column=revision_column())
+    xact_id: Optional[int] = Field(default=None, sa_column=xact_id_column())
+    
     # Relationships
     book_id: Optional[int] = Field(default=None, foreign_key="books.id")
     book: Optional["Book"] = Relationship(back_populates="texts")
@@ -98,6 +106,30 @@ class TextRange(SQLModel):
     language: str = Field(default="he")
 
 
+class TextBatchRequest(SQLModel):
+    """Schema for fetching several texts at once: a chapter range or a list of refs."""
+    range: Optional[TextRange] = None
+    refs: Optional[List[str]] = Field(default=None, min_length=1)
+    
+    @model_validator(mode='after')
+    def validate_batch(self):
+        """Exactly one of range or refs, in order and within TEXT_BATCH_MAX_REFS."""
+        if (self.range is None) == (self.refs is None):
+            raise ValueError("Provide exactly one of 'range' or 'refs'")
+        if self.range is not None and self.range.end_chapter < self.range.start_chapter:
+            raise ValueError("end_chapter must be >= start_chapter")
+        if self.size > settings.TEXT_BATCH_MAX_REFS:
+            raise ValueError(f"Batch too large: {self.size} > {settings.TEXT_BATCH_MAX_REFS}")
+        return self
+    
+    @property
+    def size(self) -> int:
+        """Number of sections requested."""
+        if self.range is not None:
+            return self.range.end_chapter - self.range.start_chapter + 1
+        return len(self.refs or [])
+
+
 class TextTranslation(SQLModel):
     """Schema for text translations."""
     ref: str
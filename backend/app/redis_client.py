@@ -10,6 +10,7 @@ from redis.exceptions import RedisError
 
 from app.config import settings
 from app.utils.logger import setup_logger
+from app.utils.tracing import instrument_redis
 
 logger = setup_logger(__name__)
 
@@ -36,6 +37,7 @@ class RedisClient:
                 retry_on_timeout=True,
                 health_check_interval=30,
             )
+            instrument_redis(self._client)
             
             # Test connection
             await self._client.ping()
@@ -45,6 +47,16 @@ class RedisClient:
             logger.error(f"Failed to connect to Redis: {e}")
             raise
     
+    @property
+    def is_connected(self) -> bool:
+        """Whether initialize() has created the connection pool."""
+        return self._client is not None
+    
+    @property
+    def client(self) -> redis.Redis:
+        """Underlying client, for pipelines and commands without a wrapper."""
+        return self._client
+    
     async def close(self):
         """Close Redis connection."""
         if self._pubsub:
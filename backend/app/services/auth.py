@@ -2,13 +2,12 @@
 Authentication service with JWT tokens and security features.
 """
 import secrets
+import time
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, Tuple, List
 import uuid
-import asyncio
 
-from jose import jwt, JWTError
-from passlib.context import CryptContext
+from jose import jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
@@ -16,12 +15,21 @@ from app.models.user import User, UserCreate, UserRole
 from app.models.auth import TokenType, TokenData
 from app.config import settings
 from app.redis_client import redis_client
+from app.services.token_verifier import get_token_verifier
+from app.services.password_hasher import get_password_hasher
+from app.services.refresh_token_store import get_refresh_token_store
 from app.utils.logger import setup_logger
+from app.utils.serialization import dumps, loads
 
 logger = setup_logger(__name__)
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Sessions live in session:<id> and are indexed per user in a sorted set
+# scored by expiry, so listing and revoking take a fixed number of round trips
+SESSION_KEY_PREFIX = "session:"
+SESSION_INDEX_PREFIX = "user_session_index:"
+# Set of session ids used before the sorted index; read until its entries expire
+LEGACY_SESSION_SET_PREFIX = "user_sessions:"
+SESSION_TTL = 86400  # 24 hours
 
 
 class AuthService:
@@ -36,13 +44,14 @@ class AuthService:
         self.refresh_token_expire = timedelta(days=settings.REFRESH_TOKEN_EXPIRATION_DAYS)
     
     # Password hashing
-    def hash_password(self, password: str) -> str:
-        """Hash password using bcrypt."""
-        return pwd_context.hash(password)
+    async def hash_password(self, password: str) -> str:
+        """Hash password in the hashing process pool."""
+        return await get_password_hasher().hash(password)
     
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        """Verify password against hash."""
-        return pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify password against hash in the hashing process pool."""
+        valid, _ = await get_password_hasher().verify(plain_password, hashed_password)
+        return valid
     
     # Token generation
     def create_token(
@@ -72,25 +81,18 @@ class AuthService:
         encoded_jwt = jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
         return encoded_jwt
     
-    def decode_token(self, token: str) -> Optional[TokenData]:
-        """Decode and validate JWT token."""
-        try:
-            payload = jwt.decode(
-                token,
-                self.secret_key,
-                algorithms=[self.algorithm]
-            )
-            
-            # Check if token is revoked
-            jti = payload.get("jti")
-            if jti and asyncio.run(self.is_token_revoked(jti)):
-                return None
-            
-            return TokenData(**payload)
-            
-        except JWTError as e:
-            logger.error(f"JWT decode error: {e}")
+    async def decode_token(self, token: str) -> Optional[TokenData]:
+        """Decode and validate JWT token (revocation checked against the local view)."""
+        verifier = get_token_verifier()
+        payload = verifier.decode(token)
+        if payload is None:
+            logger.error("JWT decode error")
             return None
+        
+        if await verifier.is_revoked(payload.get("jti")):
+            return None
+        
+        return TokenData(**payload)
     
     # Token management
     async def create_tokens(
@@ -130,27 +132,17 @@ class AuthService:
         return access_token, refresh_token
     
     async def store_refresh_token(self, user_id: int, token: str):
-        """Store refresh token in Redis."""
-        key = f"refresh_token:{user_id}:{token[:20]}"  # Use prefix for identification
-        await redis_client.set(
-            key,
-            token,
-            expire=int(self.refresh_token_expire.total_seconds())
-        )
+        """Store refresh token in Redis, indexed by its jti."""
+        payload = get_token_verifier().decode(token)
+        await get_refresh_token_store().issue(user_id, payload["jti"], payload["exp"])
     
-    async def revoke_token(self, jti: str):
-        """Revoke token by adding to blacklist."""
-        key = f"revoked_token:{jti}"
-        # Store until original expiration
-        await redis_client.set(key, "1", expire=86400 * 30)  # 30 days max
+    async def revoke_token(self, jti: str, expires_at: Optional[float] = None):
+        """Revoke token on every worker until it expires."""
+        await get_token_verifier().revoke(jti, expires_at)
     
     async def is_token_revoked(self, jti: Optional[str]) -> bool:
         """Check if token is revoked."""
-        if not jti:
-            return False
-        
-        key = f"revoked_token:{jti}"
-        return await redis_client.exists(key) > 0
+        return await get_token_verifier().is_revoked(jti)
     
     # User authentication
     async def authenticate_user(
@@ -173,7 +165,7 @@ class AuthService:
             logger.warning(f"Authentication failed: user inactive - {email}")
             return None
         
-        if not self.verify_password(password, user.hashed_password):
+        if not await self.verify_password(password, user.hashed_password):
             logger.warning(f"Authentication failed: wrong password - {email}")
             return None
         
@@ -200,7 +192,7 @@ class AuthService:
         user = User(
             email=user_data.email,
             name=user_data.name,
-            hashed_password=self.hash_password(user_data.password),
+            hashed_password=await self.hash_password(user_data.password),
             role=UserRole.STUDENT,
             is_active=True,
             is_verified=False,
@@ -243,7 +235,7 @@ class AuthService:
         token: str
     ) -> bool:
         """Verify user email with token."""
-        token_data = self.decode_token(token)
+        token_data = await self.decode_token(token)
         
         if not token_data or token_data.token_type != TokenType.EMAIL_VERIFICATION:
             return False
@@ -304,7 +296,7 @@ class AuthService:
         new_password: str
     ) -> bool:
         """Reset user password with token."""
-        token_data = self.decode_token(token)
+        token_data = await self.decode_token(token)
         
         if not token_data or token_data.token_type != TokenType.RESET_PASSWORD:
             return False
@@ -318,7 +310,7 @@ class AuthService:
             return False
         
         # Update password
-        user.hashed_password = self.hash_password(new_password)
+        user.hashed_password = await self.hash_password(new_password)
         await db.commit()
         
         # Revoke token to prevent reuse
@@ -335,26 +327,13 @@ class AuthService:
         refresh_token: str
     ) -> Optional[str]:
         """Refresh access token using refresh token."""
-        token_data = self.decode_token(refresh_token)
+        token_data = await self.decode_token(refresh_token)
         
         if not token_data or token_data.token_type != TokenType.REFRESH:
             return None
         
         # Verify refresh token exists in Redis
-        key_pattern = f"refresh_token:{token_data.sub}:*"
-        keys = []
-        async for key in redis_client.scan_iter(match=key_pattern):
-            keys.append(key)
-        
-        # Check if any stored token matches
-        valid = False
-        for key in keys:
-            stored_token = await redis_client.get(key)
-            if stored_token == refresh_token:
-                valid = True
-                break
-        
-        if not valid:
+        if not await get_refresh_token_store().is_active(int(token_data.sub), token_data.jti):
             logger.warning(f"Invalid refresh token for user: {token_data.sub}")
             return None
         
@@ -382,6 +361,11 @@ class AuthService:
         return access_token
     
     # Session management
+    async def _redis(self):
+        if not redis_client.is_connected:
+            await redis_client.initialize()
+        return redis_client.client
+    
     async def create_session(
         self,
         user_id: int,
@@ -398,50 +382,86 @@ class AuthService:
             "last_activity": datetime.utcnow().isoformat(),
         }
         
-        # Store session
-        key = f"session:{session_id}"
-        await redis_client.set_json(
-            key,
-            session_data,
-            expire=86400  # 24 hours
-        )
-        
-        # Add to user's sessions
-        user_sessions_key = f"user_sessions:{user_id}"
-        await redis_client.sadd(user_sessions_key, session_id)
+        # Store the session and index it by expiry, pruning expired ids
+        now = time.time()
+        index_key = f"{SESSION_INDEX_PREFIX}{user_id}"
+        client = await self._redis()
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.set(f"{SESSION_KEY_PREFIX}{session_id}", dumps(session_data), ex=SESSION_TTL)
+            pipe.zadd(index_key, {session_id: now + SESSION_TTL})
+            pipe.zremrangebyscore(index_key, "-inf", now)
+            pipe.expire(index_key, SESSION_TTL)
+            await pipe.execute()
         
         return session_id
     
+    async def _session_ids(self, user_id: int) -> List[str]:
+        """Ids of the user's unexpired sessions (one round trip)."""
+        index_key = f"{SESSION_INDEX_PREFIX}{user_id}"
+        client = await self._redis()
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(index_key, "-inf", time.time())
+            pipe.zrange(index_key, 0, -1)
+            pipe.smembers(f"{LEGACY_SESSION_SET_PREFIX}{user_id}")
+            _, session_ids, legacy_ids = await pipe.execute()
+        return list(dict.fromkeys([*session_ids, *legacy_ids]))
+    
     async def get_user_sessions(self, user_id: int) -> List[Dict[str, Any]]:
         """Get all active sessions for user."""
-        user_sessions_key = f"user_sessions:{user_id}"
-        session_ids = await redis_client.smembers(user_sessions_key)
+        session_ids = await self._session_ids(user_id)
+        if not session_ids:
+            return []
+        
+        client = await self._redis()
+        values = await client.mget([f"{SESSION_KEY_PREFIX}{sid}" for sid in session_ids])
         
         sessions = []
-        for session_id in session_ids:
-            session_data = await redis_client.get_json(f"session:{session_id}")
-            if session_data:
-                session_data["session_id"] = session_id
-                sessions.append(session_data)
+        missing = []
+        for session_id, value in zip(session_ids, values):
+            if value is None:
+                missing.append(session_id)
+                continue
+            session_data = loads(value)
+            session_data["session_id"] = session_id
+            sessions.append(session_data)
+        
+        # Sessions deleted without going through revoke_session
+        if missing:
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.zrem(f"{SESSION_INDEX_PREFIX}{user_id}", *missing)
+                pipe.srem(f"{LEGACY_SESSION_SET_PREFIX}{user_id}", *missing)
+                await pipe.execute()
         
         return sessions
     
-    async def revoke_session(self, session_id: str):
+    async def revoke_session(self, session_id: str, user_id: Optional[int] = None):
         """Revoke specific session."""
-        session_data = await redis_client.get_json(f"session:{session_id}")
-        if session_data:
-            # Remove from user's sessions
-            user_id = session_data["user_id"]
-            await redis_client.srem(f"user_sessions:{user_id}", session_id)
-            
-            # Delete session
-            await redis_client.delete(f"session:{session_id}")
+        client = await self._redis()
+        if user_id is None:
+            value = await client.get(f"{SESSION_KEY_PREFIX}{session_id}")
+            if not value:
+                return
+            user_id = loads(value)["user_id"]
+        
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.unlink(f"{SESSION_KEY_PREFIX}{session_id}")
+            pipe.zrem(f"{SESSION_INDEX_PREFIX}{user_id}", session_id)
+            pipe.srem(f"{LEGACY_SESSION_SET_PREFIX}{user_id}", session_id)
+            await pipe.execute()
     
     async def revoke_all_sessions(self, user_id: int):
         """Revoke all sessions for user."""
-        sessions = await self.get_user_sessions(user_id)
-        for session in sessions:
-            await self.revoke_session(session["session_id"])
+        index_key = f"{SESSION_INDEX_PREFIX}{user_id}"
+        legacy_key = f"{LEGACY_SESSION_SET_PREFIX}{user_id}"
+        client = await self._redis()
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.zrange(index_key, 0, -1)
+            pipe.smembers(legacy_key)
+            session_ids, legacy_ids = await pipe.execute()
+        await client.unlink(
+            index_key, legacy_key,
+            *(f"{SESSION_KEY_PREFIX}{sid}" for sid in {*session_ids, *legacy_ids})
+        )
 
 
 # Global auth service instance
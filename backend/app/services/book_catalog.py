@@ -0,0 +1,269 @@
+"""
+Catalog of the locally stored Breslov books.
+
+Keeps per-book metadata (titles, section count, size, content hash, mtime)
+in ``data/book_catalog.json`` and per-book section listings with
+precomputed previews in ``data/book_catalog/<book>.sections.json``, so
+listing the library or a book's sections never parses the book files.
+Entries are refreshed when ``SefariaClient._save_book`` writes a book or
+when a file's mtime/size no longer matches. The serialised listing and its
+ETag are precomputed and only change when the catalog does.
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+PREVIEW_CHARS = 100
+
+# Fields of a section listing entry, selectable with ?fields=
+SECTION_FIELDS = ("ref", "hebrew_preview", "english_preview", "has_hebrew", "has_english")
+
+
+def _preview(value: Any) -> str:
+    if isinstance(value, list):
+        value = " ".join(str(v) for v in value if v)
+    return (value or "")[:PREVIEW_CHARS] + "..."
+
+
+class BookCatalog:
+    """Manifest of local book files with a cached, ETagged listing."""
+
+    # Seconds between two mtime checks of the book files
+    STAT_INTERVAL = 2.0
+
+    def __init__(self, data_dir: Path, known_books: Dict[str, Dict[str, Any]], manifest_path: Optional[Path] = None):
+        self.data_dir = Path(data_dir)
+        self.known_books = known_books
+        self.manifest_path = Path(manifest_path) if manifest_path else self.data_dir.parent / "book_catalog.json"
+        self.sections_dir = self.manifest_path.with_suffix("")
+
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        # book_id -> (content hash, section listing, position of each ref)
+        self._sections: Dict[str, tuple] = {}
+        self._listing: Optional[bytes] = None
+        self._etag: Optional[str] = None
+        self._checked_at = 0.0
+
+        self._load_manifest()
+
+    def _load_manifest(self) -> None:
+        if not self.manifest_path.exists():
+            return
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Unreadable book catalog {self.manifest_path}: {e}")
+            self.entries = {}
+
+    def _save_manifest(self) -> None:
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _book_file(self, book_id: str) -> Path:
+        return self.data_dir / f"{book_id}.json"
+
+    def _sections_file(self, book_id: str) -> Path:
+        return self.sections_dir / f"{book_id}.sections.json"
+
+    def _index_book(self, book_id: str, book_data: Dict, raw: bytes, stat: os.stat_result) -> None:
+        """Build the catalog entry and section listing of one book from its content."""
+        content_hash = hashlib.sha256(raw).hexdigest()
+        sections = [
+            {
+                "ref": ref,
+                "hebrew_preview": _preview(section.get("hebrew")),
+                "english_preview": _preview(section.get("english")),
+                "has_hebrew": bool(section.get("hebrew")),
+                "has_english": bool(section.get("english")),
+            }
+            for ref, section in book_data.get("sections", {}).items()
+        ]
+
+        self.sections_dir.mkdir(parents=True, exist_ok=True)
+        sections_file = self._sections_file(book_id)
+        tmp_path = sections_file.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"hash": content_hash, "sections": sections}, f, ensure_ascii=False)
+        os.replace(tmp_path, sections_file)
+        self._cache_sections(book_id, content_hash, sections)
+
+        self.entries[book_id] = {
+            "title": book_data.get("title", book_id),
+            "title_en": book_data.get("title_en", book_id.replace("_", " ")),
+            "sections": len(sections),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "hash": content_hash,
+        }
+
+    def _cache_sections(self, book_id: str, content_hash: str, sections: List[Dict[str, Any]]) -> None:
+        positions = {section["ref"]: position for position, section in enumerate(sections)}
+        self._sections[book_id] = (content_hash, sections, positions)
+
+    def _reindex_file(self, book_id: str, path: Path, stat: os.stat_result) -> None:
+        try:
+            raw = path.read_bytes()
+            book_data = json.loads(raw)
+        except (OSError, ValueError) as e:
+            logger.error(f"Cannot index book file {path}: {e}")
+            self.entries.pop(book_id, None)
+            return
+        self._index_book(book_id, book_data, raw, stat)
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Re-index books whose file appeared, disappeared or changed.
+
+        Checks are throttled to one per STAT_INTERVAL unless ``force`` is set.
+
+        Returns:
+            True if the catalog changed
+        """
+        now = time.monotonic()
+        if not force and self._listing is not None and now - self._checked_at < self.STAT_INTERVAL:
+            return False
+        self._checked_at = now
+
+        changed = False
+        for book_id in self.known_books:
+            path = self._book_file(book_id)
+            entry = self.entries.get(book_id)
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                if entry is not None:
+                    del self.entries[book_id]
+                    changed = True
+                continue
+
+            if entry is None or entry["mtime"] != stat.st_mtime or entry["size"] != stat.st_size:
+                self._reindex_file(book_id, path, stat)
+                changed = True
+
+        if changed:
+            self._save_manifest()
+        if changed or self._listing is None:
+            self._build_listing()
+        return changed
+
+    def update_book(self, book_id: str) -> None:
+        """Re-index a book that was just written."""
+        path = self._book_file(book_id)
+        self._reindex_file(book_id, path, path.stat())
+        self._save_manifest()
+        self._build_listing()
+
+    def _build_listing(self) -> None:
+        books = []
+        for book_id, meta in self.known_books.items():
+            entry = self.entries.get(book_id)
+            books.append({
+                "id": book_id,
+                "title_en": entry["title_en"] if entry else book_id.replace("_", " "),
+                "title_he": meta.get("he", ""),
+                "available": entry is not None,
+                "sections": entry["sections"] if entry else 0,
+                "size": entry["size"] if entry else 0,
+                "hash": entry["hash"] if entry else None,
+            })
+
+        listing = {
+            "books": books,
+            "total": len(books),
+            "available": len([b for b in books if b["available"]]),
+        }
+        self._listing = json.dumps(listing, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._etag = f'"{hashlib.sha256(self._listing).hexdigest()[:32]}"'
+
+    def listing(self) -> bytes:
+        """Serialised ``/books/all`` payload."""
+        self.refresh()
+        return self._listing
+
+    def get_entry(self, book_id: str) -> Optional[Dict[str, Any]]:
+        """Catalog entry of an available book."""
+        self.refresh()
+        return self.entries.get(book_id)
+
+    def _load_sections(self, book_id: str) -> Optional[tuple]:
+        entry = self.get_entry(book_id)
+        if entry is None:
+            return None
+
+        cached = self._sections.get(book_id)
+        if cached and cached[0] == entry["hash"]:
+            return cached
+
+        try:
+            with open(self._sections_file(book_id), "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored.get("hash") == entry["hash"]:
+                self._cache_sections(book_id, stored["hash"], stored["sections"])
+                return self._sections[book_id]
+        except (OSError, ValueError):
+            pass
+
+        # Listing missing or stale (e.g. catalog written by an older version)
+        self.update_book(book_id)
+        return self._sections.get(book_id)
+
+    def sections_page(self, book_id: str, after_ref: Optional[str] = None, limit: int = 100) -> Optional[tuple]:
+        """
+        One page of a book's section listing, in book order.
+
+        Args:
+            book_id: Book key
+            after_ref: Ref of the last section of the previous page
+            limit: Page size
+
+        Returns:
+            (sections, has_more), or None if the book is not available
+
+        Raises:
+            KeyError: If after_ref is not a section of the book
+        """
+        loaded = self._load_sections(book_id)
+        if loaded is None:
+            return None
+        _, sections, positions = loaded
+
+        start = positions[after_ref] + 1 if after_ref is not None else 0
+        page = sections[start:start + limit]
+        return page, start + limit < len(sections)
+
+    @property
+    def etag(self) -> str:
+        """Strong ETag of the current listing."""
+        self.refresh()
+        return self._etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an If-None-Match header against an ETag (weak comparison, RFC 9110)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+_book_catalog: Optional[BookCatalog] = None
+
+
+def get_book_catalog() -> BookCatalog:
+    """Process-wide catalog of ``data/breslov_texts``."""
+    global _book_catalog
+    if _book_catalog is None:
+        from app.services.sefaria_client import SefariaClient
+        _book_catalog = BookCatalog(Path("data/breslov_texts"), SefariaClient.BRESLOV_BOOKS)
+    return _book_catalog
@@ -11,6 +11,7 @@ import asyncio
 from app.redis_client import redis_client
 from app.config import settings
 from app.utils.logger import setup_logger
+from app.utils.monitoring import cache_operations
 
 logger = setup_logger(__name__)
 
@@ -33,6 +34,13 @@ class CacheService:
             "user_data": 3600,  # 1 hour
             "search_results": 1800,  # 30 minutes
         }
+        
+        # Lookups since start, for the health metrics
+        self.counters = {"hit": 0, "miss": 0, "error": 0}
+    
+    def _count(self, result: str) -> None:
+        self.counters[result] += 1
+        cache_operations.labels(operation="get", result=result).inc()
     
     def _generate_key(self, namespace: str, *args, **kwargs) -> str:
         """Generate cache key from namespace and arguments."""
@@ -59,12 +67,16 @@ class CacheService:
         
         try:
             if deserialize:
-                return await self.redis.get_json(cache_key)
+                value = await self.redis.get_json(cache_key)
             else:
-                return await self.redis.get(cache_key)
+                value = await self.redis.get(cache_key)
         except Exception as e:
             logger.error(f"Cache get error: {e}")
+            self._count("error")
             return None
+        
+        self._count("miss" if value is None else "hit")
+        return value
     
     async def set(
         self,
@@ -0,0 +1,176 @@
+"""
+Delta sync feed over books and texts.
+
+Clients keep an opaque token and ask for what changed since. The token holds
+the last revision the client received and the oldest transaction that was
+still running when it was issued (the snapshot ``xmin``). A row written by
+such a transaction may carry a revision lower than rows already returned but
+only become visible later, so rows written by transactions at or above the
+token's ``xmin`` are sent again. Clients apply changes as upserts keyed by
+slug/ref, which makes the occasional duplicate harmless.
+
+Resent rows count towards the page limit. When there are more than fit, the
+page holds only resent rows and the token keeps the old revision and
+``xmin`` plus the last revision resent, so the next call carries on from it.
+
+Deleted rows come back as compact tombstones, and so do rows that were
+deactivated (``is_active`` false).
+"""
+from typing import List, Dict, Any, Optional, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.models.book import Book
+from app.models.sync import ContentTombstone
+from app.models.text import Text
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+BOOK_FIELDS = (
+    "slug", "title", "title_en", "title_fr", "category", "description", "author",
+    "parts", "chapters", "order_index", "is_featured",
+)
+TEXT_FIELDS = ("ref", "book_slug", "chapter", "verse", "section", "hebrew", "english", "french", "language", "version")
+
+
+def encode_token(revision: int, xmin: int, resent: int = 0) -> str:
+    return encode_cursor(revision, xmin, resent)
+
+
+def decode_token(token: Optional[str]) -> Tuple[int, Optional[int], int]:
+    """
+    Decode a sync token; no token means a full sync.
+
+    Tokens issued before resends were paged have no resend position.
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    if not token:
+        return 0, None, 0
+    try:
+        revision, xmin, resent = decode_cursor(token, 3)
+    except ValueError:
+        (revision, xmin), resent = decode_cursor(token, 2), 0
+    if not all(isinstance(value, int) for value in (revision, xmin, resent)):
+        raise ValueError("Invalid sync token")
+    return revision, xmin, resent
+
+
+class ChangeFeed:
+    """Reads the changes to books and texts since a sync token."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _snapshot_xmin(self) -> int:
+        result = await self.db.execute(text("SELECT txid_snapshot_xmin(txid_current_snapshot())"))
+        return result.scalar_one()
+
+    async def changes(
+        self,
+        token: Optional[str] = None,
+        limit: int = 500,
+        book_slug: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Books, texts and tombstones changed since ``token``, in revision order.
+
+        Args:
+            token: Token from a previous call, None for a full sync
+            limit: Maximum number of changes returned
+            book_slug: Only sync this book and its texts
+
+        Returns:
+            Changes, the next token and whether more changes are waiting
+
+        Raises:
+            ValueError: If the token is malformed
+        """
+        since, since_xmin, since_resent = decode_token(token)
+        # Taken before reading: anything not visible to the reads below is at or above it
+        xmin = await self._snapshot_xmin()
+
+        queries = []
+        for kind, model in (("book", Book), ("text", Text), ("tombstone", ContentTombstone)):
+            query = select(model)
+            if book_slug:
+                column = Book.slug if model is Book else model.book_slug
+                query = query.where(column == book_slug)
+            queries.append((kind, model, query))
+
+        resent: List[Tuple[int, str, Any]] = []
+        if since_xmin is not None:
+            for kind, model, query in queries:
+                # Rows of transactions still running when the token was issued
+                result = await self.db.execute(
+                    query.where(
+                        model.xact_id >= since_xmin,
+                        model.revision > since_resent,
+                        model.revision <= since,
+                    ).order_by(model.revision).limit(limit + 1)
+                )
+                resent.extend((row.revision, kind, row) for row in result.scalars().all())
+            resent.sort(key=lambda entry: entry[0])
+
+        if len(resent) > limit:
+            # Finish resending before moving on; the snapshot of the token still applies
+            rows = resent[:limit]
+            has_more = True
+            next_token = encode_token(since, since_xmin, rows[-1][0])
+        else:
+            remaining = limit - len(resent)
+            rows = []
+            for kind, model, query in queries:
+                result = await self.db.execute(
+                    query.where(model.revision > since).order_by(model.revision).limit(remaining + 1)
+                )
+                rows.extend((row.revision, kind, row) for row in result.scalars().all())
+
+            rows.sort(key=lambda entry: entry[0])
+            has_more = len(rows) > remaining
+            rows = rows[:remaining]
+            next_token = encode_token(rows[-1][0] if rows else since, xmin)
+            rows = resent + rows
+
+        books, texts, deleted = [], [], []
+        for revision, kind, row in rows:
+            if kind == "tombstone":
+                deleted.append({
+                    "type": row.entity, "id": row.entity_id, "key": row.key, "revision": revision
+                })
+            elif not row.is_active:
+                deleted.append({
+                    "type": kind, "id": str(row.id), "key": row.slug if kind == "book" else row.ref,
+                    "revision": revision
+                })
+            elif kind == "book":
+                books.append({"id": row.id, **{f: getattr(row, f) for f in BOOK_FIELDS},
+                              "revision": revision, "updated_at": row.updated_at})
+            else:
+                texts.append({"id": str(row.id), **{f: getattr(row, f) for f in TEXT_FIELDS},
+                              "revision": revision, "updated_at": row.updated_at})
+
+        return {
+            "books": books,
+            "texts": texts,
+            "deleted": deleted,
+            "next_token": next_token,
+            "has_more": has_more,
+        }
+
+    async def current_token(self) -> str:
+        """Token of the present state, for clients that just downloaded a full snapshot."""
+        revision = await self.db.execute(select(func.max(Book.revision)))
+        text_revision = await self.db.execute(select(func.max(Text.revision)))
+        tombstone_revision = await self.db.execute(select(func.max(ContentTombstone.revision)))
+        latest = max(
+            value or 0 for value in (
+                revision.scalar(), text_revision.scalar(), tombstone_revision.scalar()
+            )
+        )
+        return encode_token(latest, await self._snapshot_xmin())
@@ -0,0 +1,282 @@
+"""
+Incremental chat analytics rollups.
+
+Every chat write updates a per user per day row in ``chat_daily_rollups``
+inside the same transaction, so analytics reads touch at most one row per
+day instead of scanning ``chat_messages``. ``rebuild_day`` recomputes a day
+from the raw tables and is used by the periodic compaction job.
+
+Incremental writes hold a shared advisory lock on their day until they
+commit and ``rebuild_day`` holds it exclusively, so a rebuild neither misses
+nor double counts writes that run at the same time, including on today.
+"""
+from datetime import datetime, date, time, timedelta
+from typing import List, Dict, Any, Optional
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, and_, func, case
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.chat import ChatMessage, ChatSession, ChatDailyRollup, ChatRole
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Upper bounds (ms) of the response time histogram buckets; one overflow bucket follows
+LATENCY_BUCKETS_MS = [100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 60000]
+
+# First key of the per day advisory locks (the second is the day's ordinal)
+ROLLUP_LOCK_NAMESPACE = 0x63686174
+
+
+def latency_bucket(response_time_ms: int) -> int:
+    """Return the histogram bucket index for a response time."""
+    for index, upper_bound in enumerate(LATENCY_BUCKETS_MS):
+        if response_time_ms <= upper_bound:
+            return index
+    return len(LATENCY_BUCKETS_MS)
+
+
+def empty_histogram() -> List[int]:
+    """Return a zeroed response time histogram."""
+    return [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+
+def histogram_percentile(histogram: List[int], percentile: float) -> int:
+    """Estimate a percentile as the upper bound of the bucket holding its rank."""
+    total = sum(histogram)
+    if total == 0:
+        return 0
+
+    rank = percentile / 100 * total
+    seen = 0
+    for index, count in enumerate(histogram):
+        seen += count
+        if seen >= rank:
+            return LATENCY_BUCKETS_MS[min(index, len(LATENCY_BUCKETS_MS) - 1)]
+    return LATENCY_BUCKETS_MS[-1]
+
+
+class ChatAnalyticsService:
+    """Maintains and reads per user per day chat rollups."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _lock_day(self, day: date, exclusive: bool = False) -> None:
+        """Take the day's advisory lock until the end of the transaction."""
+        lock = func.pg_advisory_xact_lock if exclusive else func.pg_advisory_xact_lock_shared
+        await self.db.execute(select(lock(ROLLUP_LOCK_NAMESPACE, day.toordinal())))
+
+    async def _upsert(self, user_id: UUID, day: date, **increments: int) -> None:
+        """Create the rollup row if needed and add the given increments."""
+        await self._lock_day(day)
+        values = {
+            "user_id": user_id,
+            "day": day,
+            "response_time_histogram": empty_histogram(),
+            "updated_at": datetime.utcnow(),
+            **increments,
+        }
+        table = ChatDailyRollup.__table__
+        stmt = insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.day],
+            set_={
+                **{name: table.c[name] + stmt.excluded[name] for name in increments},
+                "updated_at": stmt.excluded.updated_at,
+            }
+        )
+        await self.db.execute(stmt)
+
+    async def record_session(self, user_id: UUID, created_at: datetime) -> None:
+        """Count a newly created session. Caller commits."""
+        await self._upsert(user_id, created_at.date(), sessions=1)
+
+    async def record_message(
+        self,
+        user_id: UUID,
+        created_at: datetime,
+        role: ChatRole,
+        tokens_used: Optional[int] = None,
+        response_time_ms: Optional[int] = None
+    ) -> None:
+        """Count a newly written message. Caller commits."""
+        day = created_at.date()
+        increments = {
+            "messages": 1,
+            "assistant_messages": 1 if role == ChatRole.ASSISTANT else 0,
+            "tokens_used": int(tokens_used or 0),
+        }
+        if response_time_ms is not None:
+            increments["response_time_sum_ms"] = int(response_time_ms)
+            increments["response_time_count"] = 1
+
+        await self._upsert(user_id, day, **increments)
+
+        if response_time_ms is None:
+            return
+
+        # JSON histogram is updated under a row lock held until the caller commits
+        result = await self.db.execute(
+            select(ChatDailyRollup)
+            .where(
+                and_(
+                    ChatDailyRollup.user_id == user_id,
+                    ChatDailyRollup.day == day
+                )
+            )
+            .with_for_update()
+        )
+        rollup = result.scalar_one()
+        histogram = list(rollup.response_time_histogram or empty_histogram())
+        histogram.extend([0] * (len(LATENCY_BUCKETS_MS) + 1 - len(histogram)))
+        histogram[latency_bucket(int(response_time_ms))] += 1
+        rollup.response_time_histogram = histogram
+
+    async def record_rating(
+        self,
+        user_id: UUID,
+        message_created_at: datetime,
+        previous_rating: Optional[int],
+        rating: int
+    ) -> None:
+        """Account a (re-)rating against the day of the rated message. Caller commits."""
+        await self._upsert(
+            user_id,
+            message_created_at.date(),
+            ratings_count=0 if previous_rating is not None else 1,
+            ratings_sum=rating - (previous_rating or 0)
+        )
+
+    async def get_summary(self, user_id: UUID, days: int = 30) -> Dict[str, Any]:
+        """Aggregate the rollups of the last ``days`` days for a user."""
+        period_end = datetime.utcnow()
+        period_start = period_end - timedelta(days=days)
+
+        result = await self.db.execute(
+            select(ChatDailyRollup).where(
+                and_(
+                    ChatDailyRollup.user_id == user_id,
+                    ChatDailyRollup.day >= period_start.date()
+                )
+            )
+        )
+        rollups = result.scalars().all()
+
+        histogram = empty_histogram()
+        response_time_sum = 0
+        response_time_count = 0
+        ratings_sum = 0
+        ratings_count = 0
+        for rollup in rollups:
+            for index, count in enumerate((rollup.response_time_histogram or [])[:len(histogram)]):
+                histogram[index] += count
+            response_time_sum += rollup.response_time_sum_ms
+            response_time_count += rollup.response_time_count
+            ratings_sum += rollup.ratings_sum
+            ratings_count += rollup.ratings_count
+
+        return {
+            "user_id": str(user_id),
+            "period_days": days,
+            "total_messages": sum(r.messages for r in rollups),
+            "total_sessions": sum(r.sessions for r in rollups),
+            "total_tokens": sum(r.tokens_used for r in rollups),
+            "avg_response_time_ms": int(response_time_sum / response_time_count) if response_time_count else 0,
+            "p50_response_time_ms": histogram_percentile(histogram, 50),
+            "p95_response_time_ms": histogram_percentile(histogram, 95),
+            "p99_response_time_ms": histogram_percentile(histogram, 99),
+            "ratings_count": ratings_count,
+            "avg_rating": round(ratings_sum / ratings_count, 2) if ratings_count else None,
+            "period_start": period_start.isoformat(),
+            "period_end": period_end.isoformat()
+        }
+
+    async def rebuild_day(self, day: date) -> int:
+        """
+        Recompute all rollups for one day from the raw chat tables.
+
+        Waits for the incremental writes of that day in progress, and holds
+        back new ones until the rebuilt rows are committed.
+
+        Returns:
+            Number of rollup rows written
+        """
+        await self._lock_day(day, exclusive=True)
+
+        # Half-open range, so the created_at indexes apply
+        start = datetime.combine(day, time.min)
+        end = start + timedelta(days=1)
+        in_day = and_(ChatMessage.created_at >= start, ChatMessage.created_at < end)
+
+        totals_result = await self.db.execute(
+            select(
+                ChatMessage.user_id,
+                func.count(ChatMessage.id),
+                func.count(ChatMessage.id).filter(ChatMessage.role == ChatRole.ASSISTANT),
+                func.coalesce(func.sum(ChatMessage.tokens_used), 0),
+                func.coalesce(func.sum(ChatMessage.response_time_ms), 0),
+                func.count(ChatMessage.response_time_ms),
+                func.count(ChatMessage.user_rating),
+                func.coalesce(func.sum(ChatMessage.user_rating), 0),
+            )
+            .where(in_day)
+            .group_by(ChatMessage.user_id)
+        )
+
+        bucket = case(
+            *[(ChatMessage.response_time_ms <= bound, index) for index, bound in enumerate(LATENCY_BUCKETS_MS)],
+            else_=len(LATENCY_BUCKETS_MS)
+        )
+        histogram_result = await self.db.execute(
+            select(ChatMessage.user_id, bucket, func.count(ChatMessage.id))
+            .where(
+                and_(
+                    in_day,
+                    ChatMessage.response_time_ms.is_not(None)
+                )
+            )
+            .group_by(ChatMessage.user_id, bucket)
+        )
+
+        sessions_result = await self.db.execute(
+            select(ChatSession.user_id, func.count(ChatSession.id))
+            .where(ChatSession.created_at >= start, ChatSession.created_at < end)
+            .group_by(ChatSession.user_id)
+        )
+
+        rollups: Dict[UUID, ChatDailyRollup] = {}
+
+        def rollup_for(user_id: UUID) -> ChatDailyRollup:
+            if user_id not in rollups:
+                rollups[user_id] = ChatDailyRollup(
+                    user_id=user_id,
+                    day=day,
+                    response_time_histogram=empty_histogram()
+                )
+            return rollups[user_id]
+
+        for user_id, messages, assistant, tokens, rt_sum, rt_count, r_count, r_sum in totals_result.all():
+            rollup = rollup_for(user_id)
+            rollup.messages = messages
+            rollup.assistant_messages = assistant
+            rollup.tokens_used = int(tokens)
+            rollup.response_time_sum_ms = int(rt_sum)
+            rollup.response_time_count = rt_count
+            rollup.ratings_count = r_count
+            rollup.ratings_sum = int(r_sum)
+
+        for user_id, index, count in histogram_result.all():
+            rollup_for(user_id).response_time_histogram[index] = count
+
+        for user_id, count in sessions_result.all():
+            rollup_for(user_id).sessions = count
+
+        await self.db.execute(delete(ChatDailyRollup).where(ChatDailyRollup.day == day))
+        self.db.add_all(rollups.values())
+        await self.db.commit()
+
+        logger.info(f"Rebuilt {len(rollups)} chat rollups for {day.isoformat()}")
+        return len(rollups)
@@ -4,12 +4,12 @@ Chat service for handling AI-powered conversations about Breslov texts.
 import asyncio
 import json
 import time
-from datetime import datetime
-from typing import List, Dict, Any, Optional, AsyncGenerator
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, AsyncGenerator, Set, Tuple
 from uuid import UUID, uuid4
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc, and_, func
+from sqlalchemy import select, update, desc, and_, tuple_
 from sqlalchemy.orm import selectinload
 
 from app.models.chat import (
@@ -23,16 +23,28 @@ from app.models.chat import (
     ChatCitation,
     ChatSessionCreate,
     ChatSessionRead,
+    ChatSessionPage,
+    ChatMessagePage,
 )
 from app.models.user import User
 from app.services.real_gemini_manager import RealGeminiManager
 from app.services.sefaria_client import SefariaClient
 from app.services.cache_service import cache_service
+from app.services.hybrid_retriever import get_hybrid_retriever
+from app.services.conversation_memory import ConversationMemory, MemoryWindow
+from app.services.chat_analytics import ChatAnalyticsService
 from app.core.config import settings
+from app.database import get_db_session
 from app.utils.logger import setup_logger
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.tracing import traced
 
 logger = setup_logger(__name__)
 
+# Background compactions, referenced until done; one at a time per session
+_compaction_tasks: Set[asyncio.Task] = set()
+_compacting_sessions: Set[str] = set()
+
 
 class ChatService:
     """Service for managing AI-powered chat conversations."""
@@ -41,6 +53,9 @@ class ChatService:
         self.db = db
         self.gemini_manager = RealGeminiManager()
         self.sefaria_client = SefariaClient()
+        self.retriever = get_hybrid_retriever()
+        self.memory = ConversationMemory(db, self.gemini_manager)
+        self.analytics = ChatAnalyticsService(db)
     
     async def create_session(
         self,
@@ -62,6 +77,7 @@ class ChatService:
         )
         
         self.db.add(session)
+        await self.analytics.record_session(user_id, session.created_at)
         await self.db.commit()
         await self.db.refresh(session)
         
@@ -113,99 +129,175 @@ class ChatService:
         self,
         user_id: UUID,
         limit: int = 50,
-        offset: int = 0
-    ) -> List[ChatSessionRead]:
-        """Get all chat sessions for a user."""
+        cursor: Optional[str] = None
+    ) -> ChatSessionPage:
+        """
+        Get a page of chat sessions for a user, most recently active first.
+        
+        Pages are keyed on (last_activity, id) so every page costs the same
+        index range scan regardless of how far back the user scrolls.
+        
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+        conditions = [
+            ChatSession.user_id == user_id,
+            ChatSession.is_active == True
+        ]
+        
+        if cursor:
+            last_activity, session_id = decode_cursor(cursor, 2)
+            conditions.append(
+                tuple_(ChatSession.last_activity, ChatSession.id)
+                < tuple_(datetime.fromisoformat(last_activity), session_id)
+            )
+        
         result = await self.db.execute(
             select(ChatSession)
-            .where(
-                and_(
-                    ChatSession.user_id == user_id,
-                    ChatSession.is_active == True
-                )
-            )
-            .order_by(desc(ChatSession.last_activity))
-            .limit(limit)
-            .offset(offset)
+            .where(and_(*conditions))
+            .order_by(desc(ChatSession.last_activity), desc(ChatSession.id))
+            .limit(limit + 1)
         )
         
         sessions = result.scalars().all()
+        has_more = len(sessions) > limit
+        sessions = sessions[:limit]
         
-        return [
-            ChatSessionRead(
-                id=session.id,
-                user_id=session.user_id,
-                title=session.title,
-                created_at=session.created_at,
-                updated_at=session.updated_at,
-                total_messages=session.total_messages,
-                last_activity=session.last_activity,
-                is_active=session.is_active
-            )
-            for session in sessions
-        ]
+        next_cursor = None
+        if has_more:
+            last = sessions[-1]
+            next_cursor = encode_cursor(last.last_activity, last.id)
+        
+        return ChatSessionPage(
+            items=[
+                ChatSessionRead(
+                    id=session.id,
+                    user_id=session.user_id,
+                    title=session.title,
+                    created_at=session.created_at,
+                    updated_at=session.updated_at,
+                    total_messages=session.total_messages,
+                    last_activity=session.last_activity,
+                    is_active=session.is_active
+                )
+                for session in sessions
+            ],
+            next_cursor=next_cursor
+        )
     
     async def get_session_messages(
         self,
         session_id: str,
         user_id: UUID,
         limit: int = 100,
-        offset: int = 0
-    ) -> List[ChatMessageRead]:
-        """Get messages from a chat session."""
+        cursor: Optional[str] = None
+    ) -> ChatMessagePage:
+        """
+        Get a page of messages from a chat session.
+        
+        The first page holds the newest messages; ``next_cursor`` walks back
+        through older ones on the (created_at, id) key. Messages within a
+        page are returned in chronological order.
+        
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+        conditions = [
+            ChatMessage.session_id == session_id,
+            ChatMessage.user_id == user_id
+        ]
+        
+        if cursor:
+            created_at, message_id = decode_cursor(cursor, 2)
+            conditions.append(
+                tuple_(ChatMessage.created_at, ChatMessage.id)
+                < tuple_(datetime.fromisoformat(created_at), UUID(message_id))
+            )
+        
         result = await self.db.execute(
             select(ChatMessage)
-            .where(
-                and_(
-                    ChatMessage.session_id == session_id,
-                    ChatMessage.user_id == user_id
-                )
-            )
-            .order_by(ChatMessage.created_at)
-            .limit(limit)
-            .offset(offset)
+            .where(and_(*conditions))
+            .order_by(desc(ChatMessage.created_at), desc(ChatMessage.id))
+            .limit(limit + 1)
         )
         
         messages = result.scalars().all()
+        has_more = len(messages) > limit
+        messages = messages[:limit]
         
-        return [
-            ChatMessageRead(
-                id=message.id,
-                role=message.role,
-                content=message.content,
-                session_id=message.session_id,
-                user_id=message.user_id,
+        next_cursor = None
+        if has_more:
+            oldest = messages[-1]
+            next_cursor = encode_cursor(oldest.created_at, oldest.id)
+        
+        return ChatMessagePage(
+            items=[
+                ChatMessageRead(
+                    id=message.id,
+                    role=message.role,
+                    content=message.content,
+                    session_id=message.session_id,
+                    user_id=message.user_id,
+                    created_at=message.created_at,
+                    message_metadata=json.loads(message.message_metadata) if message.message_metadata else None,
+                    context_used=message.context_used,
+                    citations=json.loads(message.citations) if message.citations else None,
+                    model_used=message.model_used,
+                    tokens_used=message.tokens_used,
+                    response_time_ms=message.response_time_ms,
+                    user_rating=message.user_rating
+                )
+                for message in reversed(messages)
+            ],
+            next_cursor=next_cursor
+        )
+    
+    async def _record_exchange(
+        self,
+        session_id: str,
+        user_id: UUID,
+        messages: List[ChatMessage]
+    ) -> None:
+        """Update session counters and analytics rollups for new messages."""
+        now = datetime.utcnow()
+        await self.db.execute(
+            update(ChatSession)
+            .where(ChatSession.id == session_id)
+            .values(
+                total_messages=ChatSession.total_messages + len(messages),
+                last_activity=now,
+                updated_at=now
+            )
+        )
+        
+        for message in messages:
+            await self.analytics.record_message(
+                user_id=user_id,
                 created_at=message.created_at,
-                message_metadata=json.loads(message.message_metadata) if message.message_metadata else None,
-                context_used=message.context_used,
-                citations=json.loads(message.citations) if message.citations else None,
-                model_used=message.model_used,
+                role=message.role,
                 tokens_used=message.tokens_used,
-                response_time_ms=message.response_time_ms,
-                user_rating=message.user_rating
+                response_time_ms=message.response_time_ms
             )
-            for message in messages
-        ]
     
+    @traced("chat retrieve context")
     async def _search_relevant_context(
         self,
         query: str,
         book_filter: Optional[str] = None,
-        max_results: int = 5
+        max_results: int = settings.RETRIEVAL_MAX_RESULTS
     ) -> List[Dict[str, Any]]:
-        """Search for relevant context from Breslov texts."""
+        """Search for relevant context from Breslov texts (hybrid BM25 + vector)."""
         try:
-            # Use Sefaria client to search for relevant texts
-            search_results = await self.sefaria_client.search_texts(
+            search_results = await self.retriever.search(
                 query=query,
-                book_filter=book_filter,
-                limit=max_results
+                books=[book_filter] if book_filter else None,
+                max_results=max_results
             )
             
             context_results = []
             for result in search_results:
                 context_results.append({
-                    "text": result.get("text", ""),
+                    "text": result.get("document", ""),
                     "ref": result.get("ref", ""),
                     "book": result.get("book", ""),
                     "chapter": result.get("chapter"),
@@ -219,23 +311,15 @@ class ChatService:
             logger.error(f"Error searching context: {e}")
             return []
     
-    async def _generate_response(
+    def _build_prompt(
         self,
         message: str,
         context: List[Dict[str, Any]],
-        language: str = "en"
-    ) -> Dict[str, Any]:
-        """Generate AI response using Gemini."""
-        try:
-            # Prepare context for the prompt
-            context_text = ""
-            if context:
-                context_text = "\n\n**Relevant texts from Breslov literature:**\n"
-                for ctx in context:
-                    context_text += f"- {ctx['ref']}: {ctx['text']}\n"
-            
-            # Create prompt
-            system_prompt = f"""You are a knowledgeable assistant specializing in Breslov Chassidic texts and teachings. 
+        language: str = "en",
+        memory: Optional[MemoryWindow] = None
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """Build a token-budgeted prompt from memory and retrieved context."""
+        instructions = f"""You are a knowledgeable assistant specializing in Breslov Chassidic texts and teachings. 
             You help users understand the writings of Rabbi Nachman of Breslov and related works.
             
             When answering:
@@ -243,13 +327,28 @@ class ChatService:
             2. If you reference a specific text, cite it properly
             3. Be respectful and spiritual in your approach
             4. If you don't know something, say so honestly
-            5. Respond in {language} language
-            
-            {context_text}
-            
-            User question: {message}
-            
-            Please provide a thoughtful response based on the Breslov teachings."""
+            5. Respond in {language} language"""
+        
+        return self.memory.build_prompt(
+            instructions=instructions,
+            question=message,
+            context=context,
+            window=memory,
+            closing="Please provide a thoughtful response based on the Breslov teachings."
+        )
+    
+    @traced("chat generate response")
+    async def _generate_response(
+        self,
+        message: str,
+        context: List[Dict[str, Any]],
+        language: str = "en",
+        memory: Optional[MemoryWindow] = None
+    ) -> Dict[str, Any]:
+        """Generate AI response using Gemini."""
+        try:
+            system_prompt, used_context = self._build_prompt(message, context, language, memory)
+            context_text = "\n".join(f"- {ctx['ref']}: {ctx['text']}" for ctx in used_context)
             
             # Generate response using Gemini
             response_data = await self.gemini_manager.generate_response(
@@ -274,6 +373,27 @@ class ChatService:
                 "response_time_ms": 0
             }
     
+    async def _compact(self, session_id: str, user_id: UUID, language: str) -> None:
+        try:
+            # The request's session is closed by the time this runs
+            async with get_db_session() as db:
+                memory = ConversationMemory(db, self.gemini_manager)
+                await memory.compact(session_id, user_id, language=language)
+        except Exception as e:
+            logger.error(f"Background compaction failed for session {session_id}: {e}")
+        finally:
+            _compacting_sessions.discard(session_id)
+    
+    def _schedule_compaction(self, session_id: str, user_id: UUID, language: str) -> None:
+        """Compact the session memory in a background task with its own DB session."""
+        if session_id in _compacting_sessions:
+            return
+        _compacting_sessions.add(session_id)
+        task = asyncio.create_task(self._compact(session_id, user_id, language))
+        _compaction_tasks.add(task)
+        task.add_done_callback(_compaction_tasks.discard)
+    
+    @traced("chat process message")
     async def process_message(
         self,
         user_id: UUID,
@@ -294,14 +414,18 @@ class ChatService:
             context = await self._search_relevant_context(
                 query=chat_request.message,
                 book_filter=chat_request.book_filter,
-                max_results=5
+                max_results=settings.RETRIEVAL_MAX_RESULTS
             )
             
+            # Load bounded conversation memory
+            memory = await self.memory.load(chat_request.session_id, user_id)
+            
             # Generate AI response
             ai_response = await self._generate_response(
                 message=chat_request.message,
                 context=context,
-                language=chat_request.language
+                language=chat_request.language,
+                memory=memory
             )
             
             # Save user message
@@ -338,19 +462,18 @@ class ChatService:
             
             self.db.add(assistant_message)
             
-            # Update session
-            await self.db.execute(
-                select(ChatSession)
-                .where(ChatSession.id == chat_request.session_id)
-                .values(
-                    total_messages=ChatSession.total_messages + 2,
-                    last_activity=datetime.utcnow(),
-                    updated_at=datetime.utcnow()
-                )
+            # Update session and analytics rollups in the same transaction
+            await self._record_exchange(
+                chat_request.session_id,
+                user_id,
+                [user_message, assistant_message]
             )
             
             await self.db.commit()
             
+            # Fold turns that left the verbatim window into the summary, off the response path
+            self._schedule_compaction(chat_request.session_id, user_id, chat_request.language)
+            
             # Prepare citations
             citations = [
                 {
@@ -414,7 +537,7 @@ class ChatService:
             context = await self._search_relevant_context(
                 query=chat_request.message,
                 book_filter=chat_request.book_filter,
-                max_results=5
+                max_results=settings.RETRIEVAL_MAX_RESULTS
             )
             
             # Yield context first
@@ -427,10 +550,18 @@ class ChatService:
             }
             
             # Stream AI response
+            memory = await self.memory.load(chat_request.session_id, user_id)
+            prompt, used_context = self._build_prompt(
+                chat_request.message,
+                context,
+                chat_request.language,
+                memory
+            )
+            
             full_response = ""
             async for chunk in self.gemini_manager.stream_response(
-                prompt=chat_request.message,
-                context=context,
+                prompt=prompt,
+                context=used_context,
                 language=chat_request.language
             ):
                 full_response += chunk
@@ -470,13 +601,20 @@ class ChatService:
                 context_used=len(context) > 0,
                 citations=json.dumps(context) if context else None,
                 model_used="gemini-1.5-pro",
-                tokens_used=len(full_response.split()) * 1.3,  # Rough estimate
+                tokens_used=int(len(full_response.split()) * 1.3),  # Rough estimate
                 response_time_ms=response_time_ms
             )
             
             self.db.add(assistant_message)
+            await self._record_exchange(
+                chat_request.session_id,
+                user_id,
+                [user_message, assistant_message]
+            )
             await self.db.commit()
             
+            self._schedule_compaction(chat_request.session_id, user_id, chat_request.language)
+            
             # Yield completion
             yield {
                 "type": "complete",
@@ -552,7 +690,14 @@ class ChatService:
             if not message:
                 return False
             
+            previous_rating = message.user_rating
             message.user_rating = rating
+            await self.analytics.record_rating(
+                user_id,
+                message.created_at,
+                previous_rating,
+                rating
+            )
             await self.db.commit()
             
             logger.info(f"Rated message {message_id} with {rating} stars")
@@ -567,64 +712,19 @@ class ChatService:
         user_id: UUID,
         days: int = 30
     ) -> Dict[str, Any]:
-        """Get chat analytics for a user."""
+        """Get chat analytics for a user from the daily rollups."""
         try:
-            from datetime import timedelta
-            
-            start_date = datetime.utcnow() - timedelta(days=days)
-            
-            # Total messages
-            total_messages_result = await self.db.execute(
-                select(func.count(ChatMessage.id)).where(
-                    and_(
-                        ChatMessage.user_id == user_id,
-                        ChatMessage.created_at >= start_date
-                    )
-                )
-            )
-            total_messages = total_messages_result.scalar() or 0
-            
-            # Total sessions
-            total_sessions_result = await self.db.execute(
-                select(func.count(ChatSession.id)).where(
-                    and_(
-                        ChatSession.user_id == user_id,
-                        ChatSession.created_at >= start_date
-                    )
-                )
-            )
-            total_sessions = total_sessions_result.scalar() or 0
-            
-            # Average response time
-            avg_response_time_result = await self.db.execute(
-                select(func.avg(ChatMessage.response_time_ms)).where(
-                    and_(
-                        ChatMessage.user_id == user_id,
-                        ChatMessage.created_at >= start_date,
-                        ChatMessage.role == ChatRole.ASSISTANT
-                    )
-                )
-            )
-            avg_response_time = avg_response_time_result.scalar() or 0
-            
-            return {
-                "user_id": str(user_id),
-                "period_days": days,
-                "total_messages": total_messages,
-                "total_sessions": total_sessions,
-                "avg_response_time_ms": int(avg_response_time),
-                "period_start": start_date.isoformat(),
-                "period_end": datetime.utcnow().isoformat()
-            }
+            return await self.analytics.get_summary(user_id, days)
             
         except Exception as e:
             logger.error(f"Error getting analytics: {e}")
+            now = datetime.utcnow()
             return {
                 "user_id": str(user_id),
                 "period_days": days,
                 "total_messages": 0,
                 "total_sessions": 0,
                 "avg_response_time_ms": 0,
-                "period_start": start_date.isoformat(),
-                "period_end": datetime.utcnow().isoformat()
-            }
\ No newline at end of file
+                "period_start": (now - timedelta(days=days)).isoformat(),
+                "period_end": now.isoformat()
+            }
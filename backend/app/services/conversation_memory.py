@@ -0,0 +1,298 @@
+"""
+Token-budgeted rolling conversation memory for chat sessions.
+
+The last few turns of a session are kept verbatim while older turns are
+folded incrementally into a per-session summary stored on ``ChatSession``.
+Prompts are assembled under a hard token ceiling so that long study
+sessions keep a constant prompt size.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, desc, and_, func, tuple_
+
+from app.models.chat import ChatMessage, ChatSession, ChatRole
+from app.core.config import settings
+from app.utils.logger import setup_logger
+from app.utils.tracing import traced
+
+logger = setup_logger(__name__)
+
+# Passages shorter than this are not worth clipping into the prompt
+MIN_CLIPPED_TOKENS = 50
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    Estimate the number of model tokens in a text.
+
+    Uses the larger of a word-based and a character-based estimate so that
+    Hebrew text (few spaces, many tokens per word) is not undercounted.
+    """
+    if not text:
+        return 0
+    return int(max(len(text.split()) * 1.3, len(text) / 4)) + 1
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Clip text so that its estimated size fits in max_tokens."""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    # Character estimate is the tighter bound, shrink until it fits
+    clipped = text[: max_tokens * 4]
+    while clipped and estimate_tokens(clipped + "...") > max_tokens:
+        clipped = clipped[: int(len(clipped) * 0.9)]
+    return clipped.rstrip() + "..." if clipped else ""
+
+
+@dataclass
+class MemoryWindow:
+    """Conversation state that is eligible to be sent with the next prompt."""
+    summary: Optional[str] = None
+    turns: List[Dict[str, str]] = field(default_factory=list)
+
+
+class ConversationMemory:
+    """
+    Rolling conversation memory with incremental summarisation.
+
+    Unsummarised messages accumulate until they reach twice the verbatim
+    window; the older half is then folded into the session summary in a
+    single model call, so both loading and compaction stay bounded.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        gemini_manager: Any,
+        recent_turns: Optional[int] = None,
+        max_prompt_tokens: Optional[int] = None,
+        summary_max_tokens: Optional[int] = None,
+    ):
+        self.db = db
+        self.gemini_manager = gemini_manager
+        self.recent_turns = recent_turns or settings.CHAT_MEMORY_RECENT_TURNS
+        self.max_prompt_tokens = max_prompt_tokens or settings.CHAT_PROMPT_MAX_TOKENS
+        self.summary_max_tokens = summary_max_tokens or settings.CHAT_SUMMARY_MAX_TOKENS
+
+    @property
+    def window_messages(self) -> int:
+        """Number of messages kept verbatim (one turn is two messages)."""
+        return self.recent_turns * 2
+
+    def _unsummarized_filter(self, session_id: str, user_id: UUID, boundary: Tuple[Optional[datetime], Optional[UUID]]):
+        conditions = [
+            ChatMessage.session_id == session_id,
+            ChatMessage.user_id == user_id,
+        ]
+        summarized_until, summarized_until_id = boundary
+        if summarized_until is not None and summarized_until_id is not None:
+            # Messages sharing the boundary timestamp are told apart by id
+            conditions.append(
+                tuple_(ChatMessage.created_at, ChatMessage.id) > tuple_(summarized_until, summarized_until_id)
+            )
+        elif summarized_until is not None:
+            conditions.append(ChatMessage.created_at > summarized_until)
+        return and_(*conditions)
+
+    async def _get_session_state(
+        self,
+        session_id: str,
+        user_id: UUID
+    ) -> Tuple[Optional[str], Tuple[Optional[datetime], Optional[UUID]]]:
+        result = await self.db.execute(
+            select(ChatSession.summary, ChatSession.summarized_until, ChatSession.summarized_until_id).where(
+                and_(
+                    ChatSession.id == session_id,
+                    ChatSession.user_id == user_id
+                )
+            )
+        )
+        row = result.first()
+        if not row:
+            return None, (None, None)
+        return row.summary, (row.summarized_until, row.summarized_until_id)
+
+    @traced("chat memory load")
+    async def load(self, session_id: str, user_id: UUID) -> MemoryWindow:
+        """Load the cached summary and the unsummarised tail of a session."""
+        try:
+            summary, boundary = await self._get_session_state(session_id, user_id)
+
+            # Never more than two windows are left unsummarised
+            result = await self.db.execute(
+                select(ChatMessage.role, ChatMessage.content)
+                .where(self._unsummarized_filter(session_id, user_id, boundary))
+                .order_by(desc(ChatMessage.created_at), desc(ChatMessage.id))
+                .limit(self.window_messages * 2)
+            )
+            rows = list(reversed(result.all()))
+
+            return MemoryWindow(
+                summary=summary,
+                turns=[{"role": row.role, "content": row.content} for row in rows]
+            )
+
+        except Exception as e:
+            logger.error(f"Error loading conversation memory for {session_id}: {e}")
+            return MemoryWindow()
+
+    def build_prompt(
+        self,
+        instructions: str,
+        question: str,
+        context: List[Dict[str, Any]],
+        window: Optional[MemoryWindow] = None,
+        closing: str = "",
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Assemble a prompt that never exceeds the configured token ceiling.
+
+        Instructions and the question are always sent. The remaining budget
+        is filled in priority order: session summary, retrieved passages
+        (in rank order), then recent turns from newest to oldest.
+
+        Returns:
+            Prompt text and the context passages that were actually included
+        """
+        window = window or MemoryWindow()
+
+        question = truncate_to_tokens(question, self.max_prompt_tokens // 4)
+        fixed = f"{instructions}\n\nUser question: {question}\n\n{closing}"
+        budget = self.max_prompt_tokens - estimate_tokens(fixed)
+
+        # Session summary
+        summary_block = ""
+        if window.summary and budget > 0:
+            summary_text = truncate_to_tokens(window.summary, min(self.summary_max_tokens, budget))
+            if summary_text:
+                summary_block = f"\n\n**Conversation so far (summary):**\n{summary_text}"
+                budget -= estimate_tokens(summary_block)
+
+        # Retrieved passages
+        used_context: List[Dict[str, Any]] = []
+        context_lines: List[str] = []
+        for ctx in context:
+            line = f"- {ctx.get('ref', '')}: {ctx.get('text', '')}\n"
+            cost = estimate_tokens(line)
+            if cost > budget:
+                if budget < MIN_CLIPPED_TOKENS:
+                    break
+                line = truncate_to_tokens(line, budget) + "\n"
+                cost = estimate_tokens(line)
+            context_lines.append(line)
+            used_context.append(ctx)
+            budget -= cost
+        context_block = ""
+        if context_lines:
+            context_block = "\n\n**Relevant texts from Breslov literature:**\n" + "".join(context_lines)
+
+        # Recent turns, newest first, then restored to chronological order
+        turn_lines: List[str] = []
+        for turn in reversed(window.turns[-self.window_messages:]):
+            speaker = "User" if turn["role"] == ChatRole.USER else "Assistant"
+            line = f"{speaker}: {turn['content']}\n"
+            cost = estimate_tokens(line)
+            if cost > budget:
+                break
+            turn_lines.append(line)
+            budget -= cost
+        turns_block = ""
+        if turn_lines:
+            turns_block = "\n\n**Recent conversation:**\n" + "".join(reversed(turn_lines))
+
+        prompt = (
+            f"{instructions}{summary_block}{context_block}{turns_block}"
+            f"\n\nUser question: {question}\n\n{closing}"
+        )
+        return prompt, used_context
+
+    async def _summarize(self, previous_summary: Optional[str], messages: List[ChatMessage], language: str) -> str:
+        transcript = "\n".join(
+            f"{'User' if m.role == ChatRole.USER else 'Assistant'}: {m.content}"
+            for m in messages
+        )
+        prompt = f"""Update the running summary of a study conversation about Breslov texts.
+        Keep the key questions, the texts and references discussed, and any conclusions.
+        Write at most {self.summary_max_tokens // 2} words in {language} language.
+
+        Current summary:
+        {previous_summary or "(none)"}
+
+        New exchanges:
+        {truncate_to_tokens(transcript, self.max_prompt_tokens // 2)}
+
+        Updated summary:"""
+
+        try:
+            response_data = await self.gemini_manager.generate_response(
+                prompt=prompt,
+                context="",
+                language=language
+            )
+            summary = response_data.get("response", "").strip()
+            if summary:
+                return truncate_to_tokens(summary, self.summary_max_tokens)
+        except Exception as e:
+            logger.warning(f"Summary generation failed, falling back to extract: {e}")
+
+        # Extractive fallback keeps the newest material within the cap
+        combined = f"{previous_summary or ''}\n{transcript}".strip()
+        budget_chars = self.summary_max_tokens * 4
+        return truncate_to_tokens(combined[-budget_chars:], self.summary_max_tokens)
+
+    @traced("chat memory compact")
+    async def compact(self, session_id: str, user_id: UUID, language: str = "en") -> bool:
+        """
+        Fold messages that left the verbatim window into the session summary.
+
+        Returns:
+            True if the summary was updated
+        """
+        try:
+            summary, boundary = await self._get_session_state(session_id, user_id)
+            unsummarized_filter = self._unsummarized_filter(session_id, user_id, boundary)
+
+            count_result = await self.db.execute(
+                select(func.count(ChatMessage.id)).where(unsummarized_filter)
+            )
+            pending = count_result.scalar() or 0
+            if pending < self.window_messages * 2:
+                return False
+
+            result = await self.db.execute(
+                select(ChatMessage)
+                .where(unsummarized_filter)
+                .order_by(ChatMessage.created_at, ChatMessage.id)
+                .limit(pending - self.window_messages)
+            )
+            to_fold = result.scalars().all()
+            if not to_fold:
+                return False
+
+            new_summary = await self._summarize(summary, to_fold, language)
+
+            await self.db.execute(
+                update(ChatSession)
+                .where(ChatSession.id == session_id)
+                .values(
+                    summary=new_summary,
+                    summarized_until=to_fold[-1].created_at,
+                    summarized_until_id=to_fold[-1].id
+                )
+            )
+            await self.db.commit()
+
+            logger.info(f"Compacted {len(to_fold)} messages into summary for session: {session_id}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error compacting conversation memory for {session_id}: {e}")
+            await self.db.rollback()
+            return False
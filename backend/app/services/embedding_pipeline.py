@@ -0,0 +1,279 @@
+"""
+Batched, incremental embedding pipeline for Breslov books.
+
+Each chunk is identified by book, section and position and carries a hash
+of its content. A JSON manifest records, per book, the embedder used, the
+chunk hashes and whether preparation completed, so restarts and re-imports
+only embed chunks that are new or changed.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from importlib.util import find_spec
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, Set, Tuple
+
+from app.config import settings
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Sections longer than this are split into chunks of about CHUNK_TARGET_CHARS
+CHUNK_MAX_CHARS = 1000
+CHUNK_TARGET_CHARS = 800
+
+# Model workers start clean instead of forking the app (and its event loop or
+# CUDA state) mid-request
+WORKER_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _as_text(value: Any) -> str:
+    """Flatten Sefaria text values, which may be nested lists of strings."""
+    if isinstance(value, list):
+        return " ".join(_as_text(v) for v in value)
+    return value or ""
+
+
+def chunk_text(text: str, max_chars: int = CHUNK_MAX_CHARS, target_chars: int = CHUNK_TARGET_CHARS) -> List[str]:
+    """Split text on word boundaries into chunks of about target_chars."""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + target_chars
+        if end >= len(text):
+            chunks.append(text[start:])
+            break
+        cut = text.rfind(" ", start, end + 1)
+        if cut <= start:
+            cut = end  # single word longer than a chunk
+        chunks.append(text[start:cut])
+        start = cut + 1 if text[cut] == " " else cut
+    return chunks
+
+
+def content_hash(value: Any) -> str:
+    """Stable hash of text or JSON-serialisable content."""
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+# Local model, loaded once per worker process
+_local_model = None
+
+
+def _init_local_worker(model_name: str) -> None:
+    global _local_model
+    from sentence_transformers import SentenceTransformer
+    _local_model = SentenceTransformer(model_name, device="cpu")
+
+
+def _encode_local(texts: List[str]) -> List[List[float]]:
+    return _local_model.encode(texts, batch_size=64, convert_to_numpy=True).tolist()
+
+
+class LocalEmbeddingFunction:
+    """
+    Embeds with a sentence-transformers model on CPU in a process pool.
+
+    Compatible with the ChromaDB embedding function interface so it can be
+    used for both indexing and queries.
+    """
+
+    def __init__(self, model_name: str, workers: int = 2):
+        if find_spec("sentence_transformers") is None:
+            raise ImportError(
+                "sentence-transformers package required for local embeddings. "
+                "Install with: pip install sentence-transformers"
+            )
+        self.model_name = model_name
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(WORKER_START_METHOD),
+                initializer=_init_local_worker,
+                initargs=(self.model_name,)
+            )
+        return self._pool
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        if not input:
+            return []
+        # One slice per worker keeps every process busy on large batches
+        size = max(1, -(-len(input) // self.workers))
+        parts = [input[i:i + size] for i in range(0, len(input), size)]
+        embeddings: List[List[float]] = []
+        for part in self._get_pool().map(_encode_local, parts):
+            embeddings.extend(part)
+        return embeddings
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def create_embedding_function(api_key: Optional[str] = None) -> Tuple[Any, str]:
+    """
+    Build the embedding function selected by EMBEDDING_BACKEND.
+
+    Returns:
+        The function and a name identifying the embedder (stored in the manifest)
+    """
+    if settings.EMBEDDING_BACKEND == "local":
+        embedding_fn = LocalEmbeddingFunction(
+            settings.CHROMADB_EMBEDDING_MODEL,
+            workers=settings.EMBEDDING_WORKERS
+        )
+        return embedding_fn, f"local:{settings.CHROMADB_EMBEDDING_MODEL}"
+
+    from chromadb.utils import embedding_functions
+    embedding_fn = embedding_functions.GoogleGenerativeAiEmbeddingFunction(
+        api_key=api_key or settings.GEMINI_API_KEY,
+        model_name="models/text-embedding-004"
+    )
+    return embedding_fn, "google:models/text-embedding-004"
+
+
+@dataclass
+class Chunk:
+    """A unit of text to embed."""
+    id: str
+    text: str
+    metadata: Dict[str, Any]
+    hash: str
+
+
+def build_chunks(book_name: str, book_data: Dict) -> List[Chunk]:
+    """Chunk every section of a book; ids are stable across re-imports."""
+    chunks = []
+    for ref, content in book_data.get("sections", {}).items():
+        hebrew_text = _as_text(content.get("hebrew", ""))
+        english_text = _as_text(content.get("english", ""))
+
+        for position, text in enumerate(chunk_text(f"{hebrew_text}\n\n{english_text}")):
+            chunks.append(Chunk(
+                id=f"{book_name}_{ref}_{position}",
+                text=text,
+                metadata={
+                    "book": book_name,
+                    "ref": ref,
+                    "hebrew": hebrew_text,
+                    "english": english_text,
+                    "chunk_id": position,
+                },
+                hash=content_hash(text)
+            ))
+    return chunks
+
+
+class EmbeddingPipeline:
+    """Plans, batches and records embedding work per book."""
+
+    def __init__(self, embedding_fn: Any, embedder_name: str, manifest_path: Path, batch_size: int = 100):
+        self.embedding_fn = embedding_fn
+        self.embedder_name = embedder_name
+        self.manifest_path = Path(manifest_path)
+        self.batch_size = batch_size
+        self.manifest: Dict[str, Dict[str, Any]] = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        if not self.manifest_path.exists():
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Unreadable embedding manifest {self.manifest_path}: {e}")
+            return {}
+
+    def _save_manifest(self) -> None:
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def book_hash(self, book_data: Dict) -> str:
+        """Hash of a book's sections, used to skip unchanged books entirely."""
+        return content_hash(book_data.get("sections", {}))
+
+    def completed_books(self) -> Set[str]:
+        """Books fully prepared with the current embedder."""
+        return {
+            book for book, state in self.manifest.items()
+            if state.get("completed_at") and state.get("embedder") == self.embedder_name
+        }
+
+    def is_complete(self, book_name: str, book_hash: str) -> bool:
+        state = self.manifest.get(book_name, {})
+        return (
+            bool(state.get("completed_at"))
+            and state.get("embedder") == self.embedder_name
+            and state.get("book_hash") == book_hash
+        )
+
+    def embedder_changed(self, book_name: str) -> bool:
+        """True if the book was embedded with a different model (vectors are incompatible)."""
+        state = self.manifest.get(book_name)
+        return bool(state) and state.get("embedder") != self.embedder_name
+
+    def plan(self, book_name: str, chunks: List[Chunk]) -> Tuple[List[Chunk], List[str]]:
+        """
+        Compare chunks with the manifest.
+
+        Returns:
+            Chunks to embed (new or changed) and ids of chunks that no longer exist
+        """
+        state = self.manifest.get(book_name, {})
+        known = state.get("chunks", {}) if state.get("embedder") == self.embedder_name else {}
+
+        to_embed = [chunk for chunk in chunks if known.get(chunk.id) != chunk.hash]
+        current_ids = {chunk.id for chunk in chunks}
+        stale_ids = [chunk_id for chunk_id in known if chunk_id not in current_ids]
+        return to_embed, stale_ids
+
+    def batches(self, chunks: List[Chunk]) -> Iterator[List[Chunk]]:
+        for i in range(0, len(chunks), self.batch_size):
+            yield chunks[i:i + self.batch_size]
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch (blocking; run it off the event loop)."""
+        return list(self.embedding_fn(texts))
+
+    def record_progress(self, book_name: str, chunks: List[Chunk]) -> None:
+        """
+        Record embedded chunks so that later runs skip them.
+
+        Call it only once the chunks are saved in the vector index: chunks
+        recorded here are never embedded again.
+        """
+        state = self.manifest.setdefault(book_name, {})
+        if state.get("embedder") != self.embedder_name:
+            state.clear()
+            state["embedder"] = self.embedder_name
+        state.setdefault("chunks", {}).update({chunk.id: chunk.hash for chunk in chunks})
+        state["completed_at"] = None
+        self._save_manifest()
+
+    def mark_complete(self, book_name: str, book_hash: str, chunks: List[Chunk]) -> None:
+        """Durably record that a book is fully prepared."""
+        self.manifest[book_name] = {
+            "embedder": self.embedder_name,
+            "book_hash": book_hash,
+            "chunks": {chunk.id: chunk.hash for chunk in chunks},
+            "completed_at": datetime.utcnow().isoformat(),
+        }
+        self._save_manifest()
@@ -21,6 +21,7 @@ from google.oauth2 import service_account
 from app.core.config import settings
 from app.services.cache_service import cache_service
 from app.utils.logger import logger
+from app.utils.monitoring import monitor_external_api
 
 
 class EnhancedTTSService:
@@ -230,23 +231,30 @@ class EnhancedTTSService:
             )
             
             # Synthétise l'audio
-            response = self.client.synthesize_speech(
-                input=synthesis_input,
-                voice=voice,
-                audio_config=audio_config
-            )
+            audio_content = await self._synthesize(synthesis_input, voice, audio_config)
             
             # Met en cache l'audio (7 jours)
-            audio_b64 = base64.b64encode(response.audio_content).decode()
+            audio_b64 = base64.b64encode(audio_content).decode()
             await cache_service.set("audio", cache_key, audio_b64, ttl=604800)
             
             logger.info(f"Audio synthétisé avec succès pour: {text[:50]}...")
-            return response.audio_content
+            return audio_content
             
         except Exception as e:
             logger.error(f"Erreur lors de la synthèse TTS: {e}")
             return None
     
+    @monitor_external_api("google_tts")
+    async def _synthesize(self, synthesis_input, voice, audio_config) -> bytes:
+        """Appel à l'API TTS dans un thread, pour ne pas bloquer la boucle d'événements"""
+        response = await asyncio.to_thread(
+            self.client.synthesize_speech,
+            input=synthesis_input,
+            voice=voice,
+            audio_config=audio_config
+        )
+        return response.audio_content
+    
     async def synthesize_mixed_language(
         self,
         text: str,
@@ -1,6 +1,5 @@
 import google.generativeai as genai
 import chromadb
-from chromadb.utils import embedding_functions
 import os
 from typing import Dict, List, Optional
 import json
@@ -8,6 +7,10 @@ import hashlib
 import asyncio
 from pathlib import Path
 
+from app.config import settings
+from app.services.embedding_pipeline import EmbeddingPipeline, build_chunks, create_embedding_function
+from app.services.vector_index import VectorIndex
+
 class GeminiContextManager:
     """Gestionnaire de contexte intelligent pour Gemini 1.5 Pro"""
     
@@ -25,18 +28,27 @@ class GeminiContextManager:
         
         # ChromaDB pour recherche vectorielle
         self.chroma_client = chromadb.PersistentClient(path="./chroma_db")
-        self.embedding_fn = embedding_functions.GoogleGenerativeAiEmbeddingFunction(
-            api_key=api_key,
-            model_name="models/text-embedding-004"
+        self.embedding_fn, embedder_name = create_embedding_function(api_key)
+        
+        # Pipeline incrémental: manifeste des chunks déjà embeddés
+        self.embedding_pipeline = EmbeddingPipeline(
+            self.embedding_fn,
+            embedder_name,
+            Path("data/embedding_manifest.json"),
+            batch_size=settings.EMBEDDING_BATCH_SIZE
         )
         
+        # Index vectoriel unifié (tous les livres, filtre par livre)
+        self.vector_index = VectorIndex(Path("data/vector_index"))
+        self.vector_index.load()
+        
         # Cache des résumés de livres
         self.summaries = {}
         self.summaries_file = Path("data/book_summaries.json")
         self._load_summaries()
         
-        # Statut d'initialisation
-        self.initialized_books = set()
+        # Statut d'initialisation (livres terminés lors d'exécutions précédentes)
+        self.initialized_books = self.embedding_pipeline.completed_books() & set(self.summaries)
         
     def _load_summaries(self):
         """Charge les résumés de livres depuis le cache"""
@@ -65,96 +77,65 @@ class GeminiContextManager:
         
         print(f"🔧 Préparation de {book_name} pour l'IA...")
         
+        book_hash = self.embedding_pipeline.book_hash(book_data)
+        if self.embedding_pipeline.is_complete(book_name, book_hash) and book_name in self.summaries:
+            self.initialized_books.add(book_name)
+            print(f"📖 {book_name} inchangé depuis la dernière préparation")
+            return True
+        
         try:
+            collection_name = f"breslov_{book_name.lower().replace(' ', '_')}"
+            
+            # Vecteurs d'un autre modèle incompatibles: repartir de zéro
+            if self.embedding_pipeline.embedder_changed(book_name):
+                try:
+                    self.chroma_client.delete_collection(collection_name)
+                except Exception:
+                    pass
+                self.vector_index.remove_book(book_name)
+            
             # Créer collection ChromaDB
             collection = self.chroma_client.get_or_create_collection(
-                name=f"breslov_{book_name.lower().replace(' ', '_')}",
+                name=collection_name,
                 embedding_function=self.embedding_fn,
                 metadata={"book": book_name}
             )
             
-            # Chunker intelligemment
-            chunks = []
-            chunk_id = 0
+            # Chunker et n'embedder que les chunks nouveaux ou modifiés
+            chunks = build_chunks(book_name, book_data)
+            to_embed, stale_ids = self.embedding_pipeline.plan(book_name, chunks)
             
-            for ref, content in book_data.get('sections', {}).items():
-                hebrew_text = content.get('hebrew', '')
-                english_text = content.get('english', '')
-                
-                # Combiner hébreu et anglais pour l'embedding
-                combined_text = f"{hebrew_text}\n\n{english_text}"
-                
-                # Créer des chunks de taille appropriée (max 1000 caractères)
-                if len(combined_text) > 1000:
-                    # Diviser en chunks plus petits
-                    words = combined_text.split()
-                    current_chunk = []
-                    current_length = 0
-                    
-                    for word in words:
-                        if current_length + len(word) > 800:  # Marge de sécurité
-                            if current_chunk:
-                                chunk = {
-                                    'id': f"{book_name}_{ref}_{chunk_id}",
-                                    'text': ' '.join(current_chunk),
-                                    'metadata': {
-                                        'book': book_name,
-                                        'ref': ref,
-                                        'hebrew': hebrew_text,
-                                        'english': english_text,
-                                        'chunk_id': chunk_id
-                                    }
-                                }
-                                chunks.append(chunk)
-                                chunk_id += 1
-                                current_chunk = []
-                                current_length = 0
-                        
-                        current_chunk.append(word)
-                        current_length += len(word) + 1
-                    
-                    # Dernier chunk
-                    if current_chunk:
-                        chunk = {
-                            'id': f"{book_name}_{ref}_{chunk_id}",
-                            'text': ' '.join(current_chunk),
-                            'metadata': {
-                                'book': book_name,
-                                'ref': ref,
-                                'hebrew': hebrew_text,
-                                'english': english_text,
-                                'chunk_id': chunk_id
-                            }
-                        }
-                        chunks.append(chunk)
-                        chunk_id += 1
-                else:
-                    # Chunk simple
-                    chunk = {
-                        'id': f"{book_name}_{ref}_{chunk_id}",
-                        'text': combined_text,
-                        'metadata': {
-                            'book': book_name,
-                            'ref': ref,
-                            'hebrew': hebrew_text,
-                            'english': english_text,
-                            'chunk_id': chunk_id
-                        }
-                    }
-                    chunks.append(chunk)
-                    chunk_id += 1
+            if stale_ids:
+                collection.delete(ids=stale_ids)
+                self.vector_index.remove(stale_ids)
+            
+            print(f"  🧮 {len(to_embed)}/{len(chunks)} chunks à embedder, {len(stale_ids)} supprimés")
+            
+            embedded = []
+            for batch_number, batch in enumerate(self.embedding_pipeline.batches(to_embed), start=1):
+                documents = [c.text for c in batch]
+                ids = [c.id for c in batch]
+                metadatas = [c.metadata for c in batch]
+                embeddings = await asyncio.to_thread(self.embedding_pipeline.embed, documents)
+                collection.upsert(
+                    documents=documents,
+                    embeddings=embeddings,
+                    metadatas=metadatas,
+                    ids=ids
+                )
+                self.vector_index.add(
+                    ids=ids,
+                    embeddings=embeddings,
+                    metadatas=metadatas,
+                    documents=documents
+                )
+                embedded.extend(batch)
+                print(f"  📦 Batch {batch_number}: {len(batch)} chunks embeddés")
             
-            # Ajouter à ChromaDB par batch
-            if chunks:
-                batch_size = 50
-                for i in range(0, len(chunks), batch_size):
-                    batch = chunks[i:i+batch_size]
-                    collection.add(
-                        documents=[c['text'] for c in batch],
-                        metadatas=[c['metadata'] for c in batch],
-                        ids=[c['id'] for c in batch]
-                    )
-                    print(f"  📦 Batch {i//batch_size + 1}: {len(batch)} chunks ajoutés")
+            # Le manifeste ne doit lister que des chunks déjà écrits dans l'index
+            self.vector_index.save()
+            if embedded:
+                self.embedding_pipeline.record_progress(book_name, embedded)
             
             # Générer résumé maître si pas déjà fait
             if book_name not in self.summaries:
@@ -163,6 +144,7 @@ class GeminiContextManager:
                 self.summaries[book_name] = summary
                 self._save_summaries()
             
+            self.embedding_pipeline.mark_complete(book_name, book_hash, chunks)
             self.initialized_books.add(book_name)
             print(f"✅ {book_name} préparé: {len(chunks)} chunks, résumé disponible")
             
@@ -182,7 +164,7 @@ class GeminiContextManager:
             if strategy['type'] == 'single_book':
                 return await self._answer_single_book(question, strategy['book'], mode)
             elif strategy['type'] == 'multi_book':
-                return await self._answer_multi_book(question, mode)
+                return await self._answer_multi_book(question, mode, strategy.get('books'))
             else:
                 return await self._answer_general(question, mode)
                 
@@ -275,36 +257,48 @@ Anglais: {meta['english'][:300]}...
             print(f"❌ Erreur single book: {e}")
             raise e
     
-    async def _answer_multi_book(self, question: str, mode: str):
-        """Répond en consultant plusieurs livres"""
-        
-        all_results = []
+    def rebuild_vector_index(self) -> int:
+        """Reconstruit l'index unifié depuis les collections ChromaDB existantes"""
         
-        # Chercher dans tous les livres initialisés
-        for book_name in self.initialized_books:
-            try:
-                collection_name = f"breslov_{book_name.lower().replace(' ', '_')}"
-                collection = self.chroma_client.get_collection(collection_name)
-                results = collection.query(query_texts=[question], n_results=3)
-                
-                for doc, meta, distance in zip(
-                    results['documents'][0], 
-                    results['metadatas'][0],
-                    results['distances'][0]
-                ):
-                    all_results.append({
-                        'book': book_name,
-                        'doc': doc,
-                        'meta': meta,
-                        'score': 1 - distance  # Convertir distance en score
-                    })
-            except Exception as e:
-                print(f"⚠️ Erreur recherche dans {book_name}: {e}")
+        for collection_ref in self.chroma_client.list_collections():
+            name = getattr(collection_ref, 'name', collection_ref)
+            if not name.startswith("breslov_"):
+                continue
+            
+            collection = self.chroma_client.get_collection(name)
+            data = collection.get(include=['embeddings', 'metadatas', 'documents'])
+            if not data['ids']:
                 continue
+            
+            self.vector_index.add(
+                ids=data['ids'],
+                embeddings=data['embeddings'],
+                metadatas=data['metadatas'],
+                documents=data['documents']
+            )
+        
+        self.vector_index.save()
+        print(f"🗂️ Index vectoriel reconstruit: {len(self.vector_index)} chunks")
+        return len(self.vector_index)
+    
+    async def _answer_multi_book(self, question: str, mode: str, books: Optional[List[str]] = None):
+        """Répond en consultant plusieurs livres"""
         
-        # Trier par pertinence
-        all_results.sort(key=lambda x: x['score'], reverse=True)
-        top_results = all_results[:15]
+        if not len(self.vector_index):
+            self.rebuild_vector_index()
+        
+        # Une seule recherche sur l'index unifié, filtrée par livre
+        book_filter = books or list(self.initialized_books) or None
+        query_embedding = self.embedding_fn([question])[0]
+        top_results = [
+            {
+                'book': hit['book'],
+                'doc': hit['document'],
+                'meta': {'ref': hit['ref'], 'book': hit['book'], 'chunk_id': hit['chunk_id']},
+                'score': hit['score']
+            }
+            for hit in self.vector_index.query(query_embedding, n_results=15, books=book_filter)
+        ]
         
         # Grouper par livre
         by_book = {}
@@ -0,0 +1,257 @@
+"""
+Hybrid lexical + vector retrieval over the local Breslov corpus.
+
+A BM25 index over the same chunks as the embedding pipeline catches exact
+Hebrew and English terms, and the unified vector index catches paraphrases.
+Both searches run concurrently. Their rankings are merged with reciprocal
+rank fusion, and neighbouring chunks of the same ref are collapsed so that
+the context budget is spent on distinct passages.
+"""
+import asyncio
+import json
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Sequence, Tuple
+
+from app.config import settings
+from app.services.conversation_memory import estimate_tokens
+from app.services.embedding_pipeline import build_chunks, create_embedding_function
+from app.services.vector_index import VectorIndex
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Niqqud and cantillation marks, and Hebrew punctuation inside words (geresh, gershayim)
+_HEBREW_MARKS = re.compile(r"[\u0591-\u05BD\u05BF-\u05C7\u05F3\u05F4\"']")
+_FINAL_LETTERS = str.maketrans("\u05DA\u05DD\u05DF\u05E3\u05E5", "\u05DB\u05DE\u05E0\u05E4\u05E6")
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Normalise and split Hebrew/English text into search terms."""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFC", text)
+    text = text.replace("\u05BE", " ")  # maqaf joins words
+    text = _HEBREW_MARKS.sub("", text).translate(_FINAL_LETTERS).lower()
+    return _TOKEN.findall(text)
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank).
+
+    Returns:
+        (id, score) pairs sorted by decreasing score
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """In-memory Okapi BM25 over chunk documents."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.chunks: List[Dict[str, Any]] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._lengths: List[int] = []
+        self._avg_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def build(self, chunks: List[Dict[str, Any]]) -> None:
+        """Index chunks with ``id``, ``book``, ``ref``, ``chunk_id`` and ``document``."""
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        lengths = []
+        for doc_index, chunk in enumerate(chunks):
+            terms = Counter(tokenize(chunk["document"]))
+            lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                postings[term].append((doc_index, frequency))
+
+        self.chunks = chunks
+        self._postings = dict(postings)
+        self._lengths = lengths
+        self._avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+    def search(self, query: str, n_results: int = 30, books: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Return the best matching chunks with their BM25 score."""
+        if not self.chunks:
+            return []
+
+        allowed = set(books) if books is not None else None
+        total = len(self.chunks)
+        scores: Dict[int, float] = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_index, frequency in postings:
+                if allowed is not None and self.chunks[doc_index]["book"] not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_index] / self._avg_length)
+                scores[doc_index] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
+        return [{**self.chunks[doc_index], "score": score} for doc_index, score in best]
+
+
+class HybridRetriever:
+    """Concurrent BM25 + vector search fused with reciprocal rank fusion."""
+
+    def __init__(
+        self,
+        books_dir: Path = Path("data/breslov_texts"),
+        vector_index_dir: Path = Path("data/vector_index"),
+        embedding_fn: Optional[Any] = None,
+        candidates: int = settings.RETRIEVAL_CANDIDATES,
+        rrf_k: int = settings.RETRIEVAL_RRF_K
+    ):
+        self.books_dir = Path(books_dir)
+        self.vector_index = VectorIndex(Path(vector_index_dir))
+        self.embedding_fn = embedding_fn
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+
+        self.lexical_index = BM25Index()
+        self._books_signature: Optional[Tuple] = None
+        self._vectors_mtime: Optional[float] = None
+
+    def _refresh_lexical(self) -> None:
+        """(Re)build the BM25 index when a book file was added or changed."""
+        files = sorted(
+            path for path in self.books_dir.glob("*.json")
+            if not path.stem.endswith(("_he", "_en"))  # per-language copies written by _save_book
+        ) if self.books_dir.exists() else []
+        signature = tuple((path.name, path.stat().st_mtime) for path in files)
+        if signature == self._books_signature:
+            return
+
+        chunks = []
+        for path in files:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    book_data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Skipping unreadable book file {path}: {e}")
+                continue
+            for chunk in build_chunks(path.stem, book_data):
+                chunks.append({
+                    "id": chunk.id,
+                    "book": path.stem,
+                    "ref": chunk.metadata["ref"],
+                    "chunk_id": chunk.metadata["chunk_id"],
+                    "document": chunk.text,
+                })
+
+        self.lexical_index.build(chunks)
+        self._books_signature = signature
+        logger.info(f"BM25 index built: {len(chunks)} chunks from {len(files)} books")
+
+    def _refresh_vectors(self) -> None:
+        """Re-map the vector index when another process saved a new version."""
+        chunks_file = self.vector_index.path / VectorIndex.CHUNKS_FILE
+        mtime = chunks_file.stat().st_mtime if chunks_file.exists() else None
+        if mtime != self._vectors_mtime:
+            self.vector_index.load()
+            self._vectors_mtime = mtime
+
+    def lexical_search(self, query: str, books: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        self._refresh_lexical()
+        return self.lexical_index.search(query, n_results=self.candidates, books=books)
+
+    def vector_search(self, query: str, books: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        self._refresh_vectors()
+        if not len(self.vector_index):
+            return []
+        if self.embedding_fn is None:
+            self.embedding_fn, _ = create_embedding_function()
+        embedding = self.embedding_fn([query])[0]
+        return self.vector_index.query(embedding, n_results=self.candidates, books=books)
+
+    def fuse(
+        self,
+        rankings: List[List[Dict[str, Any]]],
+        max_results: int = settings.RETRIEVAL_MAX_RESULTS,
+        max_tokens: int = settings.RETRIEVAL_MAX_CONTEXT_TOKENS
+    ) -> List[Dict[str, Any]]:
+        """
+        Fuse ranked chunk lists and select results within the budget.
+
+        Chunks adjacent to an already selected chunk of the same ref are
+        skipped, since they mostly repeat the same passage.
+        """
+        by_id: Dict[str, Dict[str, Any]] = {}
+        for ranking in rankings:
+            for hit in ranking:
+                by_id.setdefault(hit["id"], hit)
+
+        selected: List[Dict[str, Any]] = []
+        taken_positions: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        used_tokens = 0
+
+        for chunk_id, score in reciprocal_rank_fusion(
+            ([hit["id"] for hit in ranking] for ranking in rankings), k=self.rrf_k
+        ):
+            hit = by_id[chunk_id]
+            key = (hit["book"], hit["ref"])
+            position = hit.get("chunk_id") or 0
+            if any(abs(position - taken) <= 1 for taken in taken_positions[key]):
+                continue
+
+            tokens = estimate_tokens(hit["document"])
+            if selected and used_tokens + tokens > max_tokens:
+                continue
+
+            taken_positions[key].append(position)
+            used_tokens += tokens
+            selected.append({**hit, "score": score})
+            if len(selected) >= max_results:
+                break
+
+        return selected
+
+    async def search(
+        self,
+        query: str,
+        books: Optional[List[str]] = None,
+        max_results: int = settings.RETRIEVAL_MAX_RESULTS,
+        max_tokens: int = settings.RETRIEVAL_MAX_CONTEXT_TOKENS
+    ) -> List[Dict[str, Any]]:
+        """Run lexical and vector searches concurrently and fuse them."""
+        lexical, vector = await asyncio.gather(
+            asyncio.to_thread(self.lexical_search, query, books),
+            asyncio.to_thread(self.vector_search, query, books),
+            return_exceptions=True
+        )
+
+        rankings = []
+        for name, result in (("lexical", lexical), ("vector", vector)):
+            if isinstance(result, Exception):
+                logger.warning(f"{name} retrieval failed: {result}")
+            elif result:
+                rankings.append(result)
+
+        return self.fuse(rankings, max_results=max_results, max_tokens=max_tokens)
+
+
+_hybrid_retriever: Optional[HybridRetriever] = None
+
+
+def get_hybrid_retriever() -> HybridRetriever:
+    """Process-wide retriever, so indexes are built once and reused."""
+    global _hybrid_retriever
+    if _hybrid_retriever is None:
+        _hybrid_retriever = HybridRetriever()
+    return _hybrid_retriever
@@ -0,0 +1,154 @@
+"""
+Password hashing off the event loop.
+
+bcrypt and argon2 cost 100-300 ms of CPU per call. Run inline they block the
+worker's event loop, so a burst of logins stalls every other request. The
+PasswordHasher runs them in a dedicated, bounded process pool, and rejects
+new work with ``PasswordHasherBusy`` once ``PASSWORD_HASH_MAX_PENDING``
+calls are queued, instead of letting the queue grow without limit.
+
+``PASSWORD_HASH_SCHEME`` selects the scheme for new hashes. Hashes in the
+other scheme, or with outdated parameters, still verify and are reported
+for rehashing, so users migrate transparently on their next login.
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from app.config import settings
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SCHEMES = {
+    "bcrypt": ["bcrypt"],
+    "argon2": ["argon2", "bcrypt"],  # argon2 requires the argon2-cffi package
+}
+
+
+class PasswordHasherBusy(Exception):
+    """Too many hashing requests are already waiting."""
+
+
+# Workers are started from a clean process rather than forked from the app,
+# which would copy its event loop, sockets and held locks
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# Hashing context, built once per worker process
+_context: Optional[CryptContext] = None
+
+
+def _init_worker(schemes: List[str]) -> None:
+    global _context
+    _context = CryptContext(schemes=schemes, deprecated="auto")
+
+
+def _hash(password: str) -> str:
+    return _context.hash(password)
+
+
+def _verify(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Verify, and return a new hash when the stored one is outdated."""
+    valid, new_hash = _context.verify_and_update(password, hashed)
+    return valid, new_hash
+
+
+class PasswordHasher:
+    """Bounded process pool for password hashing and verification."""
+
+    def __init__(
+        self,
+        schemes: Optional[List[str]] = None,
+        workers: int = settings.PASSWORD_HASH_WORKERS,
+        max_pending: int = settings.PASSWORD_HASH_MAX_PENDING
+    ):
+        self.schemes = schemes or SCHEMES[settings.PASSWORD_HASH_SCHEME]
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+
+        self.counters = {"hashed": 0, "verified": 0, "rehashed": 0, "rejected": 0}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(START_METHOD),
+                initializer=_init_worker,
+                initargs=(self.schemes,)
+            )
+        return self._pool
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            self.counters["rejected"] += 1
+            raise PasswordHasherBusy(f"{self._pending} password hashing requests pending")
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(self._get_pool(), fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM killed): start a fresh pool and retry once
+                logger.error("Password hashing pool broken, restarting it")
+                self._pool = None
+                return await loop.run_in_executor(self._get_pool(), fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """
+        Hash a password with the configured scheme.
+
+        Raises:
+            PasswordHasherBusy: If too many requests are pending
+        """
+        hashed = await self._run(_hash, password)
+        self.counters["hashed"] += 1
+        return hashed
+
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password against its stored hash.
+
+        Returns:
+            Whether it matches, and a replacement hash when the stored one
+            uses a deprecated scheme or parameters (None otherwise)
+
+        Raises:
+            PasswordHasherBusy: If too many requests are pending
+        """
+        try:
+            valid, new_hash = await self._run(_verify, password, hashed)
+        except ValueError:
+            # Unknown or malformed hash
+            return False, None
+        self.counters["verified"] += 1
+        if valid and new_hash:
+            self.counters["rehashed"] += 1
+        return valid, new_hash if valid else None
+
+    def stats(self):
+        return {**self.counters, "pending": self._pending, "workers": self.workers}
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+_password_hasher: Optional[PasswordHasher] = None
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Process-wide hashing pool."""
+    global _password_hasher
+    if _password_hasher is None:
+        _password_hasher = PasswordHasher()
+    return _password_hasher
@@ -0,0 +1,207 @@
+"""
+Background prefetching of the next sections a reader is likely to open.
+
+When a section is read, the following ``PREFETCH_AHEAD`` sections (in book
+order from the catalog, or by incrementing the trailing number of the ref)
+are resolved through the TextResolver in the background (counted apart from
+reads in its statistics). That warms the local and Redis tiers and writes
+Sefaria fetches back to the database. Optionally
+the Hebrew TTS audio is also synthesised into the audio cache.
+
+Prefetching is best effort and never competes with foreground traffic:
+work beyond the per-reader and global per-minute budgets, or beyond
+``PREFETCH_MAX_INFLIGHT`` concurrent jobs, is dropped instead of queued.
+"""
+import asyncio
+import re
+import time
+from collections import deque, OrderedDict
+from typing import List, Dict, Any, Optional, Set
+
+from app.config import settings
+from app.database import get_db_session
+from app.services.book_catalog import BookCatalog, get_book_catalog
+from app.services.text_resolver import TextResolver, get_text_resolver, parse_ref
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_TRAILING_NUMBER = re.compile(r"^(.*?)(\d+)$")
+
+# Longest text sent to TTS when prefetching audio (Google TTS request limit)
+TTS_MAX_CHARS = 5000
+
+
+class _MinuteBudget:
+    """Sliding one-minute window of spent units."""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self._spent: deque = deque()
+
+    def take(self, units: int, now: float) -> int:
+        """Spend up to ``units``; returns how many were granted."""
+        while self._spent and self._spent[0] <= now - 60:
+            self._spent.popleft()
+        granted = max(0, min(units, self.per_minute - len(self._spent)))
+        self._spent.extend([now] * granted)
+        return granted
+
+    def refund(self, units: int) -> None:
+        for _ in range(min(units, len(self._spent))):
+            self._spent.pop()
+
+
+class SectionPrefetcher:
+    """Warms upcoming sections into the text caches within budgets."""
+
+    # Readers whose budgets are tracked at once (least recently seen evicted)
+    MAX_TRACKED_READERS = 10000
+
+    def __init__(
+        self,
+        resolver: TextResolver,
+        catalog: BookCatalog,
+        ahead: int = settings.PREFETCH_AHEAD,
+        user_per_minute: int = settings.PREFETCH_USER_PER_MINUTE,
+        global_per_minute: int = settings.PREFETCH_GLOBAL_PER_MINUTE,
+        max_inflight: int = settings.PREFETCH_MAX_INFLIGHT,
+        with_audio: bool = settings.PREFETCH_TTS
+    ):
+        self.resolver = resolver
+        self.catalog = catalog
+        self.ahead = ahead
+        self.user_per_minute = user_per_minute
+        self.max_inflight = max_inflight
+        self.with_audio = with_audio
+
+        self._global_budget = _MinuteBudget(global_per_minute)
+        self._user_budgets: "OrderedDict[str, _MinuteBudget]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+        self._tts_manager = None
+
+        self.counters = {
+            "scheduled": 0,
+            "prefetched": 0,
+            "already_cached": 0,
+            "dropped_budget": 0,
+            "dropped_busy": 0,
+            "audio": 0,
+            "errors": 0,
+        }
+
+    def next_refs(self, ref: str, count: int) -> List[str]:
+        """Refs of the ``count`` sections following ``ref``."""
+        book_id, _, _ = parse_ref(ref)
+        try:
+            page = self.catalog.sections_page(book_id, after_ref=ref, limit=count)
+        except KeyError:
+            page = None
+        if page is not None:
+            return [section["ref"] for section in page[0]]
+
+        match = _TRAILING_NUMBER.match(ref)
+        if not match:
+            return []
+        prefix, number = match.group(1), int(match.group(2))
+        return [f"{prefix}{number + offset}" for offset in range(1, count + 1)]
+
+    def _user_budget(self, reader: str) -> _MinuteBudget:
+        budget = self._user_budgets.get(reader)
+        if budget is None:
+            budget = self._user_budgets[reader] = _MinuteBudget(self.user_per_minute)
+            if len(self._user_budgets) > self.MAX_TRACKED_READERS:
+                self._user_budgets.popitem(last=False)
+        else:
+            self._user_budgets.move_to_end(reader)
+        return budget
+
+    def schedule(self, ref: str, reader: str) -> int:
+        """
+        Prefetch the sections following ``ref`` in the background.
+
+        Args:
+            ref: Section being read
+            reader: User id, or client address for anonymous readers
+
+        Returns:
+            Number of sections scheduled
+        """
+        if not settings.PREFETCH_ENABLED:
+            return 0
+        if len(self._tasks) >= self.max_inflight:
+            self.counters["dropped_busy"] += 1
+            return 0
+
+        candidates = self.next_refs(ref, self.ahead)
+        refs = [r for r in candidates if not self.resolver.is_cached_locally(r)]
+        self.counters["already_cached"] += len(candidates) - len(refs)
+        if not refs:
+            return 0
+
+        now = time.monotonic()
+        user_budget = self._user_budget(reader)
+        granted = user_budget.take(len(refs), now)
+        granted_global = self._global_budget.take(granted, now)
+        user_budget.refund(granted - granted_global)
+        self.counters["dropped_budget"] += len(refs) - granted_global
+        if not granted_global:
+            return 0
+
+        refs = refs[:granted_global]
+        task = asyncio.create_task(self._prefetch(refs))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self.counters["scheduled"] += len(refs)
+        return len(refs)
+
+    async def _prefetch(self, refs: List[str]) -> None:
+        try:
+            async with get_db_session() as db:
+                # One Sefaria request at a time: prefetch must not crowd out readers
+                async for ref, data, _ in self.resolver.iter_many(db, refs, concurrency=1, prefetch=True):
+                    if data is None:
+                        continue
+                    self.counters["prefetched"] += 1
+                    if self.with_audio:
+                        try:
+                            await self._prefetch_audio(data)
+                        except Exception as e:
+                            self.counters["errors"] += 1
+                            logger.warning(f"Audio prefetch of {ref} failed: {e}")
+        except Exception as e:
+            self.counters["errors"] += 1
+            logger.warning(f"Prefetch of {refs} failed: {e}")
+
+    async def _prefetch_audio(self, data: Dict[str, Any]) -> None:
+        hebrew = data.get("hebrew")
+        if isinstance(hebrew, list):
+            hebrew = " ".join(str(part) for part in hebrew if part)
+        if not hebrew:
+            return
+
+        if self._tts_manager is None:
+            from app.services.tts_manager import TTSManager
+            self._tts_manager = TTSManager()
+
+        # synthesize_speech stores the audio in the TTS cache
+        await self._tts_manager.synthesize_speech(hebrew[:TTS_MAX_CHARS], language="he")
+        self.counters["audio"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "inflight": len(self._tasks),
+            "tracked_readers": len(self._user_budgets),
+        }
+
+
+_section_prefetcher: Optional[SectionPrefetcher] = None
+
+
+def get_section_prefetcher() -> SectionPrefetcher:
+    """Process-wide prefetcher sharing the text resolver's caches."""
+    global _section_prefetcher
+    if _section_prefetcher is None:
+        _section_prefetcher = SectionPrefetcher(get_text_resolver(), get_book_catalog())
+    return _section_prefetcher
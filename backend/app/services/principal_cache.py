@@ -0,0 +1,201 @@
+"""
+Short-lived cache of authenticated users (principals).
+
+``get_current_user`` resolves the user of every authenticated request. The
+user's columns, except the password hash, are cached in a small in-process
+LRU, then in Redis, before falling back to Postgres. Code that needs the
+hash (password changes) loads the user from the database.
+
+Each user has a version number in Redis (``principal_version:<id>``), and
+Redis entries are stored under ``principal:<id>:<version>``. ``UserService``
+bumps the version after every change, which orphans the old entry (it
+expires on its own). A request that loaded the user before the change can
+only write it back under the old version, which nobody reads any more. The
+local tier is cleared in the process that made the change. Other processes
+see the change once their local entry expires (``PRINCIPAL_CACHE_TTL``
+seconds).
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from app.config import settings
+from app.models.user import User
+from app.redis_client import redis_client
+from app.utils.logger import setup_logger
+from app.utils.serialization import dumps, loads
+
+logger = setup_logger(__name__)
+
+VERSION_KEY_PREFIX = "principal_version:"
+ENTRY_KEY_PREFIX = "principal:"
+
+# Current version and the entry stored under it, in one round trip
+_LOOKUP_SCRIPT = """
+local version = redis.call('GET', KEYS[1]) or '0'
+return {version, redis.call('GET', ARGV[1] .. version)}
+"""
+
+
+# Never copied into the cache; cached principals carry an empty hash
+EXCLUDED_COLUMNS = frozenset({"hashed_password"})
+
+
+def _columns(user: User) -> Dict[str, Any]:
+    return {
+        column.name: getattr(user, column.name)
+        for column in User.__table__.columns
+        if column.name not in EXCLUDED_COLUMNS
+    }
+
+
+def _principal(data: Dict[str, Any]) -> User:
+    return User.model_validate({**data, "hashed_password": ""})
+
+
+class PrincipalCache:
+    """In-process LRU over a versioned Redis tier over the users table."""
+
+    # Seconds to skip the Redis tier after it failed
+    RETRY_DELAY = 5.0
+
+    def __init__(
+        self,
+        max_entries: int = settings.PRINCIPAL_CACHE_SIZE,
+        local_ttl: int = settings.PRINCIPAL_CACHE_TTL,
+        redis_ttl: int = settings.PRINCIPAL_CACHE_REDIS_TTL
+    ):
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+
+        self._entries: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # Bumped by invalidate() so loads started before a change are not stored locally
+        self._generations: Dict[int, int] = {}
+        self._lookup = None
+        self._redis_retry_at = 0.0
+
+        self.hits = {"local": 0, "redis": 0, "db": 0}
+
+    # --- local tier ------------------------------------------------------
+
+    def _get_local(self, user_id: int) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return data
+
+    def _set_local(self, user_id: int, data: Dict[str, Any]) -> None:
+        if self.max_entries == 0:
+            return
+        self._entries[user_id] = (time.monotonic() + self.local_ttl, data)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # --- Redis tier ------------------------------------------------------
+
+    async def _redis(self):
+        if time.monotonic() < self._redis_retry_at:
+            return None
+        if not redis_client.is_connected:
+            await redis_client.initialize()
+        return redis_client.client
+
+    def _redis_failed(self, e: Exception) -> None:
+        self._redis_retry_at = time.monotonic() + self.RETRY_DELAY
+        logger.warning(f"Principal cache: Redis unavailable, using the database: {e}")
+
+    async def _get_redis(self, user_id: int) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Current version of the user and its cached columns, if any."""
+        try:
+            client = await self._redis()
+            if client is None:
+                return None, None
+            if self._lookup is None:
+                self._lookup = client.register_script(_LOOKUP_SCRIPT)
+            version, raw = await self._lookup(
+                keys=[f"{VERSION_KEY_PREFIX}{user_id}"],
+                args=[f"{ENTRY_KEY_PREFIX}{user_id}:"]
+            )
+            return version, loads(raw) if raw else None
+        except (RedisError, OSError) as e:
+            self._redis_failed(e)
+            return None, None
+
+    async def _set_redis(self, user_id: int, version: str, data: Dict[str, Any]) -> None:
+        try:
+            client = await self._redis()
+            if client is not None:
+                await client.set(f"{ENTRY_KEY_PREFIX}{user_id}:{version}", dumps(data), ex=self.redis_ttl)
+        except (RedisError, OSError) as e:
+            self._redis_failed(e)
+
+    # --- public API ------------------------------------------------------
+
+    async def get(self, user_id: int, loader: Callable[[], Awaitable[Optional[User]]]) -> Optional[User]:
+        """
+        Resolve a user through the local, Redis and database tiers.
+
+        Args:
+            user_id: User ID
+            loader: Loads the user from the database on a miss
+
+        Returns:
+            A detached User without its password hash, or None if it does not exist
+        """
+        data = self._get_local(user_id)
+        if data is not None:
+            self.hits["local"] += 1
+            return _principal(data)
+
+        generation = self._generations.get(user_id, 0)
+        version, data = await self._get_redis(user_id)
+        if data is not None:
+            self.hits["redis"] += 1
+            user = _principal(data)
+        else:
+            user = await loader()
+            if user is None:
+                return None
+            self.hits["db"] += 1
+            data = _columns(user)
+            user = _principal(data)
+            if version is not None:
+                await self._set_redis(user_id, version, data)
+
+        if self._generations.get(user_id, 0) == generation:
+            self._set_local(user_id, data)
+        return user
+
+    async def invalidate(self, user_id: int) -> None:
+        """Drop a user after a change; call once the change is committed."""
+        self._entries.pop(user_id, None)
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        try:
+            client = await self._redis()
+            if client is not None:
+                await client.incr(f"{VERSION_KEY_PREFIX}{user_id}")
+        except (RedisError, OSError) as e:
+            self._redis_failed(e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.hits, "local_entries": len(self._entries)}
+
+
+_principal_cache: Optional[PrincipalCache] = None
+
+
+def get_principal_cache() -> PrincipalCache:
+    """Process-wide principal cache."""
+    global _principal_cache
+    if _principal_cache is None:
+        _principal_cache = PrincipalCache()
+    return _principal_cache
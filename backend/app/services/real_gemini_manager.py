@@ -10,6 +10,8 @@ from typing import Dict, List, Optional, Any
 from pathlib import Path
 import logging
 
+from app.utils.monitoring import monitor_external_api
+
 # Configuration logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -183,6 +185,7 @@ RÉPONSE:
                 "model": "none"
             }
     
+    @monitor_external_api("gemini")
     async def _call_gemini_api(self, prompt: str) -> str:
         """Appel direct à l'API Gemini RÉELLE"""
         
@@ -0,0 +1,209 @@
+"""
+Refresh tokens indexed by token id, with atomic rotation and reuse detection.
+
+Each live refresh token is a ``refresh_token:<jti>`` key holding its user
+and family, expiring with the token. ``refresh_tokens:<user_id>`` is a hash
+of the user's live tokens (jti -> family and expiry), used to revoke all of
+a user's tokens without scanning the keyspace.
+
+A family is the chain of tokens that starts at one login and continues
+through each rotation. Rotating deletes the presented token and leaves a
+``refresh_used:<jti>`` marker until that token would have expired. Seeing a
+used token again means it was copied: the whole family is revoked, and the
+thief and the legitimate client must both sign in again. A token presented
+again within ``REFRESH_TOKEN_REUSE_GRACE`` seconds of its rotation is only
+refused. That covers a client that sent two refreshes concurrently.
+
+Every operation is a single Lua script, so rotation takes one round trip and
+costs the same however many keys Redis holds.
+"""
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.redis_client import redis_client
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+TOKEN_KEY_PREFIX = "refresh_token:"
+USER_KEY_PREFIX = "refresh_tokens:"
+USED_KEY_PREFIX = "refresh_used:"
+
+# Results of rotate()
+ROTATED = "rotated"
+REUSED = "reused"
+STALE = "stale"
+UNKNOWN = "unknown"
+
+# Drops a family from a user's hash and deletes its token keys; also prunes
+# entries of expired tokens. Values of the hash are "<family> <expires_at>".
+_REVOKE_FAMILY_LUA = """
+local function revoke_family(user_key, family, now)
+    local entries = redis.call('HGETALL', user_key)
+    local revoked = 0
+    for i = 1, #entries, 2 do
+        local entry_family, expires_at = string.match(entries[i + 1], '^(%S+) (%S+)$')
+        if entry_family == family or family == '*' or tonumber(expires_at) <= now then
+            redis.call('DEL', 'refresh_token:' .. entries[i])
+            redis.call('HDEL', user_key, entries[i])
+            if entry_family == family or family == '*' then
+                revoked = revoked + 1
+            end
+        end
+    end
+    return revoked
+end
+"""
+
+# KEYS: token key, user key
+# ARGV: user id, jti, family, expires_at, ttl, now
+_ISSUE_SCRIPT = _REVOKE_FAMILY_LUA + """
+revoke_family(KEYS[2], '', tonumber(ARGV[6]))
+redis.call('SET', KEYS[1], ARGV[1] .. ' ' .. ARGV[3], 'EX', ARGV[5])
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[3] .. ' ' .. ARGV[4])
+if redis.call('TTL', KEYS[2]) < tonumber(ARGV[5]) then
+    redis.call('EXPIRE', KEYS[2], ARGV[5])
+end
+return 1
+"""
+
+# KEYS: old token key, user key, old used marker, new token key
+# ARGV: user id, old jti, new jti, new expires_at, new ttl, now, grace seconds
+_ROTATE_SCRIPT = _REVOKE_FAMILY_LUA + """
+local now = tonumber(ARGV[6])
+local current = redis.call('GET', KEYS[1])
+if not current then
+    local used = redis.call('GET', KEYS[3])
+    if not used then
+        return {'unknown', ''}
+    end
+    local family, used_at = string.match(used, '^(%S+) (%S+)$')
+    if now - tonumber(used_at) < tonumber(ARGV[7]) then
+        return {'stale', family}
+    end
+    revoke_family(KEYS[2], family, now)
+    redis.call('DEL', KEYS[3])
+    return {'reused', family}
+end
+
+local user_id, family = string.match(current, '^(%S+) (%S+)$')
+if user_id ~= ARGV[1] then
+    return {'unknown', ''}
+end
+
+local remaining = redis.call('TTL', KEYS[1])
+redis.call('DEL', KEYS[1])
+redis.call('HDEL', KEYS[2], ARGV[2])
+if remaining > 0 then
+    redis.call('SET', KEYS[3], family .. ' ' .. ARGV[6], 'EX', remaining)
+end
+
+redis.call('SET', KEYS[4], ARGV[1] .. ' ' .. family, 'EX', ARGV[5])
+redis.call('HSET', KEYS[2], ARGV[3], family .. ' ' .. ARGV[4])
+if redis.call('TTL', KEYS[2]) < tonumber(ARGV[5]) then
+    redis.call('EXPIRE', KEYS[2], ARGV[5])
+end
+return {'rotated', family}
+"""
+
+# KEYS: user key; ARGV: family ('*' for all), now
+_REVOKE_SCRIPT = _REVOKE_FAMILY_LUA + """
+return revoke_family(KEYS[1], ARGV[1], tonumber(ARGV[2]))
+"""
+
+
+class RefreshTokenStore:
+    """Live refresh tokens of every user, in Redis."""
+
+    def __init__(self, reuse_grace: int = settings.REFRESH_TOKEN_REUSE_GRACE):
+        self.reuse_grace = reuse_grace
+        self._scripts: Dict[str, Any] = {}
+
+    async def _script(self, name: str, source: str):
+        if not redis_client.is_connected:
+            await redis_client.initialize()
+        if name not in self._scripts:
+            self._scripts[name] = redis_client.client.register_script(source)
+        return self._scripts[name]
+
+    @staticmethod
+    def _ttl(expires_at: float, now: float) -> int:
+        return max(1, int(expires_at - now))
+
+    async def issue(self, user_id: int, jti: str, expires_at: float, family: Optional[str] = None) -> str:
+        """
+        Register a new refresh token.
+
+        Args:
+            user_id: Owner of the token
+            jti: Token id (``jti`` claim)
+            expires_at: Token expiry (unix time)
+            family: Family to add the token to; a new one is started if None
+
+        Returns:
+            The token's family
+        """
+        family = family or uuid.uuid4().hex
+        now = time.time()
+        script = await self._script("issue", _ISSUE_SCRIPT)
+        await script(
+            keys=[f"{TOKEN_KEY_PREFIX}{jti}", f"{USER_KEY_PREFIX}{user_id}"],
+            args=[user_id, jti, family, int(expires_at), self._ttl(expires_at, now), int(now)]
+        )
+        return family
+
+    async def rotate(self, user_id: int, old_jti: str, new_jti: str, new_expires_at: float) -> str:
+        """
+        Replace a refresh token by a new one of the same family.
+
+        Returns:
+            ``ROTATED`` on success, ``REUSED`` if the old token had already
+            been rotated (its family is then revoked), ``STALE`` if it was
+            rotated within the grace period, ``UNKNOWN`` otherwise
+        """
+        now = time.time()
+        script = await self._script("rotate", _ROTATE_SCRIPT)
+        result, family = await script(
+            keys=[
+                f"{TOKEN_KEY_PREFIX}{old_jti}",
+                f"{USER_KEY_PREFIX}{user_id}",
+                f"{USED_KEY_PREFIX}{old_jti}",
+                f"{TOKEN_KEY_PREFIX}{new_jti}",
+            ],
+            args=[
+                user_id, old_jti, new_jti, int(new_expires_at),
+                self._ttl(new_expires_at, now), int(now), self.reuse_grace,
+            ]
+        )
+        if result == REUSED:
+            logger.warning(f"Refresh token reuse detected for user {user_id}, family {family} revoked")
+        return result
+
+    async def is_active(self, user_id: int, jti: str) -> bool:
+        """Whether a refresh token is live and belongs to the user."""
+        if not redis_client.is_connected:
+            await redis_client.initialize()
+        current = await redis_client.get(f"{TOKEN_KEY_PREFIX}{jti}")
+        return current is not None and current.split(" ", 1)[0] == str(user_id)
+
+    async def revoke_family(self, user_id: int, family: str) -> int:
+        """Revoke one family (one signed-in device); returns the number of tokens revoked."""
+        script = await self._script("revoke", _REVOKE_SCRIPT)
+        return await script(keys=[f"{USER_KEY_PREFIX}{user_id}"], args=[family, int(time.time())])
+
+    async def revoke_all(self, user_id: int) -> int:
+        """Revoke every refresh token of a user; returns the number revoked."""
+        return await self.revoke_family(user_id, "*")
+
+
+_refresh_token_store: Optional[RefreshTokenStore] = None
+
+
+def get_refresh_token_store() -> RefreshTokenStore:
+    """Process-wide store, so its scripts are registered once."""
+    global _refresh_token_store
+    if _refresh_token_store is None:
+        _refresh_token_store = RefreshTokenStore()
+    return _refresh_token_store
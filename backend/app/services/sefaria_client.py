@@ -1,6 +1,6 @@
 import httpx
 import asyncio
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, AsyncIterator, Tuple
 from bs4 import BeautifulSoup
 import json
 import time
@@ -9,6 +9,10 @@ import os
 import redis
 import hashlib
 
+from app.services.book_catalog import get_book_catalog
+from app.utils.monitoring import monitor_external_api
+from app.utils.tracing import TracingClient
+
 class SefariaClient:
     """Client robuste pour Sefaria avec fallback scraping"""
     
@@ -81,7 +85,7 @@ class SefariaClient:
         """Récupère TOUS les livres avec stratégie robuste"""
         results = {}
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with TracingClient(timeout=30.0) as client:
             for book_key, book_info in self.BRESLOV_BOOKS.items():
                 print(f"\n📚 Fetching {book_info['he']} ({book_key})...")
                 
@@ -127,6 +131,7 @@ class SefariaClient:
         # 3. Fallback au web scraping
         return await self._scrape_book(client, book_key)
     
+    @monitor_external_api("sefaria")
     async def _fetch_via_api(self, client: httpx.AsyncClient, ref: str) -> Optional[Dict]:
         """Récupère via API v3"""
         try:
@@ -258,6 +263,36 @@ class SefariaClient:
             
         with open(self.data_dir / f"{book_key}_en.json", 'w', encoding='utf-8') as f:
             json.dump(english_texts, f, ensure_ascii=False, indent=2)
+        
+        # Mettre à jour le catalogue (liste des livres, ETag)
+        get_book_catalog().update_book(book_key)
+    
+    @monitor_external_api("sefaria")
+    async def _fetch_text(self, client: httpx.AsyncClient, ref: str) -> Optional[Dict]:
+        """Récupère un texte depuis l'API et le met en cache"""
+        try:
+            resp = await client.get(
+                f"{self.api_base}/texts/{ref}",
+                params={'context': 0, 'pad': 0}
+            )
+            
+            if resp.status_code == 200:
+                data = resp.json()
+                result = {
+                    'hebrew': data.get('he', ''),
+                    'english': data.get('text', ''),
+                    'ref': ref,
+                    'title': data.get('title', ref)
+                }
+                
+                # Cache pour 1 heure
+                self._set_cache(f"text:{ref}", result, ttl=3600)
+                return result
+                
+        except Exception as e:
+            print(f"Error fetching text {ref}: {e}")
+        
+        return None
     
     async def get_text(self, ref: str) -> Optional[Dict]:
         """Récupère un texte spécifique par référence"""
@@ -269,30 +304,30 @@ class SefariaClient:
             return cached
         
         # Récupérer depuis l'API
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            try:
-                resp = await client.get(
-                    f"{self.api_base}/texts/{ref}",
-                    params={'context': 0, 'pad': 0}
-                )
-                
-                if resp.status_code == 200:
-                    data = resp.json()
-                    result = {
-                        'hebrew': data.get('he', ''),
-                        'english': data.get('text', ''),
-                        'ref': ref,
-                        'title': data.get('title', ref)
-                    }
-                    
-                    # Cache pour 1 heure
-                    self._set_cache(cache_key, result, ttl=3600)
-                    return result
-                    
-            except Exception as e:
-                print(f"Error fetching text {ref}: {e}")
-                
-        return None
+        async with TracingClient(timeout=15.0) as client:
+            return await self._fetch_text(client, ref)
+    
+    def _get_many_from_cache(self, keys: List[str]) -> List[Optional[Dict]]:
+        """Récupère plusieurs clés en un seul aller-retour Redis (MGET)"""
+        if not self.cache_enabled or not keys:
+            return [None] * len(keys)
+        try:
+            values = self.redis_client.mget([self._get_cache_key(key) for key in keys])
+            return [json.loads(value) if value else None for value in values]
+        except:
+            return [None] * len(keys)
+    
+    async def fetch_texts(self, refs: List[str], concurrency: int = 8) -> AsyncIterator[Tuple[str, Optional[Dict]]]:
+        """Récupère des textes depuis l'API, au plus `concurrency` requêtes simultanées"""
+        semaphore = asyncio.Semaphore(concurrency)
+        limits = httpx.Limits(max_connections=concurrency)
+        async with TracingClient(timeout=15.0, limits=limits) as client:
+            async def fetch(ref: str):
+                async with semaphore:
+                    return ref, await self._fetch_text(client, ref)
+            
+            for future in asyncio.as_completed([fetch(ref) for ref in refs]):
+                yield await future
     
     async def search_texts(self, query: str, books: List[str] = None) -> List[Dict]:
         """Recherche dans les textes"""
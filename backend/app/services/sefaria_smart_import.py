@@ -2,7 +2,6 @@
 Service d'import intelligent Sefaria
 Détecte automatiquement si l'API fonctionne ou utilise le crawling
 """
-import httpx
 import asyncio
 from typing import Dict, List, Optional, Tuple
 import json
@@ -14,14 +13,16 @@ from sqlmodel import select
 from app.database import get_db_session
 from app.models.book import Book, BookCategory
 from app.models.text import Text
+from app.services.static_snapshot import get_static_snapshot
 from app.utils.logger import logger
+from app.utils.tracing import TracingClient
 
 
 class SefariaSmartImporter:
     """Import intelligent avec détection automatique API vs Crawling"""
     
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=10.0)
+        self.client = TracingClient(timeout=10.0)
         self.api_base = "https://www.sefaria.org/api/texts"
         self.web_base = "https://www.sefaria.org"
         self.method_used = None
@@ -301,6 +302,14 @@ async def import_missing_books():
                 logger.info(f"📊 {book_name}: {success_count} sections importées")
                 
         logger.info("\n✅ Import terminé!")
+    
+    # Régénérer l'export statique (seuls les fichiers modifiés sont réécrits)
+    try:
+        async with get_db_session() as session:
+            manifest = await get_static_snapshot().export(session)
+        logger.info(f"🗂️ Export statique {manifest['version']} publié")
+    except Exception as e:
+        logger.error(f"Erreur export statique: {str(e)}")
 
 
 # Script d'exécution
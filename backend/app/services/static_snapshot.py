@@ -0,0 +1,252 @@
+"""
+Static, pre-rendered snapshot of the text corpus.
+
+The texts only change when an import runs, so they can be served as files
+by nginx or a CDN instead of by the Python workers. ``StaticSnapshot.export``
+reads the ``texts`` table and writes, under ``STATIC_SNAPSHOT_DIR``:
+
+- ``books/<book>.<hash>.json`` with every text of a book;
+- ``books/<book>/<chapter>.<hash>.json`` with the texts of one chapter;
+- ``manifest.json`` mapping books and chapters to those files.
+
+Bundle names contain the hash of their content, so they are immutable and can
+be cached forever; only the manifest needs revalidation. Each bundle is also
+written precompressed (``.gz``, and ``.br`` when ``brotli`` is installed) for
+nginx ``gzip_static``/``brotli_static``. Unchanged bundles are not rewritten,
+and files referenced by neither the current nor the previous manifest are
+removed.
+"""
+import gzip
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Set
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.config import settings
+from app.models.text import Text
+from app.utils.logger import setup_logger
+from app.utils.serialization import dumps
+
+logger = setup_logger(__name__)
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+
+# Chapter key for texts without a chapter number
+UNNUMBERED = "0"
+
+
+def _text_item(row: Text) -> Dict[str, Any]:
+    return {
+        "ref": row.ref,
+        "chapter": row.chapter,
+        "verse": row.verse,
+        "hebrew": row.hebrew,
+        "english": row.english,
+        "french": row.french,
+    }
+
+
+class StaticSnapshot:
+    """Writes the static corpus bundles and resolves their public URLs."""
+
+    # Seconds between two mtime checks of the manifest
+    STAT_INTERVAL = 2.0
+
+    def __init__(self, output_dir: Path, base_url: str):
+        self.output_dir = Path(output_dir)
+        self.base_url = base_url.rstrip("/")
+        self.manifest_path = self.output_dir / MANIFEST_NAME
+
+        self._manifest: Optional[Dict[str, Any]] = None
+        self._manifest_mtime: Optional[float] = None
+        self._checked_at = 0.0
+
+    # --- writing ---------------------------------------------------------
+
+    def _write_bundle(self, relative_dir: str, name: str, content: Dict[str, Any]) -> Dict[str, Any]:
+        """Write one content-hashed bundle (and its compressed variants) if absent."""
+        body = dumps(content)
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        path = f"{relative_dir}/{name}.{digest[:12]}.json"
+        target = self.output_dir / path
+
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            variants = [(target, body), (Path(f"{target}.gz"), gzip.compress(body, compresslevel=9, mtime=0))]
+            if BROTLI_AVAILABLE:
+                variants.append((Path(f"{target}.br"), brotli.compress(body, quality=11)))
+            # The identity file goes last: its presence marks the bundle complete
+            for variant_path, data in reversed(variants):
+                tmp_path = variant_path.with_name(variant_path.name + ".tmp")
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, variant_path)
+
+        return {"path": path, "hash": digest, "size": len(body)}
+
+    async def _book_slugs(self, db: AsyncSession) -> List[str]:
+        result = await db.execute(
+            select(Text.book_slug).where(Text.is_active == True).distinct().order_by(Text.book_slug)
+        )
+        return [slug for slug in result.scalars().all() if slug]
+
+    async def _export_book(self, db: AsyncSession, book_slug: str) -> Dict[str, Any]:
+        result = await db.execute(
+            select(Text)
+            .where(Text.book_slug == book_slug, Text.is_active == True)
+            .order_by(Text.chapter, Text.verse, Text.ref)
+        )
+
+        chapters: Dict[str, List[Dict[str, Any]]] = {}
+        for row in result.scalars().all():
+            key = str(row.chapter) if row.chapter is not None else UNNUMBERED
+            chapters.setdefault(key, []).append(_text_item(row))
+
+        chapter_entries = {}
+        for chapter, texts in chapters.items():
+            entry = self._write_bundle(
+                f"books/{book_slug}", chapter,
+                {"book": book_slug, "chapter": chapter, "texts": texts}
+            )
+            entry["texts"] = len(texts)
+            chapter_entries[chapter] = entry
+
+        book_entry = self._write_bundle(
+            "books", book_slug,
+            {"book": book_slug, "chapters": chapters}
+        )
+        book_entry["texts"] = sum(len(texts) for texts in chapters.values())
+        book_entry["chapters"] = chapter_entries
+        return book_entry
+
+    async def export(self, db: AsyncSession) -> Dict[str, Any]:
+        """
+        Write the bundles of every active text and publish a new manifest.
+
+        Returns:
+            The new manifest
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        previous = self._read_manifest() or {}
+
+        books = {}
+        for book_slug in await self._book_slugs(db):
+            books[book_slug] = await self._export_book(db, book_slug)
+            logger.info(f"Snapshot of {book_slug}: {books[book_slug]['texts']} texts")
+
+        version = hashlib.blake2b(
+            "".join(f"{slug}:{entry['hash']};" for slug, entry in sorted(books.items())).encode(),
+            digest_size=8
+        ).hexdigest()
+        manifest = {
+            "format": FORMAT_VERSION,
+            "version": version,
+            "generated_at": datetime.utcnow().isoformat(),
+            "books": books,
+        }
+        if previous.get("version") == version:
+            manifest["generated_at"] = previous.get("generated_at", manifest["generated_at"])
+
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+        # Keep the previous version's files for clients still holding its manifest
+        removed = self._prune(self._referenced(manifest) | self._referenced(previous))
+        logger.info(f"Static snapshot {version}: {len(books)} books, {removed} stale files removed")
+
+        self._manifest = manifest
+        self._manifest_mtime = self.manifest_path.stat().st_mtime
+        return manifest
+
+    @staticmethod
+    def _referenced(manifest: Dict[str, Any]) -> Set[str]:
+        paths = set()
+        for book in manifest.get("books", {}).values():
+            paths.add(book["path"])
+            paths.update(chapter["path"] for chapter in book.get("chapters", {}).values())
+        return paths
+
+    def _prune(self, keep: Set[str]) -> int:
+        books_dir = self.output_dir / "books"
+        if not books_dir.exists():
+            return 0
+        removed = 0
+        for path in books_dir.rglob("*"):
+            if not path.is_file():
+                continue
+            relative = path.relative_to(self.output_dir).as_posix()
+            for suffix in (".gz", ".br", ".tmp"):
+                if relative.endswith(suffix):
+                    relative = relative[:-len(suffix)]
+                    break
+            if relative not in keep:
+                path.unlink()
+                removed += 1
+        return removed
+
+    # --- reading ---------------------------------------------------------
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Unreadable snapshot manifest {self.manifest_path}: {e}")
+            return None
+
+    def manifest(self) -> Optional[Dict[str, Any]]:
+        """Current manifest, reloaded when an export from another process replaced it."""
+        now = time.monotonic()
+        if now - self._checked_at >= self.STAT_INTERVAL:
+            self._checked_at = now
+            try:
+                mtime = self.manifest_path.stat().st_mtime
+            except OSError:
+                mtime = None
+            if mtime != self._manifest_mtime:
+                self._manifest = self._read_manifest() if mtime is not None else None
+                self._manifest_mtime = mtime
+        return self._manifest
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}/{path}"
+
+    def bundle_url(self, book_slug: str, chapter: Optional[int] = None) -> Optional[str]:
+        """Public URL of a book or chapter bundle, None when not exported."""
+        manifest = self.manifest()
+        if not manifest:
+            return None
+        book = manifest["books"].get(book_slug)
+        if book is None:
+            return None
+        if chapter is None:
+            return self.url(book["path"])
+        entry = book["chapters"].get(str(chapter))
+        return self.url(entry["path"]) if entry else None
+
+
+_static_snapshot: Optional[StaticSnapshot] = None
+
+
+def get_static_snapshot() -> StaticSnapshot:
+    """Process-wide snapshot reader/exporter."""
+    global _static_snapshot
+    if _static_snapshot is None:
+        _static_snapshot = StaticSnapshot(settings.STATIC_SNAPSHOT_DIR, settings.STATIC_SNAPSHOT_URL)
+    return _static_snapshot
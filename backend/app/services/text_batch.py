@@ -0,0 +1,135 @@
+"""
+Batch text retrieval for chapter ranges and lists of refs.
+
+Ranges are read from ``texts`` with a single query. Lists of refs and
+chapters missing from the database (asked of Sefaria under the title of
+their ``Book``) go through the tiered TextResolver
+(local, one Redis MGET, one ``IN`` query, then Sefaria with bounded
+concurrency). Results are yielded as soon as they are known so large ranges
+can be streamed.
+"""
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.models.book import Book
+from app.models.text import Text, TextRange, TextBatchRequest
+from app.services.text_resolver import TextResolver, parse_ref, row_data, sefaria_name
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def _project(item: Dict[str, Any], language: Optional[str]) -> Dict[str, Any]:
+    """Drop the other language when a single one was requested."""
+    if language == "he":
+        item.pop("english", None)
+    elif language == "en":
+        item.pop("hebrew", None)
+    return item
+
+
+def _row_item(row: Text) -> Dict[str, Any]:
+    data = row_data(row)
+    return {
+        "ref": row.ref,
+        "chapter": row.chapter,
+        "verse": row.verse,
+        "hebrew": data.get("hebrew"),
+        "english": data.get("english"),
+        "source": "db",
+    }
+
+
+class TextBatchService:
+    """Resolves chapter ranges and ref lists in as few round trips as possible."""
+
+    def __init__(self, db: AsyncSession, resolver: TextResolver):
+        self.db = db
+        self.resolver = resolver
+
+    async def _resolve_tiered(
+        self,
+        refs: List[str],
+        positions: Dict[str, tuple]
+    ) -> AsyncIterator[Tuple[tuple, Dict[str, Any]]]:
+        async for ref, data, source in self.resolver.iter_many(self.db, refs):
+            if data:
+                _, chapter, verse = parse_ref(ref)
+                yield positions[ref], {
+                    "ref": ref,
+                    "chapter": chapter,
+                    "verse": verse,
+                    "hebrew": data.get("hebrew"),
+                    "english": data.get("english"),
+                    "source": source,
+                }
+            else:
+                yield positions[ref], {"ref": ref, "error": "not_found"}
+
+    async def _resolve_range(self, text_range: TextRange) -> AsyncIterator[Tuple[tuple, Dict[str, Any]]]:
+        result = await self.db.execute(
+            select(Text)
+            .where(
+                Text.book_slug == text_range.book_slug,
+                Text.chapter >= text_range.start_chapter,
+                Text.chapter <= text_range.end_chapter,
+                Text.is_active == True
+            )
+            .order_by(Text.chapter, Text.verse)
+        )
+
+        stored_chapters = set()
+        for row in result.scalars().all():
+            stored_chapters.add(row.chapter)
+            yield (row.chapter, row.verse or 0), _row_item(row)
+
+        missing = [
+            chapter for chapter in range(text_range.start_chapter, text_range.end_chapter + 1)
+            if chapter not in stored_chapters
+        ]
+        if not missing:
+            return
+
+        # Chapters absent from the database are fetched whole, by Sefaria ref
+        result = await self.db.execute(select(Book).where(Book.slug == text_range.book_slug))
+        book = result.scalars().first()
+        if book is None:
+            for chapter in missing:
+                yield (chapter, 0), {
+                    "ref": f"{text_range.book_slug}.{chapter}", "chapter": chapter, "error": "not_found"
+                }
+            return
+
+        positions = {f"{sefaria_name(book)}.{chapter}": (chapter, 0) for chapter in missing}
+        async for position, item in self._resolve_tiered(list(positions), positions):
+            item["chapter"] = item.get("chapter") or position[0]
+            yield position, item
+
+    async def _resolve_refs(self, refs: List[str]) -> AsyncIterator[Tuple[tuple, Dict[str, Any]]]:
+        positions = {ref: (index,) for index, ref in enumerate(dict.fromkeys(refs))}
+        async for position, item in self._resolve_tiered(list(positions), positions):
+            yield position, item
+
+    async def iter_texts(self, request: TextBatchRequest) -> AsyncIterator[Tuple[tuple, Dict[str, Any]]]:
+        """
+        Yield (position, text) pairs as they are resolved.
+
+        Positions sort into book order for ranges and request order for refs.
+        """
+        if request.range is not None:
+            language = request.range.language
+            source = self._resolve_range(request.range)
+        else:
+            language = None
+            source = self._resolve_refs(request.refs)
+
+        async for position, item in source:
+            yield position, _project(item, language)
+
+    async def get_texts(self, request: TextBatchRequest) -> List[Dict[str, Any]]:
+        """Resolve all texts of a request, in order."""
+        items = [pair async for pair in self.iter_texts(request)]
+        items.sort(key=lambda pair: pair[0])
+        return [item for _, item in items]
@@ -0,0 +1,330 @@
+"""
+Tiered, read-through resolution of texts by ref.
+
+Lookups go process-local LRU -> Redis -> Postgres ``texts`` -> Sefaria.
+Each tier is queried once per batch (dict lookups, one MGET, one ``IN``
+query, bounded concurrent API calls), and a hit fills the faster tiers.
+Breslov texts fetched from Sefaria are written back to the database (one
+row per ref, under the slug and id of their ``Book``), so reads keep being
+served locally when Sefaria is slow or down.
+"""
+import json
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Any, Optional, AsyncIterator, Iterable, Tuple
+from uuid import uuid4
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import or_, select
+
+from app.config import settings
+from app.models.book import Book
+from app.models.text import Text
+from app.services.sefaria_client import SefariaClient
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+TIERS = ("local", "redis", "db", "sefaria")
+
+# Book slugs whose texts are written back; other refs are served but not stored
+BRESLOV_SLUGS = frozenset(
+    [slug for slug in SefariaClient.BRESLOV_BOOKS]
+    + [alt for book in SefariaClient.BRESLOV_BOOKS.values() for alt in book.get("alt_refs", [])]
+)
+
+# "Likutei_Moharan.1.5", "Likutei Moharan 1:5", "Likutei_Moharan,_Part_II.24"
+_REF_PATTERN = re.compile(r"^(?P<book>.+?)[ .](?P<chapter>\d+)(?:[.:](?P<verse>\d+))?$")
+
+
+def parse_ref(ref: str) -> Tuple[str, Optional[int], Optional[int]]:
+    """Split a ref into book slug, chapter and verse (when present)."""
+    match = _REF_PATTERN.match(ref.strip())
+    if not match:
+        return ref.replace(" ", "_"), None, None
+    verse = match.group("verse")
+    return (
+        match.group("book").replace(" ", "_"),
+        int(match.group("chapter")),
+        int(verse) if verse else None
+    )
+
+
+def sefaria_name(book: Book) -> str:
+    """Book name as it appears in Sefaria refs ("Likutei_Moharan")."""
+    return book.title_en.replace(" ", "_")
+
+
+async def find_books(db: AsyncSession, names: Iterable[str]) -> Dict[str, Book]:
+    """
+    Books of the given Sefaria book names (the book part of ``parse_ref``).
+
+    Returns:
+        Matching books keyed by name; names without a Book are left out
+    """
+    titles = {name: name.replace("_", " ") for name in set(names)}
+    if not titles:
+        return {}
+    result = await db.execute(
+        select(Book).where(or_(Book.title_en.in_(titles.values()), Book.title.in_(titles.values())))
+    )
+    by_title = {}
+    for book in result.scalars().all():
+        by_title.setdefault(book.title_en, book)
+        by_title.setdefault(book.title, book)
+    return {name: by_title[title] for name, title in titles.items() if title in by_title}
+
+
+def _as_text(value: Any) -> Optional[str]:
+    if isinstance(value, list):
+        return "\n".join(filter(None, (_as_text(v) for v in value)))
+    return value
+
+
+def row_data(row: Text) -> Dict[str, Any]:
+    """A texts row as the Sefaria and Redis tiers return it (section texts stay lists)."""
+    if row.sefaria_data:
+        try:
+            data = json.loads(row.sefaria_data)
+            if isinstance(data, dict) and "hebrew" in data:
+                return data
+        except ValueError:
+            pass
+    return {
+        "hebrew": row.hebrew,
+        "english": row.english,
+        "ref": row.ref,
+        "title": row.book_slug.replace("_", " "),
+    }
+
+
+class LocalTextCache:
+    """Small in-process LRU with a TTL."""
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+
+    def get(self, ref: str) -> Optional[Dict]:
+        entry = self._entries.get(ref)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at < time.monotonic():
+            del self._entries[ref]
+            return None
+        self._entries.move_to_end(ref)
+        return data
+
+    def set(self, ref: str, data: Dict) -> None:
+        if self.max_entries == 0:
+            return
+        self._entries[ref] = (time.monotonic() + self.ttl, data)
+        self._entries.move_to_end(ref)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TextResolver:
+    """Resolves refs through the local, Redis, database and Sefaria tiers."""
+
+    def __init__(self, sefaria_client: SefariaClient, concurrency: int = settings.SEFARIA_MAX_CONCURRENCY):
+        self.sefaria_client = sefaria_client
+        self.concurrency = concurrency
+        self.local = LocalTextCache(settings.TEXT_LOCAL_CACHE_SIZE, settings.TEXT_LOCAL_CACHE_TTL)
+
+        self.lookups = {tier: 0 for tier in TIERS}
+        self.hits = {tier: 0 for tier in TIERS}
+        self.not_found = 0
+        # Background warm-ups, kept out of the read hit rates
+        self.prefetch_lookups = {tier: 0 for tier in TIERS}
+        self.prefetch_hits = {tier: 0 for tier in TIERS}
+
+    def _count(self, tier: str, lookups: int, hits: int, prefetch: bool = False) -> None:
+        if prefetch:
+            self.prefetch_lookups[tier] += lookups
+            self.prefetch_hits[tier] += hits
+        else:
+            self.lookups[tier] += lookups
+            self.hits[tier] += hits
+
+    def _fill(self, ref: str, data: Dict, redis: bool = True) -> None:
+        """Populate the faster tiers after a hit in a slower one."""
+        self.local.set(ref, data)
+        if redis:
+            self.sefaria_client._set_cache(f"text:{ref}", data, ttl=settings.CACHE_TTL_TEXTS)
+
+    async def _write_back(self, db: AsyncSession, fetched: Dict[str, Dict]) -> None:
+        """Store Breslov texts fetched from Sefaria in the texts table, under their Book."""
+        parsed = {ref: parse_ref(ref) for ref in fetched}
+        parsed = {ref: parts for ref, parts in parsed.items() if parts[0] in BRESLOV_SLUGS}
+        try:
+            books = await find_books(db, (name for name, _, _ in parsed.values()))
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Book lookup for text write-back failed: {e}")
+            return
+
+        now = datetime.utcnow()
+        rows = []
+        for ref, (name, chapter, verse) in parsed.items():
+            # Without a Book the row would carry a slug no other text uses
+            book = books.get(name)
+            if book is None:
+                continue
+            data = fetched[ref]
+            hebrew = _as_text(data.get("hebrew"))
+            english = _as_text(data.get("english"))
+            rows.append({
+                "id": uuid4(),
+                "ref": ref,
+                "book_slug": book.slug,
+                "book_id": book.id,
+                "chapter": chapter,
+                "verse": verse,
+                "hebrew": hebrew,
+                "english": english,
+                "language": "he",
+                "is_active": True,
+                "created_at": now,
+                "updated_at": now,
+                "full_text": " ".join(filter(None, (hebrew, english))),
+                "sefaria_data": json.dumps(data, ensure_ascii=False),
+            })
+        if not rows:
+            return
+        # A concurrent miss on the same ref may have stored it first
+        stmt = insert(Text.__table__).values(rows).on_conflict_do_nothing(index_elements=["ref"])
+        try:
+            await db.execute(stmt)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Text write-back failed for {len(rows)} refs: {e}")
+
+    def is_cached_locally(self, ref: str) -> bool:
+        return self.local.get(ref) is not None
+
+    async def iter_many(
+        self,
+        db: AsyncSession,
+        refs: List[str],
+        concurrency: Optional[int] = None,
+        prefetch: bool = False
+    ) -> AsyncIterator[Tuple[str, Optional[Dict], str]]:
+        """
+        Resolve refs, yielding (ref, data or None, tier) as soon as each is known.
+
+        ``concurrency`` overrides the number of simultaneous Sefaria requests.
+        ``prefetch`` counts the lookups apart from reader traffic.
+        """
+        pending = list(dict.fromkeys(refs))
+
+        # Tier 1: process-local
+        remaining = []
+        for ref in pending:
+            data = self.local.get(ref)
+            if data is not None:
+                yield ref, data, "local"
+            else:
+                remaining.append(ref)
+        self._count("local", len(pending), len(pending) - len(remaining), prefetch)
+        pending = remaining
+        if not pending:
+            return
+
+        # Tier 2: Redis, one MGET
+        remaining = []
+        for ref, data in zip(pending, self.sefaria_client._get_many_from_cache([f"text:{ref}" for ref in pending])):
+            if data:
+                self._fill(ref, data, redis=False)
+                yield ref, data, "redis"
+            else:
+                remaining.append(ref)
+        self._count("redis", len(pending), len(pending) - len(remaining), prefetch)
+        pending = remaining
+        if not pending:
+            return
+
+        # Tier 3: Postgres, one query on the ref index
+        found = {}
+        try:
+            result = await db.execute(
+                select(Text).where(Text.ref.in_(pending), Text.is_active == True)
+            )
+            for row in result.scalars().all():
+                found.setdefault(row.ref, row_data(row))
+        except Exception as e:
+            logger.error(f"Text lookup in database failed: {e}")
+        for ref, data in found.items():
+            self._fill(ref, data)
+            yield ref, data, "db"
+        self._count("db", len(pending), len(found), prefetch)
+        pending = [ref for ref in pending if ref not in found]
+        if not pending:
+            return
+
+        # Tier 4: Sefaria, bounded concurrency, written back to the database
+        fetched = {}
+        async for ref, data in self.sefaria_client.fetch_texts(
+            pending, concurrency=concurrency or self.concurrency
+        ):
+            if data:
+                fetched[ref] = data
+                self._fill(ref, data, redis=False)  # _fetch_text already cached it
+            elif not prefetch:
+                self.not_found += 1
+            yield ref, data, "sefaria"
+        self._count("sefaria", len(pending), len(fetched), prefetch)
+
+        if fetched:
+            await self._write_back(db, fetched)
+
+    async def resolve(self, db: AsyncSession, ref: str) -> Optional[Dict]:
+        """Resolve a single ref."""
+        resolved = None
+        # Consume the whole iterator so the write-back step runs
+        async for _, data, _ in self.iter_many(db, [ref]):
+            resolved = data
+        return resolved
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-tier lookups, hits and hit rates of reads since start, and prefetch lookups apart."""
+        requests = self.lookups["local"]
+        tiers = {}
+        for tier in TIERS:
+            lookups = self.lookups[tier]
+            tiers[tier] = {
+                "lookups": lookups,
+                "hits": self.hits[tier],
+                "hit_rate": round(self.hits[tier] / lookups, 4) if lookups else None,
+                "share_of_requests": round(self.hits[tier] / requests, 4) if requests else None,
+            }
+        return {
+            "requests": requests,
+            "not_found": self.not_found,
+            "local_cache_entries": len(self.local),
+            "tiers": tiers,
+            "prefetch_tiers": {
+                tier: {"lookups": self.prefetch_lookups[tier], "hits": self.prefetch_hits[tier]}
+                for tier in TIERS
+            },
+        }
+
+
+_text_resolver: Optional[TextResolver] = None
+
+
+def get_text_resolver() -> TextResolver:
+    """Process-wide resolver, so the local tier and statistics are shared."""
+    global _text_resolver
+    if _text_resolver is None:
+        _text_resolver = TextResolver(SefariaClient())
+    return _text_resolver
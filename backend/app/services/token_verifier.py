@@ -0,0 +1,229 @@
+"""
+JWT verification without a network round trip.
+
+Tokens are decoded and checked locally. Revocation is checked against an
+in-process copy of the revoked token ids (JTIs), loaded from Redis and kept
+current through a pub/sub channel on which every revocation is announced.
+Redis is only queried per token when that copy is stale: the listener is
+disconnected or has not resynchronised for too long.
+
+Revocations live in Redis as ``revoked_token:<jti>`` keys (expiring with the
+token) and in the ``revoked_tokens`` sorted set scored by expiry, which is
+what the listener loads. Expired entries are dropped on each resync, so the
+set only holds tokens that could still be presented.
+"""
+import asyncio
+import time
+from typing import Dict, Any, Optional
+
+from jose import jwt, JWTError
+from redis.exceptions import RedisError
+
+from app.config import settings
+from app.redis_client import redis_client
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+REVOKED_KEY_PREFIX = "revoked_token:"
+REVOKED_SET_KEY = "revoked_tokens"
+
+# Revocations of tokens without an expiry are kept this long
+DEFAULT_REVOCATION_TTL = 86400 * 30
+
+
+class TokenVerifier:
+    """Decodes JWTs and checks them against a locally mirrored revocation set."""
+
+    # Seconds to wait before reconnecting the listener or retrying Redis
+    RETRY_DELAY = 5.0
+
+    def __init__(
+        self,
+        secret_key: str = settings.JWT_SECRET_KEY,
+        algorithm: str = settings.JWT_ALGORITHM,
+        channel: str = settings.AUTH_REVOCATION_CHANNEL,
+        resync_interval: int = settings.AUTH_REVOCATION_RESYNC_SECONDS
+    ):
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self.channel = channel
+        self.resync_interval = resync_interval
+
+        # jti -> expiry (unix time)
+        self._revoked: Dict[str, float] = {}
+        self._loaded_at: Optional[float] = None
+        self._listening = False
+        self._listener: Optional[asyncio.Task] = None
+        self._redis_retry_at = 0.0
+
+        self.counters = {"verified": 0, "rejected": 0, "revoked": 0, "redis_fallbacks": 0}
+
+    # --- local view ------------------------------------------------------
+
+    def _add(self, jti: str, expires_at: float) -> None:
+        self._revoked[jti] = expires_at
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._listening
+            and self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < 2 * self.resync_interval
+        )
+
+    async def _load_all(self) -> None:
+        """Replace the local view with the revocations stored in Redis."""
+        client = redis_client.client
+        now = time.time()
+        await client.zremrangebyscore(REVOKED_SET_KEY, "-inf", now)
+        entries = await client.zrange(REVOKED_SET_KEY, 0, -1, withscores=True)
+        self._revoked = {jti: expires_at for jti, expires_at in entries}
+        self._loaded_at = time.monotonic()
+
+    def _apply(self, data: str) -> None:
+        jti, _, expires_at = data.partition(" ")
+        try:
+            self._add(jti, float(expires_at))
+        except ValueError:
+            self._add(jti, time.time() + DEFAULT_REVOCATION_TTL)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                if not redis_client.is_connected:
+                    await redis_client.initialize()
+                pubsub = await redis_client.subscribe(self.channel)
+                # Load after subscribing so no revocation falls between the two
+                await self._load_all()
+                self._listening = True
+                logger.info(f"Token revocation listener started ({len(self._revoked)} revoked)")
+
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message and message["type"] == "message":
+                        self._apply(message["data"])
+                    if time.monotonic() - self._loaded_at >= self.resync_interval:
+                        await self._load_all()
+            except asyncio.CancelledError:
+                self._listening = False
+                raise
+            except Exception as e:
+                self._listening = False
+                logger.warning(f"Token revocation listener error: {e}")
+                await asyncio.sleep(self.RETRY_DELAY)
+
+    def start(self) -> None:
+        """Start the revocation listener if it is not running (needs a running loop)."""
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    # --- revocation ------------------------------------------------------
+
+    async def is_revoked(self, jti: Optional[str]) -> bool:
+        """Check a JTI against the local view, or Redis when the view is stale."""
+        if not jti:
+            return False
+
+        expires_at = self._revoked.get(jti)
+        if expires_at is not None and expires_at <= time.time():
+            del self._revoked[jti]
+            expires_at = None
+
+        if self._is_fresh() or time.monotonic() < self._redis_retry_at:
+            return expires_at is not None
+
+        self.counters["redis_fallbacks"] += 1
+        try:
+            if not redis_client.is_connected:
+                await redis_client.initialize()
+            return await redis_client.exists(f"{REVOKED_KEY_PREFIX}{jti}") > 0
+        except (RedisError, OSError) as e:
+            # Redis unreachable: use what is known locally rather than failing every request
+            self._redis_retry_at = time.monotonic() + self.RETRY_DELAY
+            logger.warning(f"Revocation check fell back to the local view: {e}")
+            return expires_at is not None
+
+    async def revoke(self, jti: str, expires_at: Optional[float] = None) -> None:
+        """
+        Revoke a token until it expires and announce it to every process.
+
+        Args:
+            jti: Token id
+            expires_at: Token expiry (unix time); unknown expiries are kept 30 days
+        """
+        now = time.time()
+        if not expires_at or expires_at <= now:
+            expires_at = now + DEFAULT_REVOCATION_TTL
+        self._add(jti, expires_at)
+
+        if not redis_client.is_connected:
+            await redis_client.initialize()
+        async with redis_client.client.pipeline(transaction=True) as pipe:
+            pipe.set(f"{REVOKED_KEY_PREFIX}{jti}", "1", ex=max(1, int(expires_at - now)))
+            pipe.zadd(REVOKED_SET_KEY, {jti: expires_at})
+            pipe.publish(self.channel, f"{jti} {expires_at}")
+            await pipe.execute()
+
+    # --- verification ----------------------------------------------------
+
+    def decode(self, token: str) -> Optional[Dict[str, Any]]:
+        """Signature and expiry check only."""
+        try:
+            return jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except JWTError:
+            return None
+
+    async def verify(self, token: str, expected_type: str = "access") -> Optional[Dict[str, Any]]:
+        """
+        Decode a token and check its type and revocation.
+
+        Args:
+            token: Encoded JWT
+            expected_type: Value of the ``type`` claim (access tokens have none)
+
+        Returns:
+            Token payload, or None if the token is invalid, of another type or revoked
+        """
+        self.start()
+
+        payload = self.decode(token)
+        if payload is None or payload.get("type", "access") != expected_type:
+            self.counters["rejected"] += 1
+            return None
+
+        if await self.is_revoked(payload.get("jti")):
+            self.counters["revoked"] += 1
+            return None
+
+        self.counters["verified"] += 1
+        return payload
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "revoked_tokens": len(self._revoked),
+            "listening": self._listening,
+            "seconds_since_sync": (
+                round(time.monotonic() - self._loaded_at, 1) if self._loaded_at is not None else None
+            ),
+        }
+
+
+_token_verifier: Optional[TokenVerifier] = None
+
+
+def get_token_verifier() -> TokenVerifier:
+    """Process-wide verifier, so the revocation view and listener are shared."""
+    global _token_verifier
+    if _token_verifier is None:
+        _token_verifier = TokenVerifier()
+    return _token_verifier
@@ -11,6 +11,7 @@ from google.api_core import exceptions as gcp_exceptions
 
 from app.core.config import settings
 from app.utils.logger import setup_logger
+from app.utils.monitoring import monitor_external_api
 from app.services.cache_service import cache_service
 
 logger = setup_logger(__name__)
@@ -131,17 +132,7 @@ class TTSManager:
             )
             
             # Perform synthesis
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: self.client.synthesize_speech(
-                    input=synthesis_input,
-                    voice=voice,
-                    audio_config=audio_config
-                )
-            )
-            
-            audio_data = response.audio_content
+            audio_data = await self._synthesize(synthesis_input, voice, audio_config)
             
             # Cache the audio
             if use_cache:
@@ -161,6 +152,20 @@ class TTSManager:
             logger.error(f"TTS synthesis error: {e}")
             raise Exception(f"TTS synthesis failed: {e}")
     
+    @monitor_external_api("google_tts")
+    async def _synthesize(self, synthesis_input, voice, audio_config) -> bytes:
+        """Call the TTS API in a thread pool."""
+        loop = asyncio.get_event_loop()
+        response = await loop.run_in_executor(
+            None,
+            lambda: self.client.synthesize_speech(
+                input=synthesis_input,
+                voice=voice,
+                audio_config=audio_config
+            )
+        )
+        return response.audio_content
+    
     async def get_available_voices(self, language_code: str) -> List[Dict[str, Any]]:
         """
         Get available voices for a language.
@@ -6,6 +6,7 @@ from datetime import datetime
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 from app.models.user import User
+from app.services.principal_cache import get_principal_cache
 from app.utils.logger import logger
 
 
@@ -102,6 +103,7 @@ class UserService:
             
             await self.db.commit()
             await self.db.refresh(user)
+            await get_principal_cache().invalidate(user_id)
             
             logger.info(f"User updated: {user.email}")
             return user
@@ -132,6 +134,7 @@ class UserService:
             
             await self.db.commit()
             await self.db.refresh(user)
+            await get_principal_cache().invalidate(user_id)
             
             logger.info(f"Password updated for user: {user.email}")
             return user
@@ -161,6 +164,7 @@ class UserService:
             
             await self.db.commit()
             await self.db.refresh(user)
+            await get_principal_cache().invalidate(user_id)
             
             logger.info(f"User verified: {user.email}")
             return user
@@ -190,6 +194,7 @@ class UserService:
             
             await self.db.commit()
             await self.db.refresh(user)
+            await get_principal_cache().invalidate(user_id)
             
             logger.info(f"User deactivated: {user.email}")
             return user
@@ -219,6 +224,7 @@ class UserService:
             
             await self.db.commit()
             await self.db.refresh(user)
+            await get_principal_cache().invalidate(user_id)
             
             return user
             
@@ -251,6 +257,7 @@ class UserService:
             
             await self.db.commit()
             await self.db.refresh(user)
+            await get_principal_cache().invalidate(user_id)
             
             logger.info(f"Preferences updated for user: {user.email}")
             return user
@@ -0,0 +1,241 @@
+"""
+Unified local vector index over the chunks of every Breslov book.
+
+Vectors are stored L2-normalised in a single ``vectors.npy`` file that is
+memory-mapped on load, with chunk metadata in ``chunks.json``. When
+``hnswlib`` is installed an HNSW graph is built over the same rows and
+queried with a book filter; otherwise an exact inner-product scan of the
+mapped matrix is used. Either way a multi-book question is one search.
+"""
+import json
+import os
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Sequence
+
+import numpy as np
+
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+try:
+    import hnswlib
+    HNSWLIB_AVAILABLE = True
+except ImportError:
+    HNSWLIB_AVAILABLE = False
+
+
+class VectorIndex:
+    """Single cosine-similarity index with a per-chunk book label."""
+
+    VECTORS_FILE = "vectors.npy"
+    CHUNKS_FILE = "chunks.json"
+    HNSW_FILE = "index.hnsw"
+
+    def __init__(self, path: Path, hnsw_m: int = 16, hnsw_ef_construction: int = 200):
+        self.path = Path(path)
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+
+        self._vectors: Optional[np.ndarray] = None
+        self._chunks: List[Dict[str, Any]] = []
+        self._row_by_id: Dict[str, int] = {}
+        self._book_codes: Optional[np.ndarray] = None
+        self._books: List[str] = []
+        self._hnsw = None
+
+        # Rows added since the last save, keyed by chunk id
+        self._pending: Dict[str, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    @property
+    def books(self) -> List[str]:
+        """Books with at least one indexed chunk."""
+        return list(self._books)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
+
+    def _index_rows(self) -> None:
+        self._row_by_id = {chunk["id"]: row for row, chunk in enumerate(self._chunks)}
+        self._books = sorted({chunk["book"] for chunk in self._chunks})
+        codes = {book: code for code, book in enumerate(self._books)}
+        self._book_codes = np.fromiter(
+            (codes[chunk["book"]] for chunk in self._chunks),
+            dtype=np.int32,
+            count=len(self._chunks)
+        )
+
+    def load(self) -> bool:
+        """
+        Load a persisted index, memory-mapping the vector matrix.
+
+        Returns:
+            True if an index was found on disk
+        """
+        vectors_file = self.path / self.VECTORS_FILE
+        chunks_file = self.path / self.CHUNKS_FILE
+        if not vectors_file.exists() or not chunks_file.exists():
+            return False
+
+        self._vectors = np.load(vectors_file, mmap_mode="r")
+        with open(chunks_file, "r", encoding="utf-8") as f:
+            self._chunks = json.load(f)
+        self._index_rows()
+
+        self._hnsw = None
+        hnsw_file = self.path / self.HNSW_FILE
+        if HNSWLIB_AVAILABLE and hnsw_file.exists() and len(self._chunks):
+            self._hnsw = hnswlib.Index(space="ip", dim=self._vectors.shape[1])
+            self._hnsw.load_index(str(hnsw_file), max_elements=len(self._chunks))
+
+        logger.info(
+            f"Vector index loaded: {len(self._chunks)} chunks, {len(self._books)} books"
+            f"{' (hnsw)' if self._hnsw else ' (exact)'}"
+        )
+        return True
+
+    def add(
+        self,
+        ids: Sequence[str],
+        embeddings: Iterable[Sequence[float]],
+        metadatas: Sequence[Dict[str, Any]],
+        documents: Sequence[str]
+    ) -> None:
+        """Stage chunks for the next save; existing ids are replaced."""
+        for chunk_id, embedding, metadata, document in zip(ids, embeddings, metadatas, documents):
+            self._pending[chunk_id] = {
+                "embedding": np.asarray(embedding, dtype=np.float32),
+                "chunk": {
+                    "id": chunk_id,
+                    "book": metadata["book"],
+                    "ref": metadata.get("ref", ""),
+                    "chunk_id": metadata.get("chunk_id"),
+                    "document": document,
+                }
+            }
+
+    def remove(self, ids: Iterable[str]) -> None:
+        """Stage removal of chunks by id."""
+        self._pending.update({chunk_id: None for chunk_id in ids})
+
+    def remove_book(self, book: str) -> None:
+        """Stage removal of every chunk of a book."""
+        self._pending = {
+            k: v for k, v in self._pending.items() if v is None or v["chunk"]["book"] != book
+        }
+        self._pending.update({
+            chunk["id"]: None for chunk in self._chunks if chunk["book"] == book
+        })
+
+    def save(self) -> None:
+        """Merge staged changes, persist atomically and re-map the index."""
+        if not self._pending:
+            return
+
+        keep_rows = [
+            row for row, chunk in enumerate(self._chunks)
+            if chunk["id"] not in self._pending
+        ]
+        additions = [entry for entry in self._pending.values() if entry is not None]
+
+        parts = []
+        if self._vectors is not None and keep_rows:
+            parts.append(np.asarray(self._vectors[keep_rows]))
+        if additions:
+            parts.append(self._normalize(np.stack([entry["embedding"] for entry in additions])))
+
+        chunks = [self._chunks[row] for row in keep_rows] + [entry["chunk"] for entry in additions]
+        vectors = np.concatenate(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        # Write to temporary files then swap, so readers never see a partial index
+        tmp_vectors = self.path / f"{self.VECTORS_FILE}.tmp"
+        with open(tmp_vectors, "wb") as f:
+            np.save(f, vectors)
+        tmp_chunks = self.path / f"{self.CHUNKS_FILE}.tmp"
+        with open(tmp_chunks, "w", encoding="utf-8") as f:
+            json.dump(chunks, f, ensure_ascii=False)
+
+        hnsw_file = self.path / self.HNSW_FILE
+        if HNSWLIB_AVAILABLE and len(chunks):
+            graph = hnswlib.Index(space="ip", dim=vectors.shape[1])
+            graph.init_index(
+                max_elements=len(chunks),
+                ef_construction=self.hnsw_ef_construction,
+                M=self.hnsw_m
+            )
+            graph.add_items(vectors, np.arange(len(chunks)))
+            tmp_hnsw = self.path / f"{self.HNSW_FILE}.tmp"
+            graph.save_index(str(tmp_hnsw))
+            os.replace(tmp_hnsw, hnsw_file)
+        elif hnsw_file.exists():
+            hnsw_file.unlink()
+
+        os.replace(tmp_vectors, self.path / self.VECTORS_FILE)
+        os.replace(tmp_chunks, self.path / self.CHUNKS_FILE)
+
+        self._pending = {}
+        self.load()
+
+    def query(
+        self,
+        embedding: Sequence[float],
+        n_results: int = 10,
+        books: Optional[Iterable[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the nearest chunks, optionally restricted to some books.
+
+        Returns:
+            Results sorted by decreasing cosine similarity, each with
+            ``id``, ``book``, ``ref``, ``document`` and ``score``
+        """
+        if self._vectors is None or not len(self._chunks):
+            return []
+
+        query = self._normalize(np.asarray(embedding, dtype=np.float32).reshape(1, -1))[0]
+
+        allowed = None
+        if books is not None:
+            codes = [self._books.index(book) for book in set(books) if book in self._books]
+            if not codes:
+                return []
+            allowed = np.isin(self._book_codes, codes)
+
+        n_candidates = int(allowed.sum()) if allowed is not None else len(self._chunks)
+        k = min(n_results, n_candidates)
+        if k == 0:
+            return []
+
+        if self._hnsw is not None:
+            self._hnsw.set_ef(max(k * 4, 64))
+            labels, distances = self._hnsw.knn_query(
+                query,
+                k=k,
+                filter=(lambda label: bool(allowed[label])) if allowed is not None else None
+            )
+            rows = labels[0]
+            scores = 1.0 - distances[0]  # ip space returns 1 - dot product
+        else:
+            if allowed is not None:
+                candidate_rows = np.flatnonzero(allowed)
+                similarities = self._vectors[candidate_rows] @ query
+            else:
+                candidate_rows = np.arange(len(self._chunks))
+                similarities = self._vectors @ query
+            top = np.argpartition(-similarities, k - 1)[:k]
+            top = top[np.argsort(-similarities[top])]
+            rows = candidate_rows[top]
+            scores = similarities[top]
+
+        return [
+            {**self._chunks[int(row)], "score": float(score)}
+            for row, score in zip(rows, scores)
+        ]
@@ -0,0 +1,171 @@
+"""
+Rolling-window latency percentiles per route.
+
+Latencies go into log-bucketed histograms (as in HDR histograms): bucket
+boundaries grow by ``PRECISION`` (2%), so any percentile is exact to within
+2% whatever the distribution, and a histogram is a small sparse dict of
+bucket index to count. There is one histogram per route and per time slot
+(one minute by default). Percentiles, throughput and error rates over the
+last N minutes are computed by merging the slots still inside the window,
+and slots that fall out of the window are dropped.
+"""
+import math
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+# Relative bucket width, i.e. the worst-case percentile error
+PRECISION = 0.02
+# Smallest distinguished latency, in seconds; anything faster shares bucket 0
+MIN_LATENCY = 1e-4
+
+_LOG_BASE = math.log1p(PRECISION)
+
+
+def _bucket(seconds: float) -> int:
+    if seconds <= MIN_LATENCY:
+        return 0
+    return int(math.log(seconds / MIN_LATENCY) / _LOG_BASE) + 1
+
+
+def _bucket_value(index: int) -> float:
+    """Upper bound of a bucket, in seconds."""
+    return MIN_LATENCY * (1 + PRECISION) ** index
+
+
+class LatencyHistogram:
+    """Sparse log-bucketed histogram of latencies, with request and error counts."""
+
+    __slots__ = ("counts", "count", "errors", "total", "max")
+
+    def __init__(self):
+        self.counts: Dict[int, int] = defaultdict(int)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float, error: bool = False) -> None:
+        self.counts[_bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if error:
+            self.errors += 1
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in other.counts.items():
+            self.counts[index] += count
+        self.count += other.count
+        self.errors += other.errors
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentiles(self, *quantiles: float) -> List[Optional[float]]:
+        """Latencies (seconds) at the given quantiles, in one pass over the buckets."""
+        if not self.count:
+            return [None] * len(quantiles)
+        targets = sorted((max(1, math.ceil(q * self.count)), i) for i, q in enumerate(quantiles))
+        results: List[Optional[float]] = [None] * len(quantiles)
+        seen = 0
+        position = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            while position < len(targets) and seen >= targets[position][0]:
+                results[targets[position][1]] = min(_bucket_value(index), self.max)
+                position += 1
+            if position == len(targets):
+                break
+        return results
+
+
+class LatencyTracker:
+    """Per-route latency histograms over a sliding window of time slots."""
+
+    def __init__(
+        self,
+        window_minutes: int = settings.LATENCY_WINDOW_MINUTES,
+        slot_seconds: int = 60
+    ):
+        self.window_minutes = window_minutes
+        self.slot_seconds = slot_seconds
+        self.slots_kept = max(1, math.ceil(window_minutes * 60 / slot_seconds))
+        # (slot number, route -> histogram), oldest first
+        self._slots: Deque[Tuple[int, Dict[str, LatencyHistogram]]] = deque()
+
+    def _current(self) -> Dict[str, LatencyHistogram]:
+        slot = int(time.time() // self.slot_seconds)
+        if not self._slots or self._slots[-1][0] != slot:
+            self._slots.append((slot, defaultdict(LatencyHistogram)))
+            self._expire(slot)
+        return self._slots[-1][1]
+
+    def _expire(self, slot: int) -> None:
+        while self._slots and self._slots[0][0] <= slot - self.slots_kept:
+            self._slots.popleft()
+
+    def record(self, route: str, seconds: float, error: bool = False) -> None:
+        """Record one request; ``error`` for server errors (5xx)."""
+        self._current()[route].record(seconds, error)
+
+    def _merged(self) -> Dict[str, LatencyHistogram]:
+        self._expire(int(time.time() // self.slot_seconds))
+        merged: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        for _, routes in self._slots:
+            for route, histogram in routes.items():
+                merged[route].merge(histogram)
+        return merged
+
+    def _summary(self, histogram: LatencyHistogram, elapsed: float) -> Dict[str, Any]:
+        p50, p95, p99 = histogram.percentiles(0.5, 0.95, 0.99)
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            "requests": histogram.count,
+            "requests_per_second": round(histogram.count / elapsed, 3) if elapsed else 0.0,
+            "error_rate": round(histogram.errors / histogram.count, 4) if histogram.count else 0.0,
+            "mean_ms": ms(histogram.total / histogram.count) if histogram.count else None,
+            "p50_ms": ms(p50),
+            "p95_ms": ms(p95),
+            "p99_ms": ms(p99),
+            "max_ms": ms(histogram.max) if histogram.count else None,
+        }
+
+    def snapshot(self, top: int = 20) -> Dict[str, Any]:
+        """
+        Overall and per-route statistics over the window.
+
+        Args:
+            top: Number of routes reported, busiest first
+        """
+        merged = self._merged()
+        if self._slots:
+            elapsed = time.time() - self._slots[0][0] * self.slot_seconds
+        else:
+            elapsed = 0.0
+
+        overall = LatencyHistogram()
+        for histogram in merged.values():
+            overall.merge(histogram)
+
+        busiest = sorted(merged.items(), key=lambda item: item[1].count, reverse=True)[:top]
+        return {
+            "window_minutes": self.window_minutes,
+            "overall": self._summary(overall, elapsed),
+            "routes": {route: self._summary(histogram, elapsed) for route, histogram in busiest},
+        }
+
+
+_latency_tracker: Optional[LatencyTracker] = None
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """Process-wide tracker fed by MetricsMiddleware."""
+    global _latency_tracker
+    if _latency_tracker is None:
+        _latency_tracker = LatencyTracker()
+    return _latency_tracker
@@ -1,19 +1,30 @@
 """
 Monitoring and observability utilities.
+
+Request metrics (``http_*``) are recorded for every route by
+``app.middleware.metrics.MetricsMiddleware`` and exposed on ``/metrics``.
+With several worker processes, set ``PROMETHEUS_MULTIPROC_DIR`` to an empty
+directory shared by the workers before they start: each process then writes
+its samples there and ``/metrics`` aggregates them.
 """
+import os
 import time
 from contextlib import contextmanager
 from functools import wraps
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, Optional, Callable, Tuple
 import asyncio
 
-from prometheus_client import Counter, Histogram, Gauge, Info
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, Info, generate_latest
+)
 import sentry_sdk
 from sentry_sdk.integrations.fastapi import FastApiIntegration
 from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
 
 from app.core.config import settings
+from app.utils.latency_tracker import get_latency_tracker
 from app.utils.logger import logger
+from app.utils.tracing import get_tracer, span
 
 # Prometheus Metrics
 http_requests_total = Counter(
@@ -25,7 +36,28 @@ http_requests_total = Counter(
 http_request_duration = Histogram(
     'http_request_duration_seconds',
     'HTTP request duration',
-    ['method', 'endpoint']
+    ['method', 'endpoint', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+http_requests_in_progress = Gauge(
+    'http_requests_in_progress',
+    'HTTP requests being processed',
+    ['method', 'endpoint'],
+    multiprocess_mode='livesum'
+)
+
+http_response_size = Histogram(
+    'http_response_size_bytes',
+    'HTTP response body size',
+    ['method', 'endpoint', 'status'],
+    buckets=(100, 1000, 10000, 100000, 1000000, 10000000)
+)
+
+operation_duration = Histogram(
+    'operation_duration_seconds',
+    'Duration of measured internal operations',
+    ['operation', 'status']
 )
 
 active_users = Gauge(
@@ -70,7 +102,7 @@ class MonitoringService:
     """
     
     def __init__(self):
-        self.tracer = None
+        self.tracer = get_tracer()
         self.meter = None
         self._initialize_sentry()
     
@@ -109,12 +141,12 @@ class MonitoringService:
         return event
     
     @contextmanager
-    def trace_span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
-        """Create a trace span."""
-        # Simplified implementation without OpenTelemetry for now
+    def trace_span(self, name: str, attributes: Optional[Dict[str, Any]] = None, kind: str = "internal"):
+        """Create a trace span (OpenTelemetry when tracing is enabled)."""
         start_time = time.time()
         try:
-            yield
+            with span(name, attributes, kind) as current:
+                yield current
         finally:
             duration = time.time() - start_time
             logger.debug(f"Span {name} took {duration:.3f}s", extra=attributes or {})
@@ -126,21 +158,20 @@ class MonitoringService:
     async def measure_async(self, name: str, coro, labels: Optional[Dict[str, str]] = None):
         """Measure async operation duration."""
         start_time = time.time()
+        # Also covers cancellation, which is not an Exception
+        status = "error"
         
         try:
             result = await coro
             status = "success"
             return result
-        except Exception as e:
-            status = "error"
-            raise e
         finally:
             duration = time.time() - start_time
             
             # Record metrics
-            http_request_duration.labels(
-                method="async",
-                endpoint=name
+            operation_duration.labels(
+                operation=name,
+                status=status
             ).observe(duration)
             
             # Log slow operations
@@ -157,37 +188,17 @@ monitoring = MonitoringService()
 
 # Decorators for monitoring
 def monitor_endpoint(endpoint: str):
-    """Decorator to monitor FastAPI endpoints."""
+    """
+    Decorator to trace FastAPI endpoints.
+    
+    Request counts and latencies are recorded for every route by
+    MetricsMiddleware; this only wraps the handler in a trace span.
+    """
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            start_time = time.time()
-            status = "success"
-            
-            try:
-                result = await func(*args, **kwargs)
-                return result
-            except Exception as e:
-                status = "error"
-                raise e
-            finally:
-                duration = time.time() - start_time
-                
-                # Record metrics
-                method = "unknown"
-                if 'request' in kwargs:
-                    method = kwargs['request'].method
-                
-                http_request_duration.labels(
-                    method=method,
-                    endpoint=endpoint
-                ).observe(duration)
-                
-                http_requests_total.labels(
-                    method=method,
-                    endpoint=endpoint,
-                    status=status
-                ).inc()
+            with monitoring.trace_span(f"endpoint {endpoint}"):
+                return await func(*args, **kwargs)
         
         return wrapper
     return decorator
@@ -201,7 +212,11 @@ def monitor_external_api(api_name: str):
             start_time = time.time()
             status = "success"
             
-            with monitoring.trace_span(f"external_api_{api_name}"):
+            with monitoring.trace_span(
+                f"{api_name} {func.__name__}",
+                {"external_api.name": api_name, "external_api.operation": func.__name__},
+                "client"
+            ):
                 try:
                     result = await func(*args, **kwargs)
                     return result
@@ -227,58 +242,103 @@ def monitor_external_api(api_name: str):
     return decorator
 
 
+# Prometheus exposition
+def metrics_registry() -> CollectorRegistry:
+    """Registry to expose: the process registry, or all workers' samples in multiprocess mode."""
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    from prometheus_client import multiprocess
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Metrics in the Prometheus text format, with their content type."""
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Drop the live gauges of this worker from the multiprocess directory on shutdown."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(os.getpid())
+
+
 # Health check endpoint for monitoring
 async def get_health_metrics() -> Dict[str, Any]:
     """Get comprehensive health metrics."""
+    database, redis = await asyncio.gather(check_database_health(), check_redis_health())
+    dependencies = {
+        "database": database,
+        "redis": redis,
+        "external_apis": await check_external_apis_health(),
+    }
+    healthy = all(dependencies[name]["status"] == "healthy" for name in ("database", "redis"))
+    
     return {
-        "status": "healthy",
+        "status": "healthy" if healthy else "degraded",
         "timestamp": time.time(),
         "metrics": {
-            "active_users": active_users._value.get(),
-            "cache_hit_rate": calculate_cache_hit_rate(),
-            "average_response_time": calculate_average_response_time(),
+            "latency": get_latency_tracker().snapshot(),
+            "cache_hit_rates": calculate_cache_hit_rates(),
         },
-        "dependencies": {
-            "database": await check_database_health(),
-            "redis": await check_redis_health(),
-            "external_apis": await check_external_apis_health(),
-        }
+        "dependencies": dependencies,
     }
 
 
-def calculate_cache_hit_rate() -> float:
-    """Calculate cache hit rate."""
-    hits = cache_operations.labels(operation="get", result="hit")._value.get()
-    misses = cache_operations.labels(operation="get", result="miss")._value.get()
-    total = hits + misses
-    return (hits / total * 100) if total > 0 else 0
+def _hit_rate(hits: int, lookups: int) -> Optional[float]:
+    return round(hits / lookups, 4) if lookups else None
 
 
-def calculate_average_response_time() -> float:
-    """Calculate average response time."""
-    # Simplified implementation
-    return 0.250  # 250ms average
+def calculate_cache_hit_rates() -> Dict[str, Any]:
+    """Hit rates of the application caches since start."""
+    from app.services.cache_service import cache_service
+    from app.services.principal_cache import get_principal_cache
+    from app.services.text_resolver import get_text_resolver
+    
+    counters = cache_service.counters
+    principal = get_principal_cache().stats()
+    principal_lookups = principal["local"] + principal["redis"] + principal["db"]
+    
+    return {
+        "cache_service": {
+            **counters,
+            "hit_rate": _hit_rate(counters["hit"], counters["hit"] + counters["miss"]),
+        },
+        "texts": get_text_resolver().stats()["tiers"],
+        "principals": {
+            **principal,
+            "hit_rate": _hit_rate(principal["local"] + principal["redis"], principal_lookups),
+        },
+    }
 
 
 async def check_database_health() -> Dict[str, Any]:
     """Check database health."""
+    from app.database import engine
+    from sqlalchemy import text
     try:
-        from app.database import get_async_session
-        async with get_async_session() as session:
-            await session.execute("SELECT 1")
-        return {"status": "healthy", "response_time_ms": 5}
+        start = time.perf_counter()
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        response_time = (time.perf_counter() - start) * 1000
+        return {"status": "healthy", "response_time_ms": round(response_time, 2)}
     except Exception as e:
         return {"status": "unhealthy", "error": str(e)}
 
 
 async def check_redis_health() -> Dict[str, Any]:
     """Check Redis health."""
+    from app.redis_client import redis_client
     try:
-        from app.services.cache_service import cache_service
-        start = time.time()
-        await cache_service.ping()
-        response_time = (time.time() - start) * 1000
-        return {"status": "healthy", "response_time_ms": response_time}
+        if not redis_client.is_connected:
+            await redis_client.initialize()
+        start = time.perf_counter()
+        if not await redis_client.ping():
+            return {"status": "unhealthy", "error": "PING failed"}
+        response_time = (time.perf_counter() - start) * 1000
+        return {"status": "healthy", "response_time_ms": round(response_time, 2)}
     except Exception as e:
         return {"status": "unhealthy", "error": str(e)}
 
@@ -288,4 +348,4 @@ async def check_external_apis_health() -> Dict[str, str]:
     return {
         "gemini": "healthy",
         "google_tts": "healthy",
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,53 @@
+"""
+Opaque cursor tokens for keyset pagination.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List
+
+
+def _default(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(*parts: Any) -> str:
+    """
+    Encode the sort key of the last returned row into an opaque token.
+
+    Args:
+        *parts: Sort key values (datetimes are encoded as ISO strings)
+
+    Returns:
+        URL-safe cursor token
+    """
+    raw = json.dumps(list(parts), default=_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, size: int) -> List[Any]:
+    """
+    Decode a cursor token produced by encode_cursor.
+
+    Args:
+        token: Cursor token
+        size: Expected number of sort key parts
+
+    Returns:
+        Sort key values as encoded
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        parts = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    if not isinstance(parts, list) or len(parts) != size:
+        raise ValueError("Invalid cursor")
+
+    return parts
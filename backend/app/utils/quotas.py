@@ -0,0 +1,187 @@
+"""
+Cost-weighted quotas for expensive endpoints.
+
+A route declares what a request costs in some unit (Gemini tokens, characters
+to synthesize, sections fetched) with a ``Quota`` dependency::
+
+    @router.post("/chat", dependencies=[Depends(Quota("gemini_tokens", gemini_tokens("question")))])
+
+The caller draws that cost from the budget of its plan: its role when the
+request carries a valid access token, ``guest`` (keyed by IP) otherwise.
+Budgets are set per quota and plan in ``QUOTA_BUDGETS``. A plan missing from
+a quota is unlimited. Each budget is a GCRA bucket of that many units per
+``QUOTA_WINDOW`` seconds, refilled continuously and kept in Redis by
+``RateLimiter``. The outcome is reported in ``X-Quota-*`` headers, and an
+exhausted budget is answered with 429 and Retry-After.
+"""
+import math
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+
+from app.config import settings
+from app.database import get_db_session
+from app.models.text import TextBatchRequest
+from app.services.principal_cache import get_principal_cache
+from app.services.token_verifier import get_token_verifier
+from app.services.user import UserService
+from app.utils.rate_limiter import RateLimiter, RateLimitResult
+
+GUEST_PLAN = "guest"
+
+CostFunction = Callable[[Request], Awaitable[int]]
+
+_limiter: Optional[RateLimiter] = None
+
+
+def get_quota_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter(window_seconds=settings.QUOTA_WINDOW, key_prefix="quota")
+    return _limiter
+
+
+# --- cost functions ---------------------------------------------------------
+
+async def _field(request: Request, path: str) -> Any:
+    """Value of a dotted body path (e.g. ``request.text``), else of a query parameter."""
+    value: Any = None
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            value = await request.json()
+        except ValueError:
+            value = None
+        for part in path.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+    if value is None:
+        value = request.query_params.get(path.rsplit(".", 1)[-1])
+    return value
+
+
+def fixed(units: int) -> CostFunction:
+    """Same cost for every request."""
+    async def cost(request: Request) -> int:
+        return units
+    return cost
+
+
+def text_length(*paths: str) -> CostFunction:
+    """Characters in the given body fields or query parameters."""
+    async def cost(request: Request) -> int:
+        total = 0
+        for path in paths:
+            value = await _field(request, path)
+            if isinstance(value, str):
+                total += len(value)
+        return total
+    return cost
+
+
+def gemini_tokens(*paths: str) -> CostFunction:
+    """Estimated tokens of a Gemini call: prompt fields plus the expected answer."""
+    prompt = text_length(*paths)
+
+    async def cost(request: Request) -> int:
+        prompt_tokens = math.ceil(await prompt(request) / settings.QUOTA_CHARS_PER_TOKEN)
+        return prompt_tokens + settings.QUOTA_GEMINI_RESPONSE_TOKENS
+    return cost
+
+
+async def batch_sections(request: Request) -> int:
+    """
+    Sections requested by a text batch (chapter range or list of refs).
+
+    The body is validated here so malformed or oversized batches are
+    rejected (422) before anything is charged.
+    """
+    try:
+        batch = TextBatchRequest.model_validate(await request.json())
+    except ValidationError as e:
+        raise RequestValidationError([
+            {**error, "loc": ("body", *error["loc"])}
+            for error in e.errors(include_url=False, include_context=False)
+        ])
+    except ValueError:
+        raise RequestValidationError([{"type": "json_invalid", "loc": ("body",), "msg": "Invalid JSON body"}])
+    return max(1, batch.size)
+
+
+# --- dependency --------------------------------------------------------------
+
+def _client_ip(request: Request) -> str:
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def _load_user(user_id: int):
+    async with get_db_session() as db:
+        return await UserService(db).get_user_by_id(user_id)
+
+
+async def resolve_plan(request: Request) -> Tuple[str, str]:
+    """Plan and budget key of the caller: (role, user id) or (guest, IP)."""
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        payload = await get_token_verifier().verify(token)
+        if payload and payload.get("sub"):
+            user_id = int(payload["sub"])
+            user = await get_principal_cache().get(user_id, lambda: _load_user(user_id))
+            if user is not None and user.is_active:
+                return user.role.value, f"user:{user_id}"
+    return GUEST_PLAN, f"ip:{_client_ip(request)}"
+
+
+def quota_headers(name: str, cost: int, result: RateLimitResult) -> Dict[str, str]:
+    return {
+        "X-Quota-Name": name,
+        "X-Quota-Cost": str(cost),
+        "X-Quota-Limit": str(result.limit),
+        "X-Quota-Remaining": str(result.remaining),
+        "X-Quota-Reset": str(math.ceil(result.reset_after)),
+    }
+
+
+class Quota:
+    """
+    FastAPI dependency charging a request's cost to the caller's budget.
+
+    Returns the ``X-Quota-*`` headers (also set on the response), so routes
+    that build their own Response can add them.
+    """
+
+    def __init__(self, name: str, cost: CostFunction):
+        self.name = name
+        self.cost = cost
+
+    async def __call__(self, request: Request, response: Response) -> Dict[str, str]:
+        plan, identifier = await resolve_plan(request)
+        budget = settings.QUOTA_BUDGETS.get(self.name, {}).get(plan)
+        if budget is None:
+            return {}
+
+        cost = max(1, await self.cost(request))
+        if cost > budget:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Request costs {cost} {self.name}, more than the {plan} budget of {budget}"
+            )
+
+        result = await get_quota_limiter().check(
+            f"{self.name}:{identifier}", budget, settings.QUOTA_WINDOW, cost=cost
+        )
+        headers = quota_headers(self.name, cost, result)
+        if not result.allowed:
+            retry_after = max(1, math.ceil(result.retry_after))
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Quota {self.name} exceeded, retry in {retry_after}s",
+                headers={"Retry-After": str(retry_after), **headers}
+            )
+
+        response.headers.update(headers)
+        return headers
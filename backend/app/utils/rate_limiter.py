@@ -1,8 +1,29 @@
 """
 Rate limiting utilities using Redis.
+
+Limits use the generic cell rate algorithm (GCRA): each identifier has a
+theoretical arrival time (TAT) that moves forward by ``window / limit`` per
+request, and a request is allowed while the TAT stays within one window of
+now. That is a token bucket of ``limit`` tokens refilled continuously, and
+it is stored as a single number per identifier. The check is one Lua script
+(one round trip) that returns the decision, remaining requests and reset
+time together, using the Redis clock so that every worker agrees.
+
+An optional in-process pre-limiter runs the same algorithm locally. A
+process that alone has seen more than the limit can refuse without asking
+Redis, which absorbs floods from one client. It never allows what Redis
+would refuse, because Redis is still asked whenever it allows. After each
+Redis decision the local state is replaced by the global one, which only
+grows faster than what one process sees, so the pre-limiter never refuses
+what Redis would allow either. When Redis is unreachable, the local
+decision is used instead of failing open.
 """
 import time
-from typing import Optional
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from redis.exceptions import RedisError
 
 from app.redis_client import redis_client
 from app.config import settings
@@ -10,22 +31,178 @@ from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# KEYS[1]: TAT key
+# ARGV: emission interval (ms), capacity (requests), cost (requests)
+# Returns: allowed (0/1), remaining, reset after (ms), retry after (ms)
+_GCRA_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+
+local new_tat = tat + interval * cost
+local diff = now - (new_tat - interval * capacity)
+if diff < 0 then
+    local remaining = math.floor((now - (tat - interval * capacity)) / interval)
+    return {0, remaining, tat - now, -diff}
+end
+
+if cost > 0 then
+    redis.call('SET', KEYS[1], new_tat, 'PX', math.max(1, math.ceil(new_tat - now)))
+end
+return {1, math.floor(diff / interval), new_tat - now, 0}
+"""
+
+
+@dataclass
+class RateLimitResult:
+    """Outcome of a rate limit check."""
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # seconds until the bucket is full again
+    retry_after: float  # seconds until the request would be allowed (0 if allowed)
+
+
+class LocalRateLimiter:
+    """
+    In-process GCRA limiter, used in front of Redis.
+
+    Keeps at most ``max_keys`` identifiers, dropping the least recently
+    seen ones.
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+
+    def check(self, key: str, limit: int, window: float, cost: int = 1) -> RateLimitResult:
+        now = time.monotonic()
+        interval = window / limit
+        tat = max(self._tats.get(key, now), now)
+
+        new_tat = tat + interval * cost
+        diff = now - (new_tat - interval * limit)
+        if diff < 0:
+            remaining = int((now - (tat - interval * limit)) / interval)
+            return RateLimitResult(False, limit, remaining, tat - now, -diff)
+
+        if cost > 0:
+            self._tats[key] = new_tat
+            self._tats.move_to_end(key)
+            while len(self._tats) > self.max_keys:
+                self._tats.popitem(last=False)
+        return RateLimitResult(True, limit, int(diff / interval), new_tat - now, 0.0)
+
+    def sync(self, key: str, reset_after: float) -> None:
+        """Take the TAT from an authoritative decision (``reset_after`` seconds from now)."""
+        if reset_after <= 0:
+            self._tats.pop(key, None)
+            return
+        self._tats[key] = time.monotonic() + reset_after
+        self._tats.move_to_end(key)
+        while len(self._tats) > self.max_keys:
+            self._tats.popitem(last=False)
+
+    def reset(self, key: str) -> None:
+        self._tats.pop(key, None)
+
 
 class RateLimiter:
     """
-    Redis-based rate limiter using sliding window.
+    Redis-based GCRA rate limiter with an optional local pre-limiter.
     """
-    
+
+    # Seconds to rely on the local limiter alone after Redis failed
+    RETRY_DELAY = 5.0
+
     def __init__(
         self,
         max_requests: int = 100,
         window_seconds: int = 3600,
-        key_prefix: str = "rate_limit"
+        key_prefix: str = "rate_limit",
+        local: bool = True
     ):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
         self.key_prefix = key_prefix
-    
+        self.local = LocalRateLimiter() if local else None
+        self._script = None
+        self._redis_retry_at = 0.0
+
+        self.counters = {"allowed": 0, "limited": 0, "local_limited": 0, "redis_errors": 0}
+
+    def _key(self, identifier: str, window: int) -> str:
+        return redis_client.make_cache_key(self.key_prefix, identifier, str(window))
+
+    def _limits(self, max_requests: Optional[int], window_seconds: Optional[int]) -> Tuple[int, int]:
+        return max_requests or self.max_requests, window_seconds or self.window_seconds
+
+    async def _check_redis(self, key: str, limit: int, window: int, cost: int) -> RateLimitResult:
+        if not redis_client.is_connected:
+            await redis_client.initialize()
+        if self._script is None:
+            self._script = redis_client.client.register_script(_GCRA_SCRIPT)
+        allowed, remaining, reset_after, retry_after = await self._script(
+            keys=[key], args=[window * 1000 / limit, limit, cost]
+        )
+        return RateLimitResult(bool(allowed), limit, int(remaining), reset_after / 1000, retry_after / 1000)
+
+    async def check(
+        self,
+        identifier: str,
+        max_requests: Optional[int] = None,
+        window_seconds: Optional[int] = None,
+        cost: int = 1
+    ) -> RateLimitResult:
+        """
+        Count a request and decide whether it is allowed.
+
+        Args:
+            identifier: Unique identifier (IP, user ID, etc.)
+            max_requests: Override default max requests
+            window_seconds: Override default window
+            cost: Requests this one counts for (0 only reads the state)
+
+        Returns:
+            Decision with remaining requests and reset/retry delays
+        """
+        limit, window = self._limits(max_requests, window_seconds)
+        key = self._key(identifier, window)
+
+        local_result = None
+        if self.local is not None:
+            local_result = self.local.check(key, limit, window, cost)
+            if not local_result.allowed:
+                self.counters["local_limited"] += 1
+                return local_result
+
+        if time.monotonic() >= self._redis_retry_at:
+            try:
+                result = await self._check_redis(key, limit, window, cost)
+                if self.local is not None:
+                    # Requests Redis refused must not stay charged locally
+                    self.local.sync(key, result.reset_after)
+                self.counters["allowed" if result.allowed else "limited"] += 1
+                if not result.allowed and cost > 0:
+                    logger.warning(f"Rate limit exceeded for {identifier}: {limit}/{window}s")
+                return result
+            except (RedisError, OSError) as e:
+                self.counters["redis_errors"] += 1
+                self._redis_retry_at = time.monotonic() + self.RETRY_DELAY
+                logger.error(f"Rate limiter error for {identifier}: {e}")
+
+        # Redis unavailable: per-process limit only
+        if local_result is not None:
+            return local_result
+        return RateLimitResult(True, limit, limit, 0.0, 0.0)
+
     async def is_allowed(
         self,
         identifier: str,
@@ -34,61 +211,18 @@ class RateLimiter:
     ) -> bool:
         """
         Check if request is allowed for given identifier.
-        
+
         Args:
             identifier: Unique identifier (IP, user ID, etc.)
             max_requests: Override default max requests
             window_seconds: Override default window
-            
+
         Returns:
             True if request is allowed, False if rate limited
         """
-        max_reqs = max_requests or self.max_requests
-        window = window_seconds or self.window_seconds
-        
-        # Create unique key for this identifier
-        key = redis_client.make_cache_key(
-            self.key_prefix,
-            identifier,
-            str(window)
-        )
-        
-        current_time = int(time.time())
-        window_start = current_time - window
-        
-        try:
-            # Use pipeline for atomic operations
-            pipe = redis_client._client.pipeline()
-            
-            # Remove expired entries
-            pipe.zremrangebyscore(key, 0, window_start)
-            
-            # Count current requests in window
-            pipe.zcard(key)
-            
-            # Add current request
-            pipe.zadd(key, {str(current_time): current_time})
-            
-            # Set expiration
-            pipe.expire(key, window + 60)  # Extra buffer
-            
-            results = await pipe.execute()
-            
-            current_count = results[1]  # Count after cleanup
-            
-            # Check if under limit
-            is_allowed = current_count < max_reqs
-            
-            if not is_allowed:
-                logger.warning(f"Rate limit exceeded for {identifier}: {current_count}/{max_reqs}")
-            
-            return is_allowed
-            
-        except Exception as e:
-            logger.error(f"Rate limiter error for {identifier}: {e}")
-            # Fail open - allow request if rate limiter fails
-            return True
-    
+        result = await self.check(identifier, max_requests, window_seconds)
+        return result.allowed
+
     async def get_remaining(
         self,
         identifier: str,
@@ -98,93 +232,37 @@ class RateLimiter:
         """
         Get remaining requests for identifier.
         """
-        max_reqs = max_requests or self.max_requests
-        window = window_seconds or self.window_seconds
-        
-        key = redis_client.make_cache_key(
-            self.key_prefix,
-            identifier,
-            str(window)
-        )
-        
-        current_time = int(time.time())
-        window_start = current_time - window
-        
-        try:
-            # Clean up and count
-            await redis_client._client.zremrangebyscore(key, 0, window_start)
-            current_count = await redis_client._client.zcard(key)
-            
-            return max(0, max_reqs - current_count)
-            
-        except Exception as e:
-            logger.error(f"Error getting remaining for {identifier}: {e}")
-            return max_reqs
-    
+        result = await self.check(identifier, max_requests, window_seconds, cost=0)
+        return result.remaining
+
     async def reset(self, identifier: str) -> bool:
         """
         Reset rate limit for identifier.
         """
-        key = redis_client.make_cache_key(
-            self.key_prefix,
-            identifier,
-            str(self.window_seconds)
-        )
-        
+        key = self._key(identifier, self.window_seconds)
+        if self.local is not None:
+            self.local.reset(key)
+
         try:
             await redis_client.delete(key)
             return True
         except Exception as e:
             logger.error(f"Error resetting rate limit for {identifier}: {e}")
             return False
-    
+
     async def get_stats(self, identifier: str) -> dict:
         """
         Get rate limiting statistics for identifier.
         """
-        key = redis_client.make_cache_key(
-            self.key_prefix,
-            identifier,
-            str(self.window_seconds)
-        )
-        
+        result = await self.check(identifier, cost=0)
         current_time = int(time.time())
-        window_start = current_time - self.window_seconds
-        
-        try:
-            # Clean up expired entries
-            await redis_client._client.zremrangebyscore(key, 0, window_start)
-            
-            # Get count and timestamps
-            current_count = await redis_client._client.zcard(key)
-            timestamps = await redis_client._client.zrange(key, 0, -1, withscores=True)
-            
-            # Calculate reset time
-            if timestamps:
-                oldest_timestamp = int(timestamps[0][1])
-                reset_time = oldest_timestamp + self.window_seconds
-            else:
-                reset_time = current_time
-            
-            return {
-                "identifier": identifier,
-                "current_count": current_count,
-                "max_requests": self.max_requests,
-                "window_seconds": self.window_seconds,
-                "remaining": max(0, self.max_requests - current_count),
-                "reset_time": reset_time,
-                "reset_in_seconds": max(0, reset_time - current_time),
-            }
-            
-        except Exception as e:
-            logger.error(f"Error getting stats for {identifier}: {e}")
-            return {
-                "identifier": identifier,
-                "current_count": 0,
-                "max_requests": self.max_requests,
-                "window_seconds": self.window_seconds,
-                "remaining": self.max_requests,
-                "reset_time": current_time,
-                "reset_in_seconds": 0,
-                "error": str(e),
-            }
\ No newline at end of file
+
+        return {
+            "identifier": identifier,
+            "current_count": self.max_requests - result.remaining,
+            "max_requests": self.max_requests,
+            "window_seconds": self.window_seconds,
+            "remaining": result.remaining,
+            "reset_time": current_time + int(result.reset_after),
+            "reset_in_seconds": int(result.reset_after),
+        }
@@ -0,0 +1,124 @@
+"""
+Fast response serialization.
+
+``APIResponse`` is the application's default response class. It serialises
+with orjson (falling back to the standard library when orjson is not
+installed), and with MessagePack when the client sent
+``Accept: application/msgpack`` and the ``msgpack`` package is available.
+Routes returning large payloads construct ``APIResponse`` directly, which
+also skips FastAPI's ``jsonable_encoder`` pass.
+"""
+import json
+from contextvars import ContextVar
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Set per request by ContentNegotiationMiddleware
+_wants_msgpack: ContextVar[bool] = ContextVar("wants_msgpack", default=False)
+
+
+def _default(value: Any) -> Any:
+    """Convert types orjson/json/msgpack do not handle natively."""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, Path):
+        return str(value)
+    if hasattr(value, "tolist"):  # numpy scalars and arrays
+        return value.tolist()
+    raise TypeError(f"Type is not serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialise to UTF-8 JSON bytes."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def loads(data: Any) -> Any:
+    """Parse JSON bytes or text."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def packb(content: Any) -> bytes:
+    """Serialise to MessagePack bytes."""
+    return msgpack.packb(content, default=_default, use_bin_type=True)
+
+
+class APIResponse(JSONResponse):
+    """JSON via orjson, or MessagePack when negotiated."""
+
+    def __init__(self, content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None, **kwargs):
+        self._msgpack = MSGPACK_AVAILABLE and _wants_msgpack.get()
+        if self._msgpack:
+            self.media_type = MSGPACK_MEDIA_TYPE
+        super().__init__(content, status_code=status_code, headers=headers, **kwargs)
+        if MSGPACK_AVAILABLE:
+            # Representation depends on Accept; keep caches from mixing them up
+            vary = self.headers.get("vary")
+            self.headers["Vary"] = f"{vary}, Accept" if vary else "Accept"
+
+    def render(self, content: Any) -> bytes:
+        if self._msgpack:
+            return packb(content)
+        return dumps(content)
+
+
+class ContentNegotiationMiddleware:
+    """Records whether the client prefers MessagePack for APIResponse."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = b""
+        for name, value in scope["headers"]:
+            if name == b"accept":
+                accept = value
+                break
+
+        token = _wants_msgpack.set(MSGPACK_MEDIA_TYPE.encode() in accept)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _wants_msgpack.reset(token)
@@ -0,0 +1,327 @@
+"""
+Distributed tracing with OpenTelemetry.
+
+``setup_tracing()`` installs a global tracer provider when
+``TRACING_ENABLED`` is set. FastAPI's native OpenTelemetry support then
+records a server span per request (named after the route template and
+joined to the caller's trace when it sends a ``traceparent`` header) with
+spans for dependency resolution, the endpoint, serialization and background
+tasks. Under it, this module adds spans for:
+
+- SQL statements (``instrument_sqlalchemy``) and Redis commands and
+  pipelines (``instrument_redis``);
+- outgoing httpx requests made through ``TracingClient``, which forwards
+  the trace context;
+- Gemini, Google TTS and Sefaria calls (``monitor_external_api``), the
+  stages of a chat message and any function or block wrapped in
+  ``traced``, ``span()`` or ``MonitoringService.trace_span``.
+
+The current span lives in a context variable, so it follows awaits,
+``asyncio.create_task`` and ``asyncio.to_thread``; background tasks run in
+the request's context and are children of its span.
+
+Traces are sampled per trace id at ``TRACING_SAMPLE_RATE``; requests that
+arrive with a sampling decision keep it. Spans are exported in batches to an
+OTLP collector (``TRACING_OTLP_ENDPOINT``, OTLP over HTTP), to a JSON-lines
+file (``TRACING_FILE``) or to stdout.
+
+FastAPI depends on ``opentelemetry-api``; recording spans also needs the
+optional ``opentelemetry-sdk``, plus ``opentelemetry-exporter-otlp-proto-http``
+for the OTLP exporter. Without them every helper here does nothing.
+"""
+import asyncio
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, MutableMapping, Optional
+
+import httpx
+from sqlalchemy import event
+
+from app.config import settings
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+    OTEL_AVAILABLE = True
+except ImportError:
+    OTEL_AVAILABLE = False
+
+try:
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor, ConsoleSpanExporter, SpanExporter, SpanExportResult
+    )
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    OTEL_SDK_AVAILABLE = True
+except ImportError:
+    OTEL_SDK_AVAILABLE = False
+
+# Longest SQL statement kept on a span
+MAX_STATEMENT_LENGTH = 2000
+
+_provider = None
+_enabled = False
+
+
+if OTEL_SDK_AVAILABLE:
+    class FileSpanExporter(SpanExporter):
+        """Appends finished spans to a file, one JSON object per line."""
+
+        def __init__(self, path: Path):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+            self._lock = threading.Lock()
+
+        def export(self, spans) -> "SpanExportResult":
+            lines = "".join(s.to_json(indent=None) + "\n" for s in spans)
+            try:
+                with self._lock:
+                    self._file.write(lines)
+                    self._file.flush()
+            except OSError as e:
+                logger.error(f"Failed to write spans to {self._file.name}: {e}")
+                return SpanExportResult.FAILURE
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self) -> None:
+            with self._lock:
+                self._file.close()
+
+
+def _exporter(name: str):
+    if name == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("opentelemetry-exporter-otlp-proto-http is not installed; spans are not exported")
+            return None
+        return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    if name == "file":
+        return FileSpanExporter(settings.TRACING_FILE)
+    if name == "console":
+        return ConsoleSpanExporter()
+    return None
+
+
+def setup_tracing() -> bool:
+    """
+    Install the tracer provider if tracing is enabled and available.
+
+    Returns:
+        True if spans are recorded
+    """
+    global _provider, _enabled
+    if _enabled or not settings.TRACING_ENABLED:
+        return _enabled
+    if not (OTEL_AVAILABLE and OTEL_SDK_AVAILABLE):
+        logger.warning("TRACING_ENABLED is set but opentelemetry-sdk is not installed; tracing disabled")
+        return False
+
+    _provider = TracerProvider(
+        resource=Resource.create({
+            "service.name": settings.TRACING_SERVICE_NAME,
+            "deployment.environment": settings.ENVIRONMENT,
+        }),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATE)),
+    )
+    exporter = _exporter(settings.TRACING_EXPORTER)
+    if exporter is not None:
+        _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    _enabled = True
+
+    logger.info(
+        f"Tracing enabled: exporter={settings.TRACING_EXPORTER}, "
+        f"sample rate={settings.TRACING_SAMPLE_RATE}"
+    )
+    return True
+
+
+def shutdown_tracing() -> None:
+    """Flush pending spans and stop the exporter."""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def get_tracer():
+    return trace.get_tracer("app") if OTEL_AVAILABLE else None
+
+
+# --- spans -------------------------------------------------------------------
+
+@contextmanager
+def span(
+    name: str,
+    attributes: Optional[Dict[str, Any]] = None,
+    kind: str = "internal"
+) -> Iterator[Any]:
+    """
+    Make a span the current span for the duration of the block.
+
+    Exceptions leaving the block are recorded on the span, which is marked
+    as an error. Yields None when tracing is disabled.
+
+    Args:
+        name: Span name
+        attributes: Span attributes
+        kind: Span kind: internal, server, client, producer or consumer
+    """
+    if not _enabled:
+        yield None
+        return
+    with get_tracer().start_as_current_span(
+        name,
+        kind=SpanKind[kind.upper()],
+        attributes=attributes,
+    ) as current:
+        yield current
+
+
+def set_error(current: Any, description: str) -> None:
+    """Mark a span as failed without an exception (e.g. a 5xx response)."""
+    if current is not None:
+        current.set_status(Status(StatusCode.ERROR, description))
+
+
+def inject_context(headers: MutableMapping[str, str]) -> None:
+    """Add the current trace context (``traceparent``) to outgoing headers."""
+    if _enabled:
+        propagate.inject(headers)
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """Decorator running each call of a function in a span (named after the function by default)."""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- SQLAlchemy --------------------------------------------------------------
+
+def instrument_sqlalchemy(engine) -> None:
+    """Record a client span per SQL statement executed on the engine."""
+    if not _enabled:
+        return
+    sync_engine = getattr(engine, "sync_engine", engine)
+    attributes = {"db.system": sync_engine.dialect.name}
+    if sync_engine.url.database:
+        attributes["db.name"] = sync_engine.url.database
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is None:
+            return
+        operation = statement.split(None, 1)[0].upper() if statement.strip() else "SQL"
+        context._tracing_span = get_tracer().start_span(
+            f"db {operation}",
+            kind=SpanKind.CLIENT,
+            attributes={
+                **attributes,
+                "db.operation": operation,
+                "db.statement": statement[:MAX_STATEMENT_LENGTH],
+            },
+        )
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        current = getattr(context, "_tracing_span", None)
+        if current is not None:
+            current.end()
+            context._tracing_span = None
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        context = exception_context.execution_context
+        current = getattr(context, "_tracing_span", None)
+        if current is not None:
+            current.record_exception(exception_context.original_exception)
+            set_error(current, type(exception_context.original_exception).__name__)
+            current.end()
+            context._tracing_span = None
+
+
+# --- Redis -------------------------------------------------------------------
+
+def instrument_redis(client) -> None:
+    """
+    Record a client span per Redis command and per pipeline.
+
+    Only command names are recorded, never keys or values.
+    """
+    if not _enabled or getattr(client, "_tracing_instrumented", False):
+        return
+    attributes = {"db.system": "redis"}
+    execute_command = client.execute_command
+    pipeline = client.pipeline
+
+    async def traced_execute_command(*args, **options):
+        operation = str(args[0]).upper()
+        with span(f"redis {operation}", {**attributes, "db.operation": operation}, "client"):
+            return await execute_command(*args, **options)
+
+    def traced_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        async def traced_execute(raise_on_error: bool = True):
+            operations = sorted({str(command[0][0]).upper() for command in pipe.command_stack})
+            with span("redis pipeline", {
+                **attributes,
+                "db.operation": " ".join(operations),
+                "db.redis.pipeline_length": len(pipe.command_stack),
+            }, "client"):
+                return await execute(raise_on_error)
+
+        pipe.execute = traced_execute
+        return pipe
+
+    client.execute_command = traced_execute_command
+    client.pipeline = traced_pipeline
+    client._tracing_instrumented = True
+
+
+# --- httpx -------------------------------------------------------------------
+
+class TracingClient(httpx.AsyncClient):
+    """
+    httpx client recording a client span per request and forwarding the
+    trace context in ``traceparent``.
+
+    Takes the same arguments as ``httpx.AsyncClient`` and keeps its default
+    transport, so limits and proxies from the environment (``HTTPS_PROXY``)
+    still apply. The span covers redirects and, unless the response is
+    streamed, reading the body.
+    """
+
+    async def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        with span(f"HTTP {request.method}", {
+            "http.request.method": request.method,
+            "server.address": request.url.host,
+            "url.full": str(request.url.copy_with(query=None)),
+        }, "client") as current:
+            inject_context(request.headers)
+            response = await super().send(request, **kwargs)
+            if current is not None:
+                current.set_attribute("http.response.status_code", response.status_code)
+                if response.status_code >= 500:
+                    set_error(current, f"HTTP {response.status_code}")
+            return response
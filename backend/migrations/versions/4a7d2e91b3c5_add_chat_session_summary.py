@@ -0,0 +1,29 @@
+"""Add rolling summary to chat sessions
+
+Revision ID: 4a7d2e91b3c5
+Revises: c108b553a0cb
+Create Date: 2026-10-18 09:12:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a7d2e91b3c5'
+down_revision: Union[str, None] = 'c108b553a0cb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_sessions', sa.Column('summary', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column('chat_sessions', sa.Column('summarized_until', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('chat_sessions', 'summarized_until')
+    op.drop_column('chat_sessions', 'summary')
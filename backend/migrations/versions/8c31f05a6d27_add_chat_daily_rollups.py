@@ -0,0 +1,40 @@
+"""Add chat daily rollups
+
+Revision ID: 8c31f05a6d27
+Revises: 4a7d2e91b3c5
+Create Date: 2026-10-18 10:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c31f05a6d27'
+down_revision: Union[str, None] = '4a7d2e91b3c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('chat_daily_rollups',
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('messages', sa.Integer(), nullable=False),
+    sa.Column('assistant_messages', sa.Integer(), nullable=False),
+    sa.Column('sessions', sa.Integer(), nullable=False),
+    sa.Column('tokens_used', sa.Integer(), nullable=False),
+    sa.Column('response_time_sum_ms', sa.BigInteger(), nullable=False),
+    sa.Column('response_time_count', sa.Integer(), nullable=False),
+    sa.Column('response_time_histogram', sa.JSON(), nullable=True),
+    sa.Column('ratings_count', sa.Integer(), nullable=False),
+    sa.Column('ratings_sum', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('chat_daily_rollups')
@@ -0,0 +1,28 @@
+"""Add composite indexes for chat keyset pagination
+
+Revision ID: b5e09d4c2f18
+Revises: 8c31f05a6d27
+Create Date: 2026-10-18 11:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e09d4c2f18'
+down_revision: Union[str, None] = '8c31f05a6d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_chat_sessions_user_activity_id', 'chat_sessions', ['user_id', 'last_activity', 'id'], unique=False)
+    op.create_index('ix_chat_messages_session_created_id', 'chat_messages', ['session_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_messages_session_created_id', table_name='chat_messages')
+    op.drop_index('ix_chat_sessions_user_activity_id', table_name='chat_sessions')
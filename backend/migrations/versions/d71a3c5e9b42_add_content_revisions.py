@@ -0,0 +1,123 @@
+"""Add content revisions and tombstones for delta sync
+
+Revision ID: d71a3c5e9b42
+Revises: b5e09d4c2f18
+Create Date: 2026-10-18 14:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd71a3c5e9b42'
+down_revision: Union[str, None] = 'b5e09d4c2f18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+REVISION_BUMP_FUNCTION = """
+CREATE OR REPLACE FUNCTION content_revision_bump() RETURNS trigger AS $$
+DECLARE
+    ignored text[] := COALESCE(TG_ARGV, ARRAY[]::text[]);
+BEGIN
+    IF TG_OP = 'UPDATE' AND
+       (to_jsonb(NEW) - ignored - 'revision' - 'xact_id' - 'updated_at')
+       = (to_jsonb(OLD) - ignored - 'revision' - 'xact_id' - 'updated_at') THEN
+        RETURN NEW;
+    END IF;
+    NEW.revision := nextval('content_revision_seq');
+    NEW.xact_id := txid_current();
+    IF TG_OP = 'UPDATE' THEN
+        NEW.updated_at := timezone('utc', now());
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+TOMBSTONE_FUNCTION = """
+CREATE OR REPLACE FUNCTION content_tombstone() RETURNS trigger AS $$
+DECLARE
+    old_row jsonb := to_jsonb(OLD);
+BEGIN
+    INSERT INTO content_tombstones (revision, entity, entity_id, key, book_slug, xact_id, deleted_at)
+    VALUES (
+        nextval('content_revision_seq'),
+        TG_ARGV[0],
+        old_row ->> 'id',
+        old_row ->> TG_ARGV[1],
+        old_row ->> TG_ARGV[2],
+        txid_current(),
+        timezone('utc', now())
+    );
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE content_revision_seq")
+
+    # Existing rows get revisions in table order, all from a committed transaction
+    for table in ('books', 'texts'):
+        op.add_column(table, sa.Column('revision', sa.BigInteger(), server_default=sa.text("nextval('content_revision_seq')"), nullable=False))
+        op.add_column(table, sa.Column('xact_id', sa.BigInteger(), server_default=sa.text('txid_current()'), nullable=False))
+        op.create_index(op.f(f'ix_{table}_revision'), table, ['revision'], unique=False)
+        op.create_index(op.f(f'ix_{table}_xact_id'), table, ['xact_id'], unique=False)
+
+    op.create_table('content_tombstones',
+    sa.Column('revision', sa.BigInteger(), autoincrement=False, nullable=False),
+    sa.Column('entity', sqlmodel.sql.sqltypes.AutoString(length=10), nullable=False),
+    sa.Column('entity_id', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+    sa.Column('key', sqlmodel.sql.sqltypes.AutoString(length=200), nullable=False),
+    sa.Column('book_slug', sqlmodel.sql.sqltypes.AutoString(length=100), nullable=True),
+    sa.Column('xact_id', sa.BigInteger(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('revision')
+    )
+    op.create_index(op.f('ix_content_tombstones_book_slug'), 'content_tombstones', ['book_slug'], unique=False)
+    op.create_index('ix_content_tombstones_xact_id', 'content_tombstones', ['xact_id'], unique=False)
+
+    op.execute(REVISION_BUMP_FUNCTION)
+    op.execute(TOMBSTONE_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER books_revision BEFORE INSERT OR UPDATE ON books FOR EACH ROW "
+        "EXECUTE FUNCTION content_revision_bump('view_count', 'bookmark_count')"
+    )
+    op.execute(
+        "CREATE TRIGGER books_tombstone AFTER DELETE ON books FOR EACH ROW "
+        "EXECUTE FUNCTION content_tombstone('book', 'slug', 'slug')"
+    )
+    op.execute(
+        "CREATE TRIGGER texts_revision BEFORE INSERT OR UPDATE ON texts FOR EACH ROW "
+        "EXECUTE FUNCTION content_revision_bump()"
+    )
+    op.execute(
+        "CREATE TRIGGER texts_tombstone AFTER DELETE ON texts FOR EACH ROW "
+        "EXECUTE FUNCTION content_tombstone('text', 'ref', 'book_slug')"
+    )
+
+
+def downgrade() -> None:
+    for table in ('texts', 'books'):
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_tombstone ON {table}")
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_revision ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS content_tombstone()")
+    op.execute("DROP FUNCTION IF EXISTS content_revision_bump()")
+
+    op.drop_index('ix_content_tombstones_xact_id', table_name='content_tombstones')
+    op.drop_index(op.f('ix_content_tombstones_book_slug'), table_name='content_tombstones')
+    op.drop_table('content_tombstones')
+
+    for table in ('texts', 'books'):
+        op.drop_index(op.f(f'ix_{table}_xact_id'), table_name=table)
+        op.drop_index(op.f(f'ix_{table}_revision'), table_name=table)
+        op.drop_column(table, 'xact_id')
+        op.drop_column(table, 'revision')
+
+    op.execute("DROP SEQUENCE content_revision_seq")
@@ -0,0 +1,35 @@
+"""Make texts.ref unique
+
+Revision ID: e4b8f1c2a7d6
+Revises: d71a3c5e9b42
+Create Date: 2026-10-19 09:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b8f1c2a7d6'
+down_revision: Union[str, None] = 'd71a3c5e9b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keep the oldest row of each ref; the deletes leave tombstones for sync clients
+    op.execute("""
+        DELETE FROM texts AS duplicate
+        USING texts AS kept
+        WHERE duplicate.ref = kept.ref
+          AND (duplicate.created_at, duplicate.id) > (kept.created_at, kept.id)
+    """)
+    op.drop_index('ix_texts_ref', table_name='texts')
+    op.create_index('ix_texts_ref', 'texts', ['ref'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_texts_ref', table_name='texts')
+    op.create_index('ix_texts_ref', 'texts', ['ref'], unique=False)
@@ -0,0 +1,37 @@
+"""Record the id of the last summarized chat message
+
+Revision ID: f3a9c6d2b1e8
+Revises: e4b8f1c2a7d6
+Create Date: 2026-10-19 11:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9c6d2b1e8'
+down_revision: Union[str, None] = 'e4b8f1c2a7d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_sessions', sa.Column('summarized_until_id', sa.Uuid(), nullable=True))
+    # Messages at the old boundary timestamp were all treated as summarized
+    op.execute("""
+        UPDATE chat_sessions AS s
+        SET summarized_until_id = (
+            SELECT m.id FROM chat_messages AS m
+            WHERE m.session_id = s.id AND m.created_at = s.summarized_until
+            ORDER BY m.id DESC
+            LIMIT 1
+        )
+        WHERE s.summarized_until IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('chat_sessions', 'summarized_until_id')
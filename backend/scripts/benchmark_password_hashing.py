@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark du débit de connexion et de la latence de la boucle d'événements.
+
+Simule une rafale de connexions concurrentes (vérification d'un mot de passe
+haché) et, en parallèle, une sonde qui se réveille toutes les 10 ms comme le
+ferait une requête ordinaire. Compare la vérification faite directement dans
+la boucle (l'ancien chemin) à celle faite par le pool de processus de
+PasswordHasher. Affiche les connexions par seconde et le retard de la sonde
+(p50, p99, max), qui mesure le blocage subi par les autres requêtes.
+
+Usage: python scripts/benchmark_password_hashing.py [connexions] [concurrence] [schéma]
+
+Le schéma par défaut est celui de PASSWORD_HASH_SCHEME (bcrypt ou argon2);
+tout schéma passlib est accepté (ex. pbkdf2_sha256).
+"""
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from passlib.context import CryptContext
+
+from app.config import settings
+from app.services.password_hasher import PasswordHasher, PasswordHasherBusy, SCHEMES
+
+PASSWORD = "correct horse battery staple"
+PROBE_INTERVAL = 0.01
+
+
+async def probe(lags: List[float], stop: asyncio.Event) -> None:
+    """Retard de réveil d'une tâche qui dort PROBE_INTERVAL secondes."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append((time.perf_counter() - start - PROBE_INTERVAL) * 1000)
+
+
+async def run(label: str, verify, logins: int, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    rejected = 0
+
+    async def login():
+        nonlocal rejected
+        async with semaphore:
+            try:
+                valid = await verify()
+            except PasswordHasherBusy:
+                rejected += 1
+                return
+            assert valid
+
+    lags: List[float] = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await probe_task
+
+    lags.sort()
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))] if lags else 0.0
+    print(f"   {label:<22} {logins / elapsed:8.1f} connexions/s  "
+          f"retard boucle p50 {statistics.median(lags) if lags else 0:7.1f} ms  "
+          f"p99 {p99:7.1f} ms  max {max(lags, default=0):7.1f} ms"
+          + (f"  ({rejected} rejetées)" if rejected else ""))
+
+
+async def main(logins: int, concurrency: int, scheme: str) -> None:
+    schemes = SCHEMES.get(scheme, [scheme])
+    context = CryptContext(schemes=schemes, deprecated="auto")
+    hashed = context.hash(PASSWORD)
+
+    print(f"🔐 Schéma {schemes[0]}, {logins} connexions, concurrence {concurrency}, "
+          f"{settings.PASSWORD_HASH_WORKERS} processus\n")
+
+    async def inline():
+        return context.verify(PASSWORD, hashed)
+
+    hasher = PasswordHasher(schemes=schemes, max_pending=max(concurrency, settings.PASSWORD_HASH_MAX_PENDING))
+
+    async def pooled():
+        valid, _ = await hasher.verify(PASSWORD, hashed)
+        return valid
+
+    # Démarre les processus avant de mesurer
+    await hasher.verify(PASSWORD, hashed)
+
+    await run("dans la boucle", inline, logins, concurrency)
+    await run("pool de processus", pooled, logins, concurrency)
+    hasher.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 16,
+        sys.argv[3] if len(sys.argv) > 3 else settings.PASSWORD_HASH_SCHEME
+    ))
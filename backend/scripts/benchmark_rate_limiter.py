@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark du limiteur de débit (GCRA).
+
+Mesure le nombre de vérifications par seconde:
+- du pré-limiteur local seul (aucun aller-retour réseau);
+- de RateLimiter avec Redis, avec et sans pré-limiteur local, sur deux
+  charges: une rafale d'un seul client (le pré-limiteur doit absorber ce qui
+  dépasse la limite) et un trafic réparti sur de nombreux clients.
+
+Usage: python scripts/benchmark_rate_limiter.py [vérifications] [limite]
+
+Sans Redis joignable, seul le pré-limiteur local est mesuré.
+"""
+import asyncio
+import sys
+import time
+import uuid
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.redis_client import redis_client
+from app.utils.rate_limiter import LocalRateLimiter, RateLimiter
+
+WINDOW = 60
+
+
+def bench_local(checks: int, limit: int) -> None:
+    limiter = LocalRateLimiter()
+    start = time.perf_counter()
+    allowed = sum(limiter.check("flood", limit, WINDOW).allowed for _ in range(checks))
+    elapsed = time.perf_counter() - start
+    print(f"   {'local, rafale':<34} {checks / elapsed:>12,.0f} vérif./s  {allowed} acceptées")
+
+
+async def bench_redis(label: str, local: bool, checks: int, limit: int, clients: int) -> None:
+    limiter = RateLimiter(max_requests=limit, window_seconds=WINDOW,
+                          key_prefix=f"bench_rate_limit:{uuid.uuid4().hex}", local=local)
+    identifiers = [f"client:{i}" for i in range(clients)]
+
+    start = time.perf_counter()
+    results = [await limiter.check(identifiers[i % clients]) for i in range(checks)]
+    elapsed = time.perf_counter() - start
+
+    allowed = sum(result.allowed for result in results)
+    print(f"   {label:<34} {checks / elapsed:>12,.0f} vérif./s  {allowed} acceptées  "
+          f"(Redis: {limiter.counters['allowed'] + limiter.counters['limited']}, "
+          f"refus locaux: {limiter.counters['local_limited']})")
+
+    keys = [limiter._key(identifier, WINDOW) for identifier in identifiers]
+    await redis_client.delete(*keys)
+
+
+async def main(checks: int, limit: int) -> None:
+    print(f"🚦 {checks} vérifications, limite {limit}/{WINDOW}s\n")
+    bench_local(checks, limit)
+
+    try:
+        await redis_client.initialize()
+    except Exception as e:
+        print(f"\n⚠️  Redis indisponible ({e}), mesures Redis ignorées")
+        return
+
+    await bench_redis("Redis, rafale", False, checks, limit, 1)
+    await bench_redis("Redis + local, rafale", True, checks, limit, 1)
+    await bench_redis("Redis, 1000 clients", False, checks, limit, 1000)
+    await bench_redis("Redis + local, 1000 clients", True, checks, limit, 1000)
+    await redis_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    ))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark hors ligne de la recherche de contexte du chat.
+
+Compare la recherche lexicale (BM25), vectorielle et hybride (RRF) sur un
+petit jeu de questions annotées : précision@k, rappel@k, MRR et tokens de
+contexte envoyés à Gemini. Les textes locaux (data/breslov_texts) et l'index
+vectoriel (data/vector_index) doivent exister.
+
+Usage: python scripts/benchmark_retrieval.py [qrels.json] [k]
+
+Format qrels : [{"query": "...", "relevant": [{"book": "...", "ref": "..."}]}]
+un passage est pertinent si son livre correspond et que sa référence
+contient "ref" (comparaison sans espaces, underscores ni casse).
+"""
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List, Dict, Any
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.conversation_memory import estimate_tokens
+from app.services.hybrid_retriever import HybridRetriever
+
+DEFAULT_QRELS = [
+    {"query": "It is a great mitzvah to always be happy",
+     "relevant": [{"book": "Likutei_Moharan", "ref": "II 24"}]},
+    {"query": "מצוה גדולה להיות בשמחה תמיד",
+     "relevant": [{"book": "Likutei_Moharan", "ref": "II 24"}]},
+    {"query": "The whole world is a very narrow bridge, the main thing is not to be afraid",
+     "relevant": [{"book": "Likutei_Moharan", "ref": "II 48"}]},
+    {"query": "כל העולם כלו גשר צר מאד",
+     "relevant": [{"book": "Likutei_Moharan", "ref": "II 48"}]},
+    {"query": "Finding the good points in every person, even in oneself",
+     "relevant": [{"book": "Likutei_Moharan", "ref": "282"}]},
+    {"query": "אזמרה לאלקי בעודי",
+     "relevant": [{"book": "Likutei_Moharan", "ref": "282"}]},
+    {"query": "Ten psalms as a general remedy",
+     "relevant": [{"book": "Likutei_Moharan", "ref": "205"}, {"book": "Tikkun_HaKlali", "ref": ""}]},
+    {"query": "Story of the king's daughter who was lost",
+     "relevant": [{"book": "Sippurei_Maasiyot", "ref": "1"}]},
+    {"query": "Speaking alone with God in your own language every day",
+     "relevant": [{"book": "Likutei_Moharan", "ref": "II 25"}, {"book": "Sichot_HaRan", "ref": ""}]},
+    {"query": "Never despair, there is no despair in the world at all",
+     "relevant": [{"book": "Likutei_Moharan", "ref": "II 78"}]},
+]
+
+
+def _norm(ref: str) -> str:
+    return ref.replace(" ", "").replace("_", "").lower()
+
+
+def is_relevant(hit: Dict[str, Any], relevant: List[Dict[str, str]]) -> bool:
+    return any(
+        hit["book"] == item["book"] and _norm(item["ref"]) in _norm(hit["ref"])
+        for item in relevant
+    )
+
+
+def evaluate(name: str, runs: List[List[Dict[str, Any]]], qrels: List[Dict], k: int, elapsed: float) -> None:
+    precision = recall = mrr = tokens = 0.0
+    for hits, qrel in zip(runs, qrels):
+        hits = hits[:k]
+        flags = [is_relevant(hit, qrel["relevant"]) for hit in hits]
+        precision += sum(flags) / k
+        recall += 1.0 if any(flags) else 0.0
+        mrr += next((1.0 / rank for rank, flag in enumerate(flags, start=1) if flag), 0.0)
+        tokens += sum(estimate_tokens(hit["document"]) for hit in hits)
+
+    n = len(qrels)
+    print(
+        f"  {name:<8} P@{k}={precision / n:.3f}  R@{k}={recall / n:.3f}  "
+        f"MRR={mrr / n:.3f}  tokens/question={tokens / n:.0f}  "
+        f"latence={elapsed / n * 1000:.0f} ms"
+    )
+
+
+def main(qrels_path: str = None, k: int = 5):
+    qrels = DEFAULT_QRELS
+    if qrels_path:
+        with open(qrels_path, "r", encoding="utf-8") as f:
+            qrels = json.load(f)
+
+    retriever = HybridRetriever(candidates=max(30, k * 6))
+    print(f"🔍 Benchmark de recherche sur {len(qrels)} questions (k={k})...")
+
+    lexical_runs, vector_runs, elapsed = [], [], {"bm25": 0.0, "vector": 0.0}
+    for qrel in qrels:
+        start = time.perf_counter()
+        lexical_runs.append(retriever.lexical_search(qrel["query"]))
+        elapsed["bm25"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        try:
+            vector_runs.append(retriever.vector_search(qrel["query"]))
+        except Exception as e:
+            print(f"  ⚠️ Recherche vectorielle indisponible: {e}")
+            vector_runs.append([])
+        elapsed["vector"] += time.perf_counter() - start
+
+    # La fusion réutilise les listes déjà calculées (les deux recherches tournent en parallèle en production)
+    start = time.perf_counter()
+    hybrid_runs = [
+        retriever.fuse([run for run in (lexical, vector) if run], max_results=k, max_tokens=10 ** 9)
+        for lexical, vector in zip(lexical_runs, vector_runs)
+    ]
+    fusion_time = time.perf_counter() - start
+
+    print(f"  📚 {len(retriever.lexical_index)} chunks BM25, {len(retriever.vector_index)} chunks vectoriels\n")
+    evaluate("bm25", lexical_runs, qrels, k, elapsed["bm25"])
+    evaluate("vector", vector_runs, qrels, k, elapsed["vector"])
+    evaluate("hybrid", hybrid_runs, qrels, k, max(elapsed["bm25"], elapsed["vector"]) + fusion_time)
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else None,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    )
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la sérialisation des réponses de l'API.
+
+Compare, sur une charge représentative (un livre entier, une page de
+sections, un lot de textes), le chemin FastAPI par défaut
+(jsonable_encoder + JSONResponse de Starlette) à APIResponse (orjson), avec
+et sans jsonable_encoder, et MessagePack quand le paquet msgpack est
+installé. Affiche le temps moyen par réponse et la taille du corps.
+
+Usage: python scripts/benchmark_serialization.py [livre.json] [itérations]
+
+Sans fichier, un livre synthétique (hébreu + anglais) est généré.
+"""
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from app.utils import serialization
+from app.utils.serialization import APIResponse
+
+HEBREW = "אמר רבי נחמן מצוה גדולה להיות בשמחה תמיד ולהתגבר בכל כחו להרחיק העצבות והמרה שחורה "
+ENGLISH = "It is a great mitzvah to always be happy, and to strive with all one's strength to banish sadness. "
+
+
+def synthetic_book(chapters: int = 300, verses: int = 12) -> Dict[str, Any]:
+    return {
+        "title": "Likutei Moharan",
+        "he_title": "ליקוטי מוהר\"ן",
+        "chapters": [
+            {
+                "ref": f"Likutei_Moharan.{chapter}",
+                "hebrew": [HEBREW * 3 for _ in range(verses)],
+                "english": [ENGLISH * 3 for _ in range(verses)],
+            }
+            for chapter in range(1, chapters + 1)
+        ],
+    }
+
+
+def payloads(book: Dict[str, Any]) -> Dict[str, Any]:
+    chapters = book.get("chapters") or book.get("sections") or []
+    texts = [
+        {
+            "ref": chapter.get("ref"),
+            "chapter": index + 1,
+            "verse": None,
+            "hebrew": chapter.get("hebrew"),
+            "english": chapter.get("english"),
+            "source": "db",
+        }
+        for index, chapter in enumerate(chapters)
+    ]
+    return {
+        "livre complet": book,
+        "page de sections (100)": {
+            "id": book.get("title"),
+            "sections": [
+                {"ref": t["ref"], "preview": str(t["hebrew"])[:120]} for t in texts[:100]
+            ],
+            "next_cursor": "eyJyZWYiOiAiMTAwIn0",
+        },
+        "lot de textes (50)": {"texts": texts[:50], "total": 50, "missing": []},
+    }
+
+
+def measure(render: Callable[[], bytes], iterations: int):
+    body = render()  # échauffement
+    start = time.perf_counter()
+    for _ in range(iterations):
+        render()
+    return (time.perf_counter() - start) / iterations * 1000, len(body)
+
+
+def main(path: str = None, iterations: int = 50):
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            book = json.load(f)
+        print(f"📖 Livre chargé depuis {path}")
+    else:
+        book = synthetic_book()
+        print("📖 Livre synthétique généré")
+
+    print(f"   orjson: {'oui' if serialization.ORJSON_AVAILABLE else 'non'}, "
+          f"msgpack: {'oui' if serialization.MSGPACK_AVAILABLE else 'non'}, "
+          f"{iterations} itérations\n")
+
+    for name, content in payloads(book).items():
+        paths = {
+            "jsonable_encoder + JSONResponse": lambda: JSONResponse(jsonable_encoder(content)).body,
+            "jsonable_encoder + APIResponse": lambda: APIResponse(jsonable_encoder(content)).body,
+            "APIResponse direct": lambda: APIResponse(content).body,
+        }
+        if serialization.MSGPACK_AVAILABLE:
+            paths["MessagePack direct"] = lambda: serialization.packb(content)
+
+        print(f"🔹 {name}")
+        baseline = None
+        for label, render in paths.items():
+            ms, size = measure(render, iterations)
+            baseline = baseline or ms
+            print(f"   {label:<34} {ms:8.2f} ms  {size / 1024:8.1f} Ko  x{baseline / ms:5.1f}")
+        print()
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else None,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    )
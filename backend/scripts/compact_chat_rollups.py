@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Recalcule les agrégats journaliers du chat (chat_daily_rollups).
+
+Les rollups sont maintenus à chaque écriture de message ; ce job périodique
+les reconstruit depuis chat_messages pour corriger toute dérive et pour
+remplir l'historique après une migration.
+
+Usage: python scripts/compact_chat_rollups.py [nombre_de_jours]
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import get_db_session
+from app.services.chat_analytics import ChatAnalyticsService
+from app.utils.logger import logger
+
+
+async def main(days: int = 2):
+    """Reconstruit les rollups des `days` derniers jours (aujourd'hui inclus)"""
+    print(f"🔧 Reconstruction des rollups chat sur {days} jour(s)...")
+    
+    total = 0
+    for offset in range(days):
+        # Jours UTC, comme created_at
+        day = datetime.utcnow().date() - timedelta(days=offset)
+        try:
+            async with get_db_session() as session:
+                rows = await ChatAnalyticsService(session).rebuild_day(day)
+            total += rows
+            print(f"  ✅ {day.isoformat()}: {rows} utilisateur(s)")
+        except Exception as e:
+            logger.error(f"Erreur rollup {day.isoformat()}: {str(e)}")
+            print(f"  ❌ {day.isoformat()}: {str(e)}")
+    
+    print(f"\n📊 {total} rollups écrits")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2))
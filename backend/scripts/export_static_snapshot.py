@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Exporte les textes de la base en fichiers statiques (JSON compressés + manifeste).
+
+Les fichiers sont écrits dans STATIC_SNAPSHOT_DIR et peuvent être servis
+directement par nginx (gzip_static) ou un CDN sous STATIC_SNAPSHOT_URL :
+les bundles ont un nom dérivé de leur contenu (cache immuable), seul
+manifest.json doit être revalidé. L'import Sefaria relance cet export.
+
+Usage: python scripts/export_static_snapshot.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import get_db_session
+from app.services.static_snapshot import get_static_snapshot
+
+
+async def main():
+    snapshot = get_static_snapshot()
+    print(f"🗂️ Export statique vers {snapshot.output_dir}...")
+    
+    async with get_db_session() as session:
+        manifest = await snapshot.export(session)
+    
+    for slug, book in manifest["books"].items():
+        print(f"  ✅ {slug}: {len(book['chapters'])} chapitre(s), {book['texts']} texte(s), {book['size'] / 1024:.1f} Ko")
+    
+    print(f"\n📊 Version {manifest['version']}: {len(manifest['books'])} livre(s)")
+    print(f"   Manifeste: {snapshot.url('manifest.json')}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())